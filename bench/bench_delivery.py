@@ -0,0 +1,66 @@
+"""Пропускная способность и задержка очереди доставки на фиктивном боте.
+
+    python bench/bench_delivery.py [--messages 3000] [--chats 1000] [--rate 1000] [--api-latency 0.05]
+
+Задержка - от постановки в очередь до ответа API. --rate задает общий лимит
+сообщений в секунду (в боте по умолчанию 30, см. DELIVERY_GLOBAL_RATE).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.delivery import DeliveryQueue  # noqa: E402
+
+
+class MockBot:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send_message(self, chat_id, text, **kwargs):
+        # Время ответа Telegram: от половины до полутора заданного
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+
+async def run(messages: int, chats: int, rate: float, workers: int, api_latency: float):
+    delivery = DeliveryQueue(MockBot(api_latency), workers=workers, global_rate=rate, chat_rate=1)
+    delivery.start()
+    latencies = []
+    started = time.perf_counter()
+    for number in range(messages):
+        queued = time.perf_counter()
+        delivery.send(
+            number % chats, "🔔 Напоминание",
+            on_sent=lambda queued=queued: latencies.append(time.perf_counter() - queued)
+        )
+    await delivery.stop()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"сообщений: {messages}, чатов: {chats}, лимит: {rate}/с, воркеров: {workers}")
+    print(f"отправлено за {elapsed:.2f} с: {messages / elapsed:.0f} сообщений/с")
+    print(
+        f"задержка, мс: p50 {percentile(0.5):.0f}, p95 {percentile(0.95):.0f}, "
+        f"p99 {percentile(0.99):.0f}, среднее {statistics.mean(latencies) * 1000:.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.chats, args.rate, args.workers, args.api_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Импорт и экспорт большого файла задач: строк в секунду и пиковый RSS.
+
+    python bench/bench_import.py [--tasks 100000] [--gzip]
+
+Файл генерируется во временном каталоге, база - временный файл SQLite
+с актуальной схемой. Пиковый RSS - максимум за весь процесс (ru_maxrss).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.database import SQLiteSession, create_migration_engine  # noqa: E402
+from src.exporter import export_tasks  # noqa: E402
+from src.importer import import_tasks, open_import_file  # noqa: E402
+from src.migrations import upgrade  # noqa: E402
+from src.models import User  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # В Linux ru_maxrss - в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_tasks_file(path: str, tasks: int, compress: bool):
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8") as file:
+        file.write("[")
+        for number in range(tasks):
+            file.write(",\n" if number else "\n")
+            json.dump({
+                "title": f"Задача {number}",
+                "description": "Описание задачи " * 4,
+                "is_completed": number % 3 == 0,
+                "created_at": "2026-01-01T08:00:00",
+                "due_date": "2026-12-31T18:00:00+03:00" if number % 2 else None,
+                "priority": ("low", "medium", "high")[number % 3],
+            }, file, ensure_ascii=False)
+        file.write("\n]\n")
+
+
+async def run(tasks: int, compress: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        migration_engine = create_migration_engine(f"sqlite:///{db_path}")
+        upgrade(migration_engine)
+        migration_engine.dispose()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        async with session_maker() as session:
+            session.add(User(id=1, telegram_id=1, notification_time=1))
+            await session.commit()
+
+        path = os.path.join(directory, "tasks.json.gz" if compress else "tasks.json")
+        write_tasks_file(path, tasks, compress)
+        print(f"файл: {tasks} задач, {os.path.getsize(path) / 2 ** 20:.1f} МБ{' (gzip)' if compress else ''}")
+        rss_before = peak_rss_mb()
+
+        started = time.perf_counter()
+        with open(path, "rb") as file, open_import_file(file) as text_file:
+            async with session_maker() as session:
+                imported = await import_tasks(session, 1, text_file)
+        elapsed = time.perf_counter() - started
+        print(
+            f"импорт: {imported} задач за {elapsed:.2f} с, {imported / elapsed:.0f} строк/с, "
+            f"пиковый RSS {peak_rss_mb():.0f} МБ (до импорта {rss_before:.0f} МБ)"
+        )
+
+        started = time.perf_counter()
+        async with session_maker() as session:
+            file, count, _ = await export_tasks(session, 1, "json", compress)
+        file.close()
+        elapsed = time.perf_counter() - started
+        print(f"экспорт: {count} задач за {elapsed:.2f} с, {count / elapsed:.0f} строк/с, пиковый RSS {peak_rss_mb():.0f} МБ")
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.gzip))
+
+
+if __name__ == "__main__":
+    main()
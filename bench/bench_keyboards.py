@@ -0,0 +1,102 @@
+"""Время сборки клавиатур (src/keyboards.py) и их сериализации при отправке.
+
+    python bench/bench_keyboards.py [--tasks 10,50,100] [--repeat 5]
+
+Сборка - вызов get_*_keyboard: кэшированная раскладка и новая разметка
+pydantic. Для списка задач замеряется и сборка без кэша кнопок. Сериализация -
+то, что делает AiohttpSession перед запросом: model_dump метода SendMessage и
+json_dumps разметки (build_form_data), без сети.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+
+import src.database  # noqa: E402,F401
+from src import keyboards  # noqa: E402
+from src.models import Priority, Task  # noqa: E402
+
+BOT_TOKEN = "42:bench"
+
+
+def make_tasks(count: int) -> list:
+    priorities = list(Priority)
+    return [
+        Task(
+            id=task_id,
+            title=f"Задача {task_id}: позвонить в банк",
+            is_completed=task_id % 5 == 0,
+            priority=priorities[task_id % len(priorities)],
+            version=1,
+        )
+        for task_id in range(1, count + 1)
+    ]
+
+
+def get_task_keyboard_uncached(tasks: list) -> object:
+    # Та же раскладка, но строки задач форматируются заново на каждом вызове
+    layout = [
+        keyboards._get_task_row.__wrapped__(task.id, task.version, task.is_completed, task.priority, task.title)
+        for task in tasks
+    ]
+    layout.append((("⬅️ Назад", "page_list_p_1"), ("Далее ➡️", "page_list_n_10")))
+    layout.append((("☑️ Выбрать несколько", "bulk_start"),))
+    return keyboards._inline_markup(layout)
+
+
+def best(function, repeat: int) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure(name: str, build, session: AiohttpSession, bot: Bot, repeat: int):
+    markup = build()
+    method = SendMessage(chat_id=1, text="bench", reply_markup=markup)
+    form_size = len(method.reply_markup.model_dump_json(exclude_none=True))
+    built = best(build, repeat)
+    serialized = best(lambda: session.build_form_data(bot, method), repeat)
+    print(
+        f"{name}: сборка {built * 1e6:.1f} мкс, сериализация {serialized * 1e6:.1f} мкс "
+        f"(разметка ~{form_size} байт)"
+    )
+
+
+async def run(sizes: list, repeat: int):
+    session = AiohttpSession()
+    bot = Bot(BOT_TOKEN, session=session)
+    task = make_tasks(1)[0]
+
+    measure("главная", keyboards.get_main_keyboard, session, bot, repeat)
+    measure("настройки", keyboards.get_settings_keyboard, session, bot, repeat)
+    measure("действия с задачей", lambda: keyboards.get_task_actions_keyboard(task), session, bot, repeat)
+    for size in sizes:
+        tasks = make_tasks(size)
+        measure(
+            f"список из {size} задач",
+            lambda: keyboards.get_task_keyboard(tasks, "list", True, True), session, bot, repeat
+        )
+        measure(
+            f"список из {size} задач без кэша",
+            lambda: get_task_keyboard_uncached(tasks), session, bot, repeat
+        )
+    await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", default="10,50,100")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run([int(size) for size in args.tasks.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
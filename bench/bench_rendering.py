@@ -0,0 +1,111 @@
+"""Время отрисовки списка задач и карточки задачи (src/rendering.py).
+
+    python bench/bench_rendering.py [--sizes 10,100,1000,10000] [--repeat 5] [--timezone Europe/Moscow]
+
+Задачи собираются в памяти, без базы: у половины есть срок (сроки повторяются
+по дням, как в настоящих списках), у трети - категория. Список замеряется
+вместе с разбиением на сообщения split_message. Для сравнения замеряется
+прежняя отрисовка из обработчиков: строки без категорий и часового пояса,
+карточка - склейкой строк через +=.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.database  # noqa: E402,F401
+from src.models import Category, Priority, Task  # noqa: E402
+from src.pagination import TaskPage  # noqa: E402
+from src.rendering import render_task_detail, render_task_page, split_message  # noqa: E402
+
+
+def make_tasks(rng: random.Random, count: int) -> list:
+    categories = [Category(id=index, name=name) for index, name in enumerate(("Работа", "Дом", "Учеба"), 1)]
+    start = datetime(2030, 1, 1, 9)
+    tasks = []
+    for task_id in range(1, count + 1):
+        task = Task(
+            id=task_id,
+            user_id=1,
+            title=f"Задача {task_id}: {rng.choice(('купить', 'позвонить', 'написать', 'проверить'))} {rng.randint(1, 999)}",
+            description="Описание задачи " * rng.randint(0, 5),
+            is_completed=rng.random() < 0.2,
+            priority=rng.choice(list(Priority)),
+            version=1,
+            # Как у загруженной из базы строки: все поля заданы, иначе чтение
+            # незаданного атрибута уходит в загрузчик SQLAlchemy
+            due_date=None,
+            category_id=None,
+            series_id=None,
+        )
+        if rng.random() < 0.5:
+            task.due_date = start + timedelta(days=rng.randint(0, 60), hours=rng.choice((0, 0, 3, 8)))
+        if rng.random() < 0.33:
+            category = rng.choice(categories)
+            task.category_id = category.id
+            task.category = category
+        tasks.append(task)
+    return tasks
+
+
+def old_render_task_page(page: TaskPage) -> str:
+    header = "✅ Выполненные задачи:" if page.view == "done" else "📋 Ваши задачи:"
+    lines = [header, ""]
+    for task in page.tasks:
+        status = "✅" if task.is_completed else "⏳"
+        due_date = f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}" if task.due_date else ""
+        lines.append(f"{status} {task.title}{due_date}")
+    return "\n".join(lines)
+
+
+def old_render_task_detail(task: Task) -> str:
+    text = f"📝 {task.title}\n"
+    if task.description:
+        text += f"\n📋 Описание:\n{task.description}\n"
+    if task.due_date:
+        text += f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}\n"
+    text += f"\nСтатус: {'✅ Выполнено' if task.is_completed else '⏳ В процессе'}"
+    return text
+
+
+def best(function, repeat: int) -> float:
+    # Лучшее из repeat прогонов, каждый - столько вызовов, чтобы набралось ~0.2 с
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(sizes: list, repeat: int, tz: str):
+    rng = random.Random(1)
+    for size in sizes:
+        tasks = make_tasks(rng, size)
+        page = TaskPage("list", tasks, has_prev=False, has_next=False)
+        text = render_task_page(page, tz)
+        chunks = len(split_message(text))
+
+        new = best(lambda: split_message(render_task_page(page, tz)), repeat)
+        old = best(lambda: split_message(old_render_task_page(page)), repeat)
+        new_detail = best(lambda: [render_task_detail(task, tz) for task in tasks], repeat) / size
+        old_detail = best(lambda: [old_render_task_detail(task) for task in tasks], repeat) / size
+        print(
+            f"{size} задач ({len(text)} символов, сообщений: {chunks}): "
+            f"список {new * 1000:.3f} мс (прежний {old * 1000:.3f} мс), "
+            f"карточка {new_detail * 1e6:.2f} мкс (прежняя {old_detail * 1e6:.2f} мкс)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timezone", default="Europe/Moscow")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.repeat, args.timezone)
+
+
+if __name__ == "__main__":
+    main()
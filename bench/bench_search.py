@@ -0,0 +1,130 @@
+"""Задержка поиска по задачам (FTS5) в сравнении с LIKE по тем же задачам.
+
+    python bench/bench_search.py [--tasks 200000] [--users 1000] [--queries 2000] [--vocabulary 20000]
+
+База - временный файл SQLite с актуальной схемой. Запросы - префиксы слов
+из словаря задач, для случайных пользователей. LIKE '%слово%' - то, что делал бы
+поиск без индекса: просмотр всех задач пользователя по индексу (user_id, id).
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import case, insert, or_, select  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.database import SQLiteSession, create_migration_engine  # noqa: E402
+from src.migrations import upgrade  # noqa: E402
+from src.models import Task, User  # noqa: E402
+from src.search import search_tasks  # noqa: E402
+
+# Словарь с частотами по закону Ципфа: несколько частых слов и длинный хвост
+# редких, как в настоящих списках дел. Слова - сочетания слогов, часть - кириллицей
+SYLLABLES = ["ка", "ло", "ми", "ра", "то", "ве", "ну", "ст", "ко", "ре", "pa", "to", "mi", "ne", "ro"]
+
+
+def make_vocabulary(rng: random.Random, size: int) -> list:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_text(rng: random.Random, vocabulary: list, cum_weights: list, words: int) -> str:
+    return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+
+async def like_search(session, user_id: int, query: str, page_size: int = 10):
+    # Как и поиск, совпадения в названии - выше: без этого LIKE останавливался бы
+    # на первых подходящих строках и не просматривал все задачи пользователя
+    terms = query.split()
+    conditions = [or_(Task.title.ilike(f"%{term}%"), Task.description.ilike(f"%{term}%")) for term in terms]
+    title_matches = sum(case((Task.title.ilike(f"%{term}%"), 1), else_=0) for term in terms)
+    result = await session.execute(
+        select(Task).where(Task.user_id == user_id, *conditions)
+        .order_by(title_matches.desc(), Task.id).limit(page_size + 1)
+    )
+    return result.scalars().all()
+
+
+async def measure(session_maker, search, queries):
+    latencies = []
+    for user_id, query in queries:
+        started = time.perf_counter()
+        async with session_maker() as session:
+            await search(session, user_id, query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return (
+        f"p50 {percentile(0.5):.2f} мс, p95 {percentile(0.95):.2f} мс, p99 {percentile(0.99):.2f} мс, "
+        f"{len(latencies) / sum(latencies):.0f} запросов/с, среднее {statistics.mean(latencies) * 1000:.2f} мс"
+    )
+
+
+async def run(tasks: int, users: int, queries: int, vocabulary_size: int):
+    rng = random.Random(1)
+    vocabulary = make_vocabulary(rng, vocabulary_size)
+    rng.shuffle(vocabulary)
+    # Накопленные веса считаются один раз, а не при каждом вызове choices
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        migration_engine = create_migration_engine(f"sqlite:///{db_path}")
+        upgrade(migration_engine)
+        migration_engine.dispose()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+
+        started = time.perf_counter()
+        async with session_maker() as session:
+            await session.execute(insert(User.__table__), [
+                {"id": user_id, "telegram_id": user_id} for user_id in range(1, users + 1)
+            ])
+            for start in range(0, tasks, 10_000):
+                await session.execute(insert(Task.__table__), [
+                    {
+                        "user_id": rng.randint(1, users),
+                        "title": make_text(rng, vocabulary, cum_weights, 3),
+                        "description": make_text(rng, vocabulary, cum_weights, 8),
+                        "is_completed": False,
+                        "version": 1,
+                    }
+                    for _ in range(start, min(start + 10_000, tasks))
+                ])
+            await session.commit()
+        print(f"база: {tasks} задач у {users} пользователей, заполнена за {time.perf_counter() - started:.1f} с")
+
+        # Префиксы слов, взятых с теми же частотами, что и в задачах
+        workload = [
+            (rng.randint(1, users), " ".join(
+                word[:rng.randint(3, len(word))] for word in rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(1, 2))
+            ))
+            for _ in range(queries)
+        ]
+        print(f"FTS5: {await measure(session_maker, search_tasks, workload)}")
+        print(f"LIKE: {await measure(session_maker, like_search, workload)}")
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.users, args.queries, args.vocabulary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Задержка FSM-хранилищ: MemoryStorage, SQLiteStorage и (если указан адрес) RedisStorage.
+
+    python bench/bench_storage.py [--users 1000] [--rounds 5] [--redis-url redis://localhost:6379/0]
+
+Один шаг диалога - set_state, set_data, get_state, get_data для одного
+пользователя, как при вводе задачи по шагам. Файл SQLite - во временном каталоге.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+
+from src.storage import create_storage  # noqa: E402
+
+OPERATIONS = ("set_state", "set_data", "get_state", "get_data")
+
+
+async def measure(storage, users: int, rounds: int) -> dict:
+    latencies = {operation: [] for operation in OPERATIONS}
+    for round_number in range(rounds):
+        for user_id in range(users):
+            key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+            calls = (
+                ("set_state", storage.set_state(key, f"TaskStates:step_{round_number}")),
+                ("set_data", storage.set_data(key, {"title": f"Задача {user_id}", "step": round_number})),
+                ("get_state", storage.get_state(key)),
+                ("get_data", storage.get_data(key)),
+            )
+            for operation, call in calls:
+                started = time.perf_counter()
+                await call
+                latencies[operation].append(time.perf_counter() - started)
+    await storage.close()
+    return latencies
+
+
+def report(name: str, latencies: dict):
+    parts = []
+    for operation in OPERATIONS:
+        values = sorted(latencies[operation])
+        percentile = lambda p: values[min(len(values) - 1, int(len(values) * p))] * 1e6
+        parts.append(f"{operation} p50 {percentile(0.5):.0f} / p99 {percentile(0.99):.0f} мкс")
+    print(f"{name}: " + ", ".join(parts))
+
+
+async def run(users: int, rounds: int, redis_url: str):
+    report("memory", await measure(create_storage("memory"), users, rounds))
+    with tempfile.TemporaryDirectory() as directory:
+        storage = create_storage("sqlite", os.path.join(directory, "fsm.db"), ttl=3600)
+        report("sqlite", await measure(storage, users, rounds))
+    if redis_url:
+        report("redis", await measure(create_storage("redis", redis_url, ttl=3600), users, rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.rounds, args.redis_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Апдейтов в секунду и задержка обработки: webhook против long polling.
+
+    python bench/bench_webhook.py [--mode webhook|polling] [--updates 5000] [--rate 500]
+                                  [--api-latency 0.05] [--handler-latency 0.01]
+
+Синтетические апдейты приходят с постоянной частотой --rate. В режиме webhook
+они отправляются POST-запросами на локальный WebhookServer (src/webhook.py),
+в режиме polling - выдаются фиктивным getUpdates, который имитирует
+длинный опрос Telegram. --api-latency - время запроса к Telegram туда и обратно,
+в webhook-режиме к каждому POST добавляется половина этого времени (путь от Telegram).
+Задержка - от появления апдейта до завершения обработчика.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import ClientSession, web  # noqa: E402
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import GetMe, GetUpdates  # noqa: E402
+from aiogram.types import Message, Update, User  # noqa: E402
+
+from src.webhook import WebhookServer, create_webhook_app  # noqa: E402
+
+BOT_TOKEN = "42:bench"
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1_700_000_000,
+            "chat": {"id": update_id % 1000, "type": "private"},
+            "from": {"id": update_id % 1000, "is_bot": False, "first_name": "Bench"},
+            "text": "/list",
+        },
+    }
+
+
+class MockTelegramSession(BaseSession):
+    """Сессия бота без сети: getUpdates отдает апдейты из очереди, остальные методы - True."""
+
+    def __init__(self, api_latency: float):
+        super().__init__()
+        self.api_latency = api_latency
+        self.pending = []
+        self.arrived = asyncio.Event()
+
+    def push(self, update: dict):
+        self.pending.append(update)
+        self.arrived.set()
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            await asyncio.sleep(self.api_latency)
+            return User(id=42, is_bot=True, first_name="Bench", username="bench_bot")
+        if not isinstance(method, GetUpdates):
+            await asyncio.sleep(self.api_latency)
+            return True
+
+        # Подтвержденные offset апдейты больше не выдаются
+        if method.offset:
+            self.pending = [update for update in self.pending if update["update_id"] >= method.offset]
+        if self.pending:
+            await asyncio.sleep(self.api_latency)
+        else:
+            # Длинный опрос: Telegram отвечает, как только появится апдейт
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), method.timeout or 0)
+            except asyncio.TimeoutError:
+                return []
+            await asyncio.sleep(self.api_latency / 2)
+        batch = self.pending[:method.limit or 100]
+        return [Update.model_validate(update, context={"bot": bot}) for update in batch]
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def create_dispatcher(sent_at: dict, latencies: list, done: asyncio.Event, total: int, handler_latency: float):
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        # Работа обработчика: запросы к базе и ответ пользователю
+        await asyncio.sleep(handler_latency)
+        latencies.append(time.perf_counter() - sent_at[message.message_id])
+        if len(latencies) == total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def produce(updates: int, rate: float, sent_at: dict, deliver):
+    # Открытая нагрузка: апдейты появляются по расписанию, не дожидаясь обработки
+    started = time.perf_counter()
+    for update_id in range(1, updates + 1):
+        delay = started + update_id / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent_at[update_id] = time.perf_counter()
+        deliver(make_update(update_id))
+
+
+async def run(mode: str, updates: int, rate: float, api_latency: float, handler_latency: float,
+              max_concurrency: int, max_pending: int):
+    sent_at, latencies, done = {}, [], asyncio.Event()
+    dp = create_dispatcher(sent_at, latencies, done, updates, handler_latency)
+    session = MockTelegramSession(api_latency)
+    bot = Bot(BOT_TOKEN, session=session)
+    rejected = 0
+    background = set()
+
+    if mode == "polling":
+        polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+        deliver = session.push
+    else:
+        server = WebhookServer(dp, bot, max_concurrency=max_concurrency, max_pending=max_pending)
+        runner = web.AppRunner(create_webhook_app(server), access_log=None)
+        await runner.setup()
+        port = free_port()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        client = ClientSession()
+        url = f"http://127.0.0.1:{port}/webhook"
+
+        async def post(update: dict):
+            nonlocal rejected
+            await asyncio.sleep(api_latency / 2)
+            # Telegram повторяет доставку, пока сервер отвечает ошибкой
+            while True:
+                async with client.post(url, json=update) as response:
+                    if response.status == 200:
+                        return
+                rejected += 1
+                await asyncio.sleep(0.1)
+
+        def deliver(update: dict):
+            task = asyncio.create_task(post(update))
+            background.add(task)
+            task.add_done_callback(background.discard)
+
+    started = time.perf_counter()
+    await produce(updates, rate, sent_at, deliver)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    if mode == "polling":
+        await dp.stop_polling()
+        await polling
+    else:
+        await server.drain()
+        await client.close()
+        await runner.cleanup()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(
+        f"{mode}: {updates} апдейтов за {elapsed:.2f} с, {updates / elapsed:.0f} апдейтов/с; "
+        f"задержка, мс: p50 {percentile(0.5):.0f}, p95 {percentile(0.95):.0f}, p99 {percentile(0.99):.0f}"
+        + (f"; ответов 503: {rejected}" if rejected else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("webhook", "polling"), default="webhook")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=500)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--handler-latency", type=float, default=0.01)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=256)
+    args = parser.parse_args()
+    asyncio.run(run(
+        args.mode, args.updates, args.rate, args.api_latency, args.handler_latency,
+        args.max_concurrency, args.max_pending
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.fsm.middleware import FSMContextMiddleware
-from aiogram.types import Update
-from config.config import BOT_TOKEN
-from src.database import engine, Base, SessionLocal, get_db, sync_engine
-from src.handlers import router, check_notifications
+from aiogram import Bot
+from config.config import (
+    BOT_TOKEN, WORKERS,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONCURRENCY, WEBHOOK_MAX_PENDING
+)
+from src.database import init_db
+from src.app import create_dispatcher, start_services, stop_services
+from src.handlers import router
+from src.webhook import run_webhook
+from src.workers import start_workers, stop_workers, create_router_dispatcher
 
 # Настройка логирования
 logging.basicConfig(
@@ -15,44 +19,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class DatabaseSessionMiddleware:
-    def __init__(self, session_maker):
-        self.session_maker = session_maker
-
-    async def __call__(self, handler, event, data):
-        async with self.session_maker() as session:
-            data["session"] = session
-            try:
-                return await handler(event, data)
-            finally:
-                await session.close()
+async def run(dp, bot, **kwargs):
+    # Типы апдейтов берем из роутера с обработчиками: у диспетчера-маршрутизатора
+    # воркеров (WORKERS > 1) своих обработчиков нет
+    allowed_updates = router.resolve_used_update_types()
+    if WEBHOOK_URL:
+        await run_webhook(
+            dp,
+            bot,
+            WEBHOOK_URL,
+            path=WEBHOOK_PATH,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT,
+            secret_token=WEBHOOK_SECRET,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+            max_pending=WEBHOOK_MAX_PENDING,
+            allowed_updates=allowed_updates
+        )
+    else:
+        # getUpdates не работает, пока у бота установлен webhook
+        await bot.delete_webhook()
+        await dp.start_polling(bot, allowed_updates=allowed_updates, **kwargs)
 
 async def main():
     try:
-        # Создаем таблицы в базе данных используя синхронный движок
-        Base.metadata.create_all(bind=sync_engine)
-        logger.info("Таблицы базы данных успешно созданы")
+        # Применяем миграции схемы базы данных
+        init_db()
         
-        # Инициализируем бота и диспетчер
         bot = Bot(token=BOT_TOKEN)
-        storage = MemoryStorage()
-        dp = Dispatcher()
-        logger.info("Бот и диспетчер успешно инициализированы")
         
-        # Добавляем middleware для базы данных
-        dp.update.middleware(DatabaseSessionMiddleware(SessionLocal))
+        if WORKERS > 1:
+            # Этот процесс только получает апдейты и раздает их воркерам по chat_id
+            queues, processes = start_workers(WORKERS)
+            logger.info(f"Запущено воркеров: {WORKERS}")
+            dp = create_router_dispatcher(queues)
+            try:
+                logger.info("Бот запущен")
+                await run(dp, bot, handle_as_tasks=False)
+            finally:
+                stop_workers(queues, processes)
+            return
         
-        # Регистрируем роутер
-        dp.include_router(router)
-        logger.info("Роутер успешно зарегистрирован")
+        # Инициализируем диспетчер
+        dp = create_dispatcher()
+        logger.info("Бот и диспетчер успешно инициализированы")
         
-        # Запускаем проверку уведомлений в фоновом режиме
-        asyncio.create_task(check_notifications(bot, engine))
-        logger.info("Фоновая задача проверки уведомлений запущена")
+        await start_services(dp, bot)
         
         # Запускаем бота
         logger.info("Бот запущен")
-        await dp.start_polling(bot, storage=storage)
+        try:
+            await run(dp, bot)
+        finally:
+            await stop_services(dp)
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
         raise
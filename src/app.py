@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from aiogram import Dispatcher
+from config.config import (
+    DELIVERY_WORKERS, DELIVERY_GLOBAL_RATE, DELIVERY_CHAT_RATE, METRICS_HOST, METRICS_PORT, METRICS_LOG_INTERVAL
+)
+from .database import SessionLocal
+from .delivery import DeliveryQueue
+from .handlers import router
+from .instrumentation import TelegramApiMetricsMiddleware, monitor_event_loop, log_metrics
+from .metrics import start_metrics_server
+from .middlewares import (
+    DatabaseSessionMiddleware, UserMiddleware, HandlerTagMiddleware, UpdateMetricsMiddleware
+)
+from .scheduler import ReminderScheduler
+from .storage import create_storage
+
+logger = logging.getLogger(__name__)
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=create_storage())
+    
+    # Время и количество апдейтов по обработчикам
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    
+    # Добавляем middleware для базы данных
+    dp.update.middleware(HandlerTagMiddleware("update"))
+    dp.update.middleware(DatabaseSessionMiddleware(SessionLocal))
+    dp.update.middleware(UserMiddleware())
+    
+    # Запросы внутри обработчиков помечаем их именами
+    router.message.middleware(HandlerTagMiddleware())
+    router.callback_query.middleware(HandlerTagMiddleware())
+    
+    # Регистрируем роутер
+    dp.include_router(router)
+    return dp
+
+
+async def start_services(dp: Dispatcher, bot, shard_index: int = 0, shard_count: int = 1):
+    # Метрики: эндпоинт /metrics, время запросов к API, задержка цикла событий
+    if METRICS_PORT:
+        # У каждого воркера свой порт: METRICS_PORT + 1, + 2, ...
+        port = METRICS_PORT + shard_index + 1 if shard_count > 1 else METRICS_PORT
+        dp["metrics_runner"] = await start_metrics_server(port, METRICS_HOST)
+    bot.session.middleware(TelegramApiMetricsMiddleware())
+    monitors = [asyncio.create_task(monitor_event_loop())]
+    if METRICS_LOG_INTERVAL:
+        monitors.append(asyncio.create_task(log_metrics(METRICS_LOG_INTERVAL)))
+    dp["metrics_tasks"] = monitors
+    
+    # Запускаем очередь исходящих сообщений
+    delivery = DeliveryQueue(
+        bot,
+        workers=DELIVERY_WORKERS,
+        global_rate=DELIVERY_GLOBAL_RATE / shard_count,
+        chat_rate=DELIVERY_CHAT_RATE
+    )
+    delivery.start()
+    dp["delivery"] = delivery
+    
+    # Загружаем очередь напоминаний и запускаем планировщик в фоновом режиме
+    scheduler = ReminderScheduler(
+        SessionLocal,
+        delivery,
+        shard_index=shard_index,
+        shard_count=shard_count
+    )
+    await scheduler.load()
+    dp["scheduler"] = scheduler
+    dp["scheduler_task"] = asyncio.create_task(scheduler.run())
+    logger.info("Планировщик напоминаний запущен")
+
+
+async def stop_services(dp: Dispatcher):
+    tasks = dp.workflow_data.pop("metrics_tasks", [])
+    task = dp.workflow_data.pop("scheduler_task", None)
+    if task is not None:
+        tasks.append(task)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    delivery = dp.workflow_data.get("delivery")
+    if delivery is not None:
+        await delivery.stop()
+    # Напоминания, доставленные при разборе очереди, иначе отправились бы снова после перезапуска
+    scheduler = dp.workflow_data.get("scheduler")
+    if scheduler is not None:
+        await scheduler.flush_notified()
+    metrics_runner = dp.workflow_data.pop("metrics_runner", None)
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Tuple
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from config.config import CATEGORY_CACHE_SIZE, CATEGORY_CACHE_TTL, MAX_USER_CATEGORIES
+from .cache import TTLCache
+from .models import Category, UserCategory
+
+
+@dataclass(frozen=True)
+class CachedCategory:
+    # Снимок категории пользователя, который безопасно хранить между сессиями;
+    # color - цвет, выбранный пользователем, или цвет из categories
+    id: int
+    name: str
+    color: str
+
+
+class CategoryLimitError(Exception):
+    pass
+
+
+# user_id -> кортеж CachedCategory, отсортированный по имени.
+# Сбрасывается при добавлении категории пользователем (add_user_category)
+category_cache = TTLCache(maxsize=CATEGORY_CACHE_SIZE, ttl=CATEGORY_CACHE_TTL)
+
+
+async def get_user_categories(session, user_id: int) -> Tuple[CachedCategory, ...]:
+    cached = category_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Одним запросом через таблицу связей user_categories
+    result = await session.execute(
+        select(Category.id, Category.name, func.coalesce(UserCategory.color, Category.color))
+        .join(UserCategory, UserCategory.category_id == Category.id)
+        .where(UserCategory.user_id == user_id)
+        .order_by(Category.name)
+        .limit(MAX_USER_CATEGORIES)
+    )
+    categories = tuple(CachedCategory(*row) for row in result.all())
+    category_cache.set(user_id, categories)
+    return categories
+
+
+async def add_user_category(session, user_id: int, name: str, color: str) -> CachedCategory:
+    """Добавляет категорию в список пользователя.
+
+    Имя категории уникально во всей таблице categories, поэтому категория
+    с уже существующим именем не создается заново, а связывается с пользователем.
+    Цвет хранится в связи user_categories: выбор одного пользователя не меняет
+    цвет той же категории у других. Повторное добавление меняет цвет.
+    """
+    category = await session.scalar(select(Category).where(Category.name == name))
+    link = await session.get(UserCategory, (user_id, category.id)) if category is not None else None
+    if link is None:
+        count = await session.scalar(
+            select(func.count()).select_from(UserCategory).where(UserCategory.user_id == user_id)
+        )
+        if count >= MAX_USER_CATEGORIES:
+            raise CategoryLimitError(MAX_USER_CATEGORIES)
+
+    if category is None:
+        category = Category(name=name, color=color)
+        session.add(category)
+        await session.flush()
+
+    if link is None:
+        session.add(UserCategory(user_id=user_id, category_id=category.id, color=color))
+    else:
+        # Категория уже есть в списке пользователя
+        link.color = color
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Ту же категорию параллельно добавил другой запрос
+        await session.rollback()
+    finally:
+        category_cache.pop(user_id)
+    return CachedCategory(category.id, category.name, color)
@@ -1,7 +1,15 @@
-from sqlalchemy import create_engine
+import asyncio
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import logging
+from config.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT, SQLITE_BUSY_TIMEOUT,
+    SQL_ECHO
+)
+from .instrumentation import instrument_engine
 
 logger = logging.getLogger(__name__)
 
@@ -11,47 +19,205 @@ Base = declarative_base()
 # Импортируем модели после создания Base
 from .models import User, Task, Category, Priority, UserCategory
 
-# Синхронный движок для создания таблиц
-SQLALCHEMY_DATABASE_URL = "sqlite:///./todo.db"
-sync_engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Драйверы для DATABASE_URL без явного драйвера: (асинхронный, синхронный для миграций)
+DRIVERS = {
+    "sqlite": ("sqlite+aiosqlite", "sqlite"),
+    "postgresql": ("postgresql+asyncpg", "postgresql+psycopg2"),
+    "postgres": ("postgresql+asyncpg", "postgresql+psycopg2"),
+}
+
+
+def get_database_url(url: str = DATABASE_URL, is_async: bool = True):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS:
+        raise ValueError(f"Неподдерживаемая база данных: {backend}")
+    async_driver, sync_driver = DRIVERS[backend]
+    return url.set(drivername=async_driver if is_async else sync_driver)
+
+
+def _tune_sqlite(engine):
+    # WAL: читатели не блокируют писателя; busy_timeout: писатели ждут друг друга,
+    # а не падают с "database is locked"; synchronous=NORMAL безопасен в режиме WAL
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL):
+    url = get_database_url(url)
+    if url.get_backend_name() == "sqlite":
+        engine = create_async_engine(
+            url,
+            echo=SQL_ECHO,
+            connect_args={"check_same_thread": False}
+        )
+        _tune_sqlite(engine.sync_engine)
+    else:
+        engine = create_async_engine(
+            url,
+            echo=SQL_ECHO,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+    instrument_engine(engine)
+    return engine
+
+
+def _transactional_ddl(engine):
+    # pysqlite сам открывает транзакцию только перед DML и фиксирует ее перед DDL,
+    # поэтому ALTER TABLE оказался бы вне транзакции миграции. Отключаем его
+    # управление транзакциями и начинаем их явно
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_sqlite_transaction(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def create_migration_engine(url: str = DATABASE_URL):
+    # Синхронный движок нужен только для миграций схемы
+    url = get_database_url(url, is_async=False)
+    if url.get_backend_name() == "sqlite":
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        _tune_sqlite(engine)
+        _transactional_ddl(engine)
+        return engine
+    return create_engine(url, pool_pre_ping=True)
+
+
+# В SQLite одновременно пишет только одно соединение: очередь писателей держим
+# в процессе, чтобы они ждали на asyncio.Lock, а не на busy_timeout внутри SQLite.
+# Блокировка действует только внутри одного процесса: воркеры (WORKERS > 1)
+# по-прежнему конкурируют за запись и ждут друг друга на busy_timeout
+_sqlite_write_lock = None
+
+
+def _get_write_lock() -> asyncio.Lock:
+    global _sqlite_write_lock
+    if _sqlite_write_lock is None:
+        _sqlite_write_lock = asyncio.Lock()
+    return _sqlite_write_lock
+
+
+class SQLiteSession(AsyncSession):
+    """Сессия, которая берет блокировку писателя процесса при первой записи
+    и отпускает ее по завершении транзакции.
+
+    Пока транзакция открыта, остальные записи процесса ждут, поэтому между
+    первой записью и commit не должно быть запросов к Telegram и других ожиданий.
+    """
+
+    _holds_write_lock = False
+
+    async def _acquire_write_lock(self):
+        if not self._holds_write_lock:
+            await _get_write_lock().acquire()
+            self._holds_write_lock = True
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            _get_write_lock().release()
+
+    def _has_changes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            await self._acquire_write_lock()
+        return await super().execute(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        if self._has_changes():
+            await self._acquire_write_lock()
+        await super().flush(objects)
+
+    async def commit(self):
+        if self._has_changes():
+            await self._acquire_write_lock()
+        try:
+            await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self):
+        try:
+            await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            self._release_write_lock()
+
 
 # Асинхронный движок для работы с базой данных
-ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./todo.db"
-engine = create_async_engine(
-    ASYNC_SQLALCHEMY_DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False}
-)
+engine = create_db_engine()
 
 # Создаем асинхронную сессию
 SessionLocal = sessionmaker(
     engine,
-    class_=AsyncSession,
+    class_=SQLiteSession if engine.dialect.name == "sqlite" else AsyncSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False
 )
 
-# Создаем все таблицы синхронно
+# Файлы, в которых прежние версии хранили базу SQLite по умолчанию
+# (todo_bot.db - старое значение DATABASE_URL, todobot.db - старый README)
+LEGACY_SQLITE_FILES = ("todo.db", "todo_bot.db", "todobot.db")
+
+
+def check_sqlite_file(url: str = DATABASE_URL):
+    """Предупреждает, если файла базы SQLite нет, а рядом лежит база
+    от прежних настроек: иначе бот молча начнет с пустой базы."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    path = os.path.abspath(url.database)
+    if os.path.exists(path):
+        return None
+    for name in LEGACY_SQLITE_FILES:
+        legacy = os.path.abspath(name)
+        if legacy != path and os.path.exists(legacy):
+            logger.warning(
+                f"Файл базы {path} не найден, но есть {legacy} от прежних настроек. "
+                f"Будет создана пустая база; чтобы сохранить данные, укажите "
+                f"DATABASE_URL=sqlite:///{name} или переименуйте файл"
+            )
+            return legacy
+    return None
+
+
+# Приводим схему к актуальной версии миграциями
 def init_db():
+    from .migrations import upgrade
+    check_sqlite_file()
+    migration_engine = create_migration_engine()
     try:
-        Base.metadata.create_all(bind=sync_engine)
-        logger.info("Таблицы базы данных успешно созданы")
+        upgrade(migration_engine)
+        logger.info("Схема базы данных актуальна")
     except Exception as e:
-        logger.error(f"Ошибка при создании таблиц: {e}")
+        logger.error(f"Ошибка при миграции базы данных: {e}")
         raise
-
-# Инициализируем базу данных
-init_db()
-
-logger.info("Асинхронная база данных успешно инициализирована")
+    finally:
+        migration_engine.dispose()
 
 async def get_db():
     async with SessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
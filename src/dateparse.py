@@ -0,0 +1,368 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from .models import Priority
+
+# Разбор сроков на русском и английском: "завтра в 18:00", "через 3 дня",
+# "next fri", "25 декабря", "31.12.2026 23:59". Все выражения собраны в таблицы
+# заранее скомпилированных регулярных выражений; время - местное время пользователя.
+# Срок без времени - конец дня (END_OF_DAY): "сегодня" не должно означать
+# уже прошедшую полночь
+
+
+class DateParseError(ValueError):
+    pass
+
+
+def _forms(groups: dict) -> dict:
+    # {значение: "форма1 форма2 ..."} -> {форма: значение}
+    return {form: value for value, forms in groups.items() for form in forms.split()}
+
+
+MONTHS = _forms({
+    1: "января январь янв january jan",
+    2: "февраля февраль фев february feb",
+    3: "марта март мар march mar",
+    4: "апреля апрель апр april apr",
+    5: "мая май may",
+    6: "июня июнь июн june jun",
+    7: "июля июль июл july jul",
+    8: "августа август авг august aug",
+    9: "сентября сентябрь сент сен september sept sep",
+    10: "октября октябрь окт october oct",
+    11: "ноября ноябрь ноя november nov",
+    12: "декабря декабрь дек december dec",
+})
+
+# Формы "в пятницу", "к пятнице", "до пятницы"
+WEEKDAYS = _forms({
+    0: "понедельник понедельнику понедельника пн monday mon",
+    1: "вторник вторнику вторника вт tuesday tues tue",
+    2: "среда среду среде среды ср wednesday wed",
+    3: "четверг четвергу четверга чт thursday thurs thu",
+    4: "пятница пятницу пятнице пятницы пт friday fri",
+    5: "суббота субботу субботе субботы сб saturday sat",
+    6: "воскресенье воскресенью воскресенья вс sunday sun",
+})
+
+# Сокращения, совпадающие с обычными словами ("sun cream", "sat solver"):
+# днем недели считаются только после on/by/next/this
+AMBIGUOUS_WEEKDAYS = {"sun", "sat", "wed"}
+
+NUMBERS = _forms({
+    1: "один одну одна a an one",
+    2: "два две пару two couple",
+    3: "три three", 4: "четыре four", 5: "пять five", 6: "шесть six",
+    7: "семь seven", 8: "восемь eight", 9: "девять nine", 10: "десять ten",
+})
+
+# Форма единицы -> (единица, множитель)
+UNITS = _forms({
+    ("minutes", 1): "минуту минуты минут мин minute minutes min mins",
+    ("hours", 1): "час часа часов hour hours",
+    ("days", 1): "день дня дней day days",
+    ("days", 7): "неделю недели недель week weeks",
+    ("months", 1): "месяц месяца месяцев month months",
+})
+
+# Время суток словами
+DAY_PARTS = {
+    "утром": 9,
+    "днем": 13, "днём": 13,
+    "в полдень": 12, "noon": 12, "at noon": 12,
+    "вечером": 19,
+}
+
+# Английские существительные ("Good morning routine") - только после
+# in the/this или сразу после даты: "tomorrow morning", "fri evening"
+EN_DAY_PARTS = {"morning": 9, "afternoon": 14, "evening": 19}
+
+PRIORITIES = {
+    "high": Priority.HIGH, "h": Priority.HIGH, "1": Priority.HIGH, "высокий": Priority.HIGH, "в": Priority.HIGH,
+    "medium": Priority.MEDIUM, "m": Priority.MEDIUM, "2": Priority.MEDIUM, "средний": Priority.MEDIUM, "с": Priority.MEDIUM,
+    "low": Priority.LOW, "l": Priority.LOW, "3": Priority.LOW, "низкий": Priority.LOW, "н": Priority.LOW,
+}
+
+
+def _alternation(words) -> str:
+    # Длинные варианты раньше коротких: "сент" не должен совпасть как "сен"
+    return "|".join(sorted((re.escape(word) for word in words), key=len, reverse=True))
+
+
+# Время для сроков без времени: "завтра", "через 3 дня", "25.12.2026"
+END_OF_DAY = (23, 59)
+
+# "в 5" без уточнения - скорее 17:00, чем 05:00: часы до LATEST_BARE_MORNING_HOUR
+# без "утра"/"ночи"/am считаются дневными
+LATEST_BARE_MORNING_HOUR = 7
+
+_FLAGS = re.IGNORECASE
+_MONTH = rf"(?:{_alternation(MONTHS)})"
+_WEEKDAY = rf"(?:{_alternation(set(WEEKDAYS) - AMBIGUOUS_WEEKDAYS)})"
+_NUMBER = rf"\d+|{_alternation(NUMBERS)}"
+_UNIT = rf"(?:{_alternation(UNITS)})"
+# Предлог - отдельное слово: без (?<!\w) "on" совпал бы с концом "Lisbon"
+_PREP = r"(?:(?<!\w)(?:в|во|на|до|к|ко|at|on|by)\s+)?"
+
+# Дата в тексте, где ищется время, заменяется этим символом: позиции
+# совпадений сохраняются, а шаблоны времени видят, где стояла дата
+_MASK = "\x00"
+
+# Быстрый путь: формат, который бот понимал и раньше, без обхода таблиц
+_FAST_RE = re.compile(r"^\s*(\d{1,2})\.(\d{1,2})\.(\d{4})(?:\s+(\d{1,2}):(\d{2}))?\s*$")
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[datetime]:
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(now: datetime, month: int, day: int) -> Optional[datetime]:
+    # Дата без года - ближайшая, не раньше сегодняшнего дня
+    date = _safe_date(now.year, month, day)
+    if date is not None and date < now.replace(hour=0, minute=0, second=0, microsecond=0):
+        date = _safe_date(now.year + 1, month, day)
+    return date
+
+
+def _year(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+
+def _number(value: Optional[str]) -> int:
+    if not value:
+        return 1
+    return int(value) if value.isdigit() else NUMBERS[value.lower()]
+
+
+def _add_months(date: datetime, months: int) -> datetime:
+    index = date.month - 1 + months
+    year, month = date.year + index // 12, index % 12 + 1
+    for day in (date.day, 30, 29, 28):
+        moved = _safe_date(year, month, day)
+        if moved is not None:
+            return moved.replace(hour=date.hour, minute=date.minute)
+
+
+def _today(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Обработчики получают совпадение и "сейчас" и возвращают (дата, есть ли время)
+# или None, если совпадение оказалось не датой (например, 31.02)
+
+def _iso(match, now):
+    date = _safe_date(int(match[1]), int(match[2]), int(match[3]))
+    return date and (date, False)
+
+
+def _numeric(match, now):
+    day, month = int(match[1]), int(match[2] or match[4])
+    year = _year(match[3])
+    date = _safe_date(year, month, day) if year else _upcoming(now, month, day)
+    return date and (date, False)
+
+
+def _day_month(match, now):
+    month = MONTHS[match[2].lower()]
+    year = _year(match[3])
+    date = _safe_date(year, month, int(match[1])) if year else _upcoming(now, month, int(match[1]))
+    return date and (date, False)
+
+
+def _month_day(match, now):
+    month = MONTHS[match[1].lower()]
+    year = _year(match[3])
+    date = _safe_date(year, month, int(match[2])) if year else _upcoming(now, month, int(match[2]))
+    return date and (date, False)
+
+
+def _relative(match, now):
+    unit, multiplier = UNITS[match[2].lower()]
+    amount = _number(match[1]) * multiplier
+    if unit == "minutes":
+        return now.replace(second=0, microsecond=0) + timedelta(minutes=amount), True
+    if unit == "hours":
+        return now.replace(second=0, microsecond=0) + timedelta(hours=amount), True
+    if unit == "months":
+        return _add_months(_today(now), amount), False
+    return _today(now) + timedelta(days=amount), False
+
+
+def _keyword(days: int):
+    def handler(match, now):
+        return _today(now) + timedelta(days=days), False
+    return handler
+
+
+def _weekday(match, now):
+    weekday = WEEKDAYS[match[1].lower()]
+    # Ближайший такой день после сегодняшнего ("в пятницу" в пятницу - через неделю)
+    days = (weekday - now.weekday()) % 7 or 7
+    return _today(now) + timedelta(days=days), False
+
+
+DATE_PATTERNS: List[Tuple[re.Pattern, Callable]] = [
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), _iso),
+    # ДД.ММ[.ГГГГ]; без года месяц - две цифры, иначе "глава 1.2" стала бы 1 февраля
+    (re.compile(
+        rf"{_PREP}(?<![\w.])(\d{{1,2}})[./](?:(\d{{1,2}})[./](\d{{4}}|\d{{2}})|(\d{{2}}))(?![\w.:/])", _FLAGS
+    ), _numeric),
+    (re.compile(rf"{_PREP}\b(\d{{1,2}})\s+({_MONTH})\.?(?:\s+(\d{{4}}))?(?!\w)", _FLAGS), _day_month),
+    (re.compile(rf"{_PREP}\b({_MONTH})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b", _FLAGS), _month_day),
+    (re.compile(rf"\b(?:через|in)\s+(?:({_NUMBER})\s+)?({_UNIT})(?!\w)", _FLAGS), _relative),
+    (re.compile(r"\b(?:послезавтра|day after tomorrow)\b", _FLAGS), _keyword(2)),
+    (re.compile(r"\b(?:сегодня|today)\b", _FLAGS), _keyword(0)),
+    (re.compile(r"\btonight\b", _FLAGS), lambda match, now: (_today(now).replace(hour=20), True)),
+    (re.compile(r"\b(?:завтра|tomorrow)\b", _FLAGS), _keyword(1)),
+    (re.compile(
+        rf"{_PREP}\b(?:(?:следующ|ближайш|эт)[а-я]*\s+|(?:next|this)\s+)?({_WEEKDAY})(?!\w)", _FLAGS
+    ), _weekday),
+    (re.compile(
+        rf"(?<!\w)(?:on|by|next|this)\s+({_alternation(AMBIGUOUS_WEEKDAYS)})(?!\w)", _FLAGS
+    ), _weekday),
+]
+
+
+def _clock(hour: int, minute: int, suffix: Optional[str]) -> Optional[Tuple[int, int]]:
+    if suffix:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if suffix.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _hour(match, now):
+    hour = int(match[1])
+    part = match[2].lower() if match[2] else None
+    # "в 7 вечера" - 19:00, "в 3 дня" - 15:00, "в 5" - 17:00, "в 5 утра" - 05:00
+    if part in ("дня", "вечера") and hour < 12 or part is None and 1 <= hour <= LATEST_BARE_MORNING_HOUR:
+        hour += 12
+    return _clock(hour, 0, None)
+
+
+TIME_PATTERNS: List[Tuple[re.Pattern, Callable]] = [
+    # 18:00, в 9:30, at 6:30pm
+    (re.compile(r"(?:\b(?:в|во|к|at)\s+)?\b(\d{1,2}):(\d{2})\s*(am|pm)?\b", _FLAGS),
+     lambda match, now: _clock(int(match[1]), int(match[2]), match[3])),
+    # 6pm, at 11 am
+    (re.compile(r"(?:\bat\s+)?\b(\d{1,2})\s*(am|pm)\b", _FLAGS),
+     lambda match, now: _clock(int(match[1]), 0, match[2])),
+    # "в 18 часов", "в 7 вечера" или "в 18" в конце фразы: иначе "в 2 раза" стало бы временем
+    (re.compile(
+        r"\b(?:в|во|к|at)\s+(\d{1,2})(?:\s*(?:ч|час|часа|часов)\b)?"
+        rf"(?:\s+(утра|дня|вечера|ночи)\b|(?=[\s{_MASK}]*(?:$|[,.;])))", _FLAGS
+    ), _hour),
+    # "с днем рождения" - не время суток
+    (re.compile(rf"(?<!\w)(?<!\bс )(?:{_alternation(DAY_PARTS)})(?!\w)", _FLAGS),
+     lambda match, now: (DAY_PARTS[match[0].lower()], 0)),
+    (re.compile(
+        rf"(?:(?<!\w)(?:in\s+the|this)\s+|(?<={_MASK})\s+)({_alternation(EN_DAY_PARTS)})(?!\w)", _FLAGS
+    ), lambda match, now: (EN_DAY_PARTS[match[1].lower()], 0)),
+]
+
+
+def _search(patterns, text: str, now: datetime):
+    # Первое подходящее совпадение по порядку таблицы
+    for pattern, handler in patterns:
+        for match in pattern.finditer(text):
+            value = handler(match, now)
+            if value:
+                return value, match.span()
+    return None, None
+
+
+def _cut(text: str, *spans) -> str:
+    for start, end in sorted((span for span in spans if span), reverse=True):
+        text = text[:start] + " " + text[end:]
+    return " ".join(text.split())
+
+
+def extract_due(text: str, now: datetime) -> Tuple[Optional[datetime], str]:
+    """Находит срок в тексте; возвращает (срок или None, текст без выражения срока).
+
+    now - текущее местное время пользователя.
+    """
+    date, date_span = _search(DATE_PATTERNS, text, now)
+    # Время ищется в тексте без даты
+    masked = text
+    if date_span:
+        masked = text[:date_span[0]] + _MASK * (date_span[1] - date_span[0]) + text[date_span[1]:]
+    clock, time_span = _search(TIME_PATTERNS, masked, now)
+
+    if date is None and clock is None:
+        return None, text.strip()
+
+    if date is None:
+        # Только время: сегодня, а если оно уже прошло - завтра
+        due = _today(now).replace(hour=clock[0], minute=clock[1])
+        if due <= now:
+            due += timedelta(days=1)
+    else:
+        due, has_time = date
+        if not has_time:
+            hour, minute = clock or END_OF_DAY
+            due = due.replace(hour=hour, minute=minute)
+    return due, _cut(text, date_span, time_span)
+
+
+def parse_due(text: str, now: datetime) -> datetime:
+    """Срок из сообщения целиком (ответ на вопрос о дате)."""
+    match = _FAST_RE.match(text)
+    if match:
+        day, month, year, hour, minute = match.groups()
+        due = _safe_date(int(year), int(month), int(day))
+        if due is not None:
+            clock = _clock(int(hour), int(minute), None) if hour else END_OF_DAY
+            if clock is not None:
+                return due.replace(hour=clock[0], minute=clock[1])
+
+    due, rest = extract_due(text, now)
+    # Все сообщение должно быть сроком: иначе лучше переспросить, чем угадать
+    if due is None or rest.strip(" ,.-"):
+        raise DateParseError(text)
+    return due
+
+
+@dataclass
+class QuickTask:
+    title: str
+    due_date: Optional[datetime] = None
+    priority: Optional[Priority] = None
+    category: Optional[str] = None
+
+
+_PRIORITY_RE = re.compile(r"(?<!\S)!(\w+)(?!\S)")
+_CATEGORY_RE = re.compile(r"(?<!\S)#(\w+)(?!\S)")
+
+
+def parse_quick_add(text: str, now: datetime) -> QuickTask:
+    """Задача одним сообщением: "Купить молоко завтра в 18:00 !high #дом".
+
+    !приоритет - high/medium/low, h/m/l, 1/2/3 или высокий/средний/низкий;
+    #категория - одно слово; срок - любое выражение, которое понимает extract_due.
+    """
+    priority = None
+    spans = []
+    for match in _PRIORITY_RE.finditer(text):
+        if match[1].lower() in PRIORITIES:
+            priority = PRIORITIES[match[1].lower()]
+            spans.append(match.span())
+    category = None
+    for match in _CATEGORY_RE.finditer(text):
+        category = match[1]
+        spans.append(match.span())
+    text = _cut(text, *spans)
+
+    due_date, title = extract_due(text, now)
+    if not title:
+        raise DateParseError("Нужно название задачи")
+    return QuickTask(title, due_date, priority, category)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket с резервированием: take() списывает токен сразу
+    и возвращает, сколько секунд нужно подождать до отправки."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def is_idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+@dataclass
+class OutboundMessage:
+    chat_id: int
+    text: str
+    kwargs: dict = field(default_factory=dict)
+    on_sent: Optional[Callable[[], None]] = None
+    on_failed: Optional[Callable[[], None]] = None
+    attempts: int = 0
+
+
+class DeliveryQueue:
+    """Асинхронная очередь исходящих сообщений с пулом воркеров.
+
+    Ограничивает общую скорость отправки и скорость для каждого чата,
+    а при ответе 429 приостанавливает всех воркеров на retry_after секунд.
+    """
+
+    def __init__(
+        self,
+        bot,
+        workers: int = 4,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        max_attempts: int = 3
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue[OutboundMessage] = asyncio.Queue()
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        # Дожидаемся отправки всего, что уже поставлено в очередь
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def send(
+        self,
+        chat_id: int,
+        text: str,
+        on_sent: Optional[Callable[[], None]] = None,
+        on_failed: Optional[Callable[[], None]] = None,
+        **kwargs
+    ):
+        # on_sent вызывается после отправки, on_failed - если сообщение так и не ушло
+        self._queue.put_nowait(OutboundMessage(chat_id, text, kwargs, on_sent, on_failed))
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle()
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+        return bucket
+
+    async def _wait_turn(self, chat_id: int):
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        delay = max(self._global_bucket.take(), self._chat_bucket(chat_id).take())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item: OutboundMessage):
+        while True:
+            item.attempts += 1
+            await self._wait_turn(item.chat_id)
+            try:
+                await self.bot.send_message(item.chat_id, item.text, **item.kwargs)
+            except TelegramRetryAfter as e:
+                logger.warning(f"Превышен лимит Telegram, пауза {e.retry_after} с")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                if item.attempts >= self.max_attempts:
+                    logger.error(f"Сообщение в чат {item.chat_id} не доставлено: {e}")
+                    self._callback(item.on_failed)
+                    return
+                continue
+            except Exception as e:
+                logger.error(f"Ошибка при отправке сообщения в чат {item.chat_id}: {e}")
+                self._callback(item.on_failed)
+                return
+            break
+
+        self._callback(item.on_sent)
+
+    @staticmethod
+    def _callback(callback: Optional[Callable[[], None]]):
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике доставки: {e}")
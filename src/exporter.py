@@ -0,0 +1,103 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import datetime
+from aiogram.types import InputFile
+from sqlalchemy import select
+from config.config import EXPORT_SPOOL_SIZE
+from .models import Task, Category
+
+EXPORT_FORMATS = ("json", "ndjson", "csv")
+
+EXPORT_FIELDS = (
+    "title", "description", "is_completed", "created_at",
+    "due_date", "priority", "category", "completed_at"
+)
+
+
+class SpooledInputFile(InputFile):
+    # Отдает aiogram файл по частям, не читая его в память целиком
+    def __init__(self, file, filename: str):
+        super().__init__(filename=filename)
+        self.file = file
+
+    async def read(self, bot):
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+async def iter_task_records(session, user_id: int, batch_size: int = 500):
+    """Потоково читает задачи пользователя вместе с названием категории
+    (JOIN вместо ленивой загрузки task.category на каждую строку)."""
+    result = await session.stream(
+        select(
+            Task.title,
+            Task.description,
+            Task.is_completed,
+            Task.created_at,
+            Task.due_date,
+            Task.priority,
+            Category.name,
+            Task.completed_at
+        )
+        .outerjoin(Category, Task.category_id == Category.id)
+        .where(Task.user_id == user_id)
+        .order_by(Task.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for title, description, is_completed, created_at, due_date, priority, category, completed_at in result:
+        yield {
+            "title": title,
+            "description": description,
+            "is_completed": bool(is_completed),
+            "created_at": created_at.isoformat() if created_at else None,
+            "due_date": due_date.isoformat() if due_date else None,
+            "priority": priority.value if priority else None,
+            "category": category,
+            "completed_at": completed_at.isoformat() if completed_at else None
+        }
+
+
+async def export_tasks(session, user_id: int, fmt: str = "json", compress: bool = False):
+    """Пишет выгрузку во временный файл (в памяти до EXPORT_SPOOL_SIZE байт,
+    дальше на диске). Возвращает (файл, число задач, имя файла)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE, mode="w+b")
+    raw = gzip.GzipFile(fileobj=spooled, mode="wb") if compress else spooled
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(text, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        async for record in iter_task_records(session, user_id):
+            writer.writerow(record)
+            count += 1
+    else:
+        if fmt == "json":
+            text.write("[")
+        async for record in iter_task_records(session, user_id):
+            if fmt == "json":
+                text.write(",\n" if count else "\n")
+            text.write(json.dumps(record, ensure_ascii=False))
+            if fmt == "ndjson":
+                text.write("\n")
+            count += 1
+        if fmt == "json":
+            text.write("\n]\n")
+
+    text.flush()
+    text.detach()
+    if compress:
+        raw.close()
+
+    filename = f"tasks_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if compress:
+        filename += ".gz"
+    return spooled, count, filename
+
@@ -1,21 +1,42 @@
-import asyncio
 import logging
+import tempfile
+import time
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from .models import User, Task, Category, Priority, UserCategory
+from .models import Task, Priority
 from .keyboards import (
     get_main_keyboard, get_task_keyboard, get_task_actions_keyboard,
     get_priority_keyboard, get_categories_keyboard, get_settings_keyboard,
-    get_edit_task_keyboard
+    get_edit_task_keyboard, get_export_format_keyboard, get_back_to_list_keyboard,
+    get_select_keyboard, get_bulk_priority_keyboard, get_repeat_keyboard, get_search_keyboard,
+    get_digest_keyboard, DIGEST_WINDOWS, PRIORITY_EMOJI
 )
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession
+from .scheduler import ReminderScheduler
+from .users import CachedUser, upsert_user, set_notification_time, update_user_settings
+from .stats import get_user_stats, get_user_counters
+from .categories import CategoryLimitError, get_user_categories, add_user_category
+from .pagination import TaskPage, fetch_task_page, parse_page_callback
+from .search import SearchPage, search_tasks
+from .importer import import_tasks, open_import_file
+from .exporter import EXPORT_FORMATS, export_tasks, SpooledInputFile
+from .task_service import (
+    TaskNotFoundError, TaskConflictError, parse_task_callback,
+    get_task, update_task, complete_task, delete_task, set_recurrence, get_task_rule,
+    complete_tasks, delete_tasks, set_tasks_priority
+)
+from .rendering import (
+    MESSAGE_LIMIT, format_date, render_task_page, render_task_detail, render_search_page, split_message
+)
+from .timezones import TimezoneError, parse_timezone, to_local, to_utc, utcnow
+from .dateparse import DateParseError, parse_due, parse_quick_add
+from .recurrence import PRESETS, RecurrenceError, parse_rule, describe_rule
+from . import ui
+from config.config import STATS_USE_COUNTERS
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -38,25 +59,16 @@ class TaskStates(StatesGroup):
     waiting_for_edit_date = State()
     waiting_for_edit_priority = State()
     waiting_for_edit_category = State()
+    selecting_tasks = State()
+    waiting_for_repeat_rule = State()
+    waiting_for_search_query = State()
+    waiting_for_morning_digest_time = State()
+    waiting_for_timezone = State()
 
 @router.message(Command("start"))
 async def cmd_start(message: Message, session: Session):
-    # Ищем пользователя в базе данных
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        # Создаем нового пользователя
-        user = User(
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name
-        )
-        session.add(user)
-        await session.commit()
+    # Пользователь уже создан UserMiddleware, обновляем данные профиля
+    await upsert_user(session, message.from_user)
     
     await message.answer(
         "👋 Привет! Я твой персональный ToDo бот!\n\n"
@@ -68,11 +80,67 @@ async def cmd_start(message: Message, session: Session):
         reply_markup=get_main_keyboard()
     )
 
+# Цвет категории, созданной из быстрого добавления (#категория)
+QUICK_CATEGORY_COLOR = "#808080"
+
+PRIORITY_NAMES = {
+    Priority.HIGH: "высокий",
+    Priority.MEDIUM: "средний",
+    Priority.LOW: "низкий"
+}
+
+DUE_DATE_EXAMPLES = "завтра в 18:00, через 3 дня, в пятницу, next fri, 25.12.2026 18:00"
+
 @router.message(Command("add"))
-async def cmd_add(message: Message, state: FSMContext):
+async def cmd_add(message: Message, command: CommandObject, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    # /add с текстом - быстрое добавление одним сообщением, без диалога
+    if command.args:
+        await quick_add(message, command.args, session, user, scheduler)
+        return
     await state.set_state(TaskStates.waiting_for_title)
     await message.answer("📝 Введите название задачи:")
 
+async def get_or_add_category(session: Session, user: CachedUser, name: str):
+    for category in await get_user_categories(session, user.id):
+        if category.name.lower() == name.lower():
+            return category
+    return await add_user_category(session, user.id, name, QUICK_CATEGORY_COLOR)
+
+async def quick_add(message: Message, text: str, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    try:
+        quick = parse_quick_add(text, to_local(utcnow(), user.timezone))
+    except DateParseError:
+        await message.answer("❌ Не вижу названия задачи. Пример: /add Купить молоко завтра в 18:00 !high #дом")
+        return
+
+    category = None
+    if quick.category:
+        try:
+            category = await get_or_add_category(session, user, quick.category)
+        except CategoryLimitError as e:
+            await message.answer(f"❌ Можно создать не больше {e.args[0]} категорий.")
+            return
+
+    task = Task(
+        user_id=user.id,
+        title=quick.title,
+        due_date=to_utc(quick.due_date, user.timezone) if quick.due_date else None,
+        priority=quick.priority or Priority.MEDIUM,
+        category_id=category.id if category else None
+    )
+    session.add(task)
+    await session.commit()
+    scheduler.schedule(task.id, task.due_date, user.notification_time)
+
+    lines = [f"✅ Задача добавлена: {task.title}"]
+    if task.due_date:
+        lines.append(f"📅 До: {format_date(task.due_date, user.timezone)}")
+    if quick.priority:
+        lines.append(f"{PRIORITY_EMOJI[quick.priority]} Приоритет: {PRIORITY_NAMES[quick.priority]}")
+    if category:
+        lines.append(f"📁 Категория: {category.name}")
+    await message.answer("\n".join(lines), reply_markup=get_main_keyboard())
+
 @router.message(TaskStates.waiting_for_title)
 async def process_title(message: Message, state: FSMContext):
     await state.update_data(title=message.text)
@@ -84,23 +152,22 @@ async def process_description(message: Message, state: FSMContext):
     description = message.text if message.text != "-" else None
     await state.update_data(description=description)
     await state.set_state(TaskStates.waiting_for_due_date)
-    await message.answer("📅 Введите дату выполнения в формате ДД.ММ.ГГГГ (или отправьте '-' если дата не нужна):")
+    await message.answer(
+        f"📅 Когда выполнить задачу? Например: {DUE_DATE_EXAMPLES} "
+        "(или отправьте '-' если дата не нужна):"
+    )
 
 @router.message(TaskStates.waiting_for_due_date)
-async def process_due_date(message: Message, state: FSMContext, session: Session):
+async def process_due_date(message: Message, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
     data = await state.get_data()
     
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one()
-    
     due_date = None
     if message.text != "-":
+        # Срок вводится в местном времени пользователя, хранится в UTC
         try:
-            due_date = datetime.strptime(message.text, "%d.%m.%Y")
-        except ValueError:
-            await message.answer("❌ Неверный формат даты. Попробуйте еще раз.")
+            due_date = to_utc(parse_due(message.text or "", to_local(utcnow(), user.timezone)), user.timezone)
+        except DateParseError:
+            await message.answer(f"❌ Не удалось понять дату. Примеры: {DUE_DATE_EXAMPLES}")
             return
     
     task = Task(
@@ -112,6 +179,7 @@ async def process_due_date(message: Message, state: FSMContext, session: Session
     
     session.add(task)
     await session.commit()
+    scheduler.schedule(task.id, task.due_date, user.notification_time)
     
     await state.clear()
     await message.answer(
@@ -119,176 +187,207 @@ async def process_due_date(message: Message, state: FSMContext, session: Session
         reply_markup=get_main_keyboard()
     )
 
+def get_page_keyboard(page: TaskPage):
+    return get_task_keyboard(page.tasks, page.view, page.has_prev, page.has_next)
+
+async def answer_long(message: Message, text: str, reply_markup=None):
+    # Длинный текст уходит несколькими сообщениями, клавиатура - у последнего
+    chunks = split_message(text)
+    for chunk in chunks[:-1]:
+        await message.answer(chunk)
+    await message.answer(chunks[-1], reply_markup=reply_markup)
+
+async def answer_task_page(message: Message, page: TaskPage, tz: str):
+    await answer_long(message, render_task_page(page, tz), reply_markup=get_page_keyboard(page))
+
+async def show_text(message: Message, text: str, reply_markup=None):
+    # Ответ на нажатие кнопки заменяет сообщение с кнопкой, а не присылает новое
+    if len(text) > MESSAGE_LIMIT:
+        await answer_long(message, text, reply_markup=reply_markup)
+    else:
+        await ui.edit_text(message, text, reply_markup=reply_markup)
+
+def schedule_next(scheduler: ReminderScheduler, user: CachedUser, next_task):
+    # Следующее повторение повторяющейся задачи
+    if next_task is not None:
+        scheduler.schedule(next_task.id, next_task.due_date, user.notification_time)
+
+async def answer_task_error(callback: CallbackQuery, user: CachedUser, error: Exception, show_card: bool = True):
+    if isinstance(error, TaskConflictError):
+        # Кнопка устарела: задачу уже изменили с другого устройства
+        if show_card:
+            await show_text(
+                callback.message,
+                render_task_detail(error.task, user.timezone),
+                reply_markup=get_task_actions_keyboard(error.task)
+            )
+        await callback.answer("⚠️ Задача уже изменена, проверьте ее и повторите действие")
+    else:
+        await callback.answer("❌ Задача не найдена!")
+
 @router.message(Command("list"))
-async def cmd_list(message: Message, session: Session):
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one()
+async def cmd_list(message: Message, session: Session, user: CachedUser):
+    page = await fetch_task_page(session, user.id, "list")
     
-    result = await session.execute(
-        select(Task).where(Task.user_id == user.id)
-    )
-    tasks = result.scalars().all()
-    
-    if not tasks:
+    if not page.tasks:
         await message.answer("📋 У вас пока нет задач!")
         return
     
-    text = "📋 Ваши задачи:\n\n"
-    for task in tasks:
-        status = "✅" if task.is_completed else "⏳"
-        due_date = f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}" if task.due_date else ""
-        text += f"{status} {task.title}{due_date}\n"
-    
-    await message.answer(text, reply_markup=get_task_keyboard(tasks))
+    await answer_task_page(message, page, user.timezone)
 
-@router.message(Command("delete"))
-async def cmd_delete(message: Message, state: FSMContext, session: Session):
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one()
+def get_search_page_keyboard(page: SearchPage):
+    return get_search_keyboard(page.tasks, page.offset, page.page_size, page.has_prev, page.has_next)
+
+async def answer_search(message: Message, state: FSMContext, session: Session, user: CachedUser, query: str):
+    page = await search_tasks(session, user.id, query)
+    if not page.tasks:
+        await message.answer(f"🔍 По запросу «{query}» ничего не найдено", reply_markup=get_main_keyboard())
+        return
+    # Запрос нужен для перелистывания страниц результатов
+    await state.update_data(search_query=query)
+    await answer_long(message, render_search_page(page, user.timezone), reply_markup=get_search_page_keyboard(page))
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext, session: Session, user: CachedUser):
+    if not command.args:
+        await state.set_state(TaskStates.waiting_for_search_query)
+        await message.answer("🔍 Введите слова для поиска по названию и описанию задач:")
+        return
+    await answer_search(message, state, session, user, command.args.strip())
+
+@router.message(TaskStates.waiting_for_search_query)
+async def process_search_query(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    await state.set_state(None)
+    await answer_search(message, state, session, user, (message.text or "").strip())
+
+@router.callback_query(F.data.regexp(r"^search_\d+$"))
+async def process_search_page(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("🔍 Повторите поиск командой /search")
+        return
     
-    result = await session.execute(
-        select(Task).where(Task.user_id == user.id)
+    page = await search_tasks(session, user.id, query, offset=int(callback.data.split("_")[1]))
+    await show_text(
+        callback.message,
+        render_search_page(page, user.timezone),
+        reply_markup=get_search_page_keyboard(page)
     )
-    tasks = result.scalars().all()
+    await callback.answer()
+
+@router.message(Command("delete"))
+async def cmd_delete(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    page = await fetch_task_page(session, user.id, "pick")
     
-    if not tasks:
+    if not page.tasks:
         await message.answer("📋 У вас пока нет задач для удаления!")
         return
     
     await state.set_state(TaskStates.waiting_for_task_to_delete)
     await message.answer(
         "❌ Выберите задачу для удаления:",
-        reply_markup=get_task_keyboard(tasks)
+        reply_markup=get_page_keyboard(page)
     )
 
-@router.callback_query(TaskStates.waiting_for_task_to_delete)
-async def process_task_deletion(callback: CallbackQuery, state: FSMContext, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    result = await session.execute(
-        select(Task).where(Task.id == task_id)
-    )
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        await callback.answer("❌ Задача не найдена!")
+@router.callback_query(TaskStates.waiting_for_task_to_delete, F.data.startswith("task_"))
+async def process_task_deletion(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    task_id, version = parse_task_callback(callback.data)
+    try:
+        await delete_task(session, user.id, task_id, version)
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e, show_card=False)
         return
-    
-    await session.delete(task)
-    await session.commit()
+    scheduler.cancel(task_id)
     
     await state.clear()
-    await callback.message.answer(
-        "✅ Задача успешно удалена!",
-        reply_markup=get_main_keyboard()
-    )
+    await show_text(callback.message, "✅ Задача успешно удалена!")
     await callback.answer()
 
 @router.message(Command("done"))
-async def cmd_done(message: Message, state: FSMContext, session: Session):
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one()
+async def cmd_done(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    page = await fetch_task_page(session, user.id, "open")
     
-    result = await session.execute(
-        select(Task).where(
-            Task.user_id == user.id,
-            Task.is_completed == False
-        )
-    )
-    tasks = result.scalars().all()
-    
-    if not tasks:
+    if not page.tasks:
         await message.answer("📋 У вас нет невыполненных задач!")
         return
     
     await state.set_state(TaskStates.waiting_for_task_to_complete)
     await message.answer(
         "✅ Выберите задачу для отметки как выполненной:",
-        reply_markup=get_task_keyboard(tasks)
+        reply_markup=get_page_keyboard(page)
     )
 
-@router.callback_query(TaskStates.waiting_for_task_to_complete)
-async def process_task_completion(callback: CallbackQuery, state: FSMContext, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    result = await session.execute(
-        select(Task).where(Task.id == task_id)
-    )
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        await callback.answer("❌ Задача не найдена!")
+@router.callback_query(TaskStates.waiting_for_task_to_complete, F.data.startswith("task_"))
+async def process_task_completion(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    task_id, version = parse_task_callback(callback.data)
+    try:
+        _, next_task = await complete_task(session, user.id, task_id, version)
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e, show_card=False)
         return
-    
-    task.is_completed = True
-    await session.commit()
+    scheduler.cancel(task_id)
+    schedule_next(scheduler, user, next_task)
     
     await state.clear()
-    await callback.message.answer(
-        "✅ Задача отмечена как выполненная!",
-        reply_markup=get_main_keyboard()
-    )
+    await show_text(callback.message, "✅ Задача отмечена как выполненная!")
     await callback.answer()
 
 @router.callback_query(F.data.startswith("task_"))
-async def process_task_callback(callback: CallbackQuery, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    result = await session.execute(
-        select(Task).where(Task.id == task_id)
-    )
-    task = result.scalar_one_or_none()
+async def process_task_callback(callback: CallbackQuery, session: Session, user: CachedUser):
+    task_id, _ = parse_task_callback(callback.data)
+    task = await get_task(session, user.id, task_id)
     
     if not task:
         await callback.answer("❌ Задача не найдена!")
         return
     
-    text = f"📝 {task.title}\n"
-    if task.description:
-        text += f"\n📋 Описание:\n{task.description}\n"
-    if task.due_date:
-        text += f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}\n"
-    text += f"\nСтатус: {'✅ Выполнено' if task.is_completed else '⏳ В процессе'}"
-    
-    await callback.message.answer(
-        text,
+    await show_text(
+        callback.message,
+        render_task_detail(task, user.timezone),
         reply_markup=get_task_actions_keyboard(task)
     )
     await callback.answer()
 
 @router.message(F.text == "📊 Статистика")
-async def cmd_stats(message: Message, session: Session):
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one()
-    
-    result = await session.execute(
-        select(Task).where(Task.user_id == user.id)
-    )
-    total_tasks = len(result.scalars().all())
-    
-    result = await session.execute(
-        select(Task).where(
-            Task.user_id == user.id,
-            Task.is_completed == True
-        )
-    )
-    completed_tasks = len(result.scalars().all())
-    
-    pending_tasks = total_tasks - completed_tasks
+async def cmd_stats(message: Message, session: Session, user: CachedUser):
+    if STATS_USE_COUNTERS:
+        stats = await get_user_counters(session, user.id)
+    else:
+        stats = await get_user_stats(session, user.id, user.timezone)
     
     text = (
         f"📊 Ваша статистика:\n\n"
-        f"📝 Всего задач: {total_tasks}\n"
-        f"✅ Выполнено: {completed_tasks}\n"
-        f"⏳ В процессе: {pending_tasks}\n"
-        f"📈 Прогресс: {int((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0)}%"
+        f"📝 Всего задач: {stats.total}\n"
+        f"✅ Выполнено: {stats.completed}\n"
+        f"⏳ В процессе: {stats.pending}\n"
+        f"📈 Прогресс: {stats.progress}%"
     )
     
+    if not STATS_USE_COUNTERS:
+        text += (
+            f"\n⚠️ Просрочено: {stats.overdue}\n"
+            f"🗓 Выполнено за неделю: {stats.completed_this_week}"
+        )
+        
+        priority_names = [
+            (Priority.HIGH, "⬆️ Высокий"),
+            (Priority.MEDIUM, "➡️ Средний"),
+            (Priority.LOW, "⬇️ Низкий")
+        ]
+        lines = [
+            f"{name}: {stats.by_priority[priority][1]}/{stats.by_priority[priority][0]}"
+            for priority, name in priority_names if priority in stats.by_priority
+        ]
+        if lines:
+            text += "\n\n🎯 По приоритетам (выполнено/всего):\n" + "\n".join(lines)
+        
+        lines = [
+            f"📁 {category or 'Без категории'}: {completed}/{total}"
+            for category, (total, completed) in stats.by_category.items()
+        ]
+        if any(category is not None for category in stats.by_category):
+            text += "\n\n📁 По категориям (выполнено/всего):\n" + "\n".join(lines)
+    
     await message.answer(text, reply_markup=get_main_keyboard())
 
 @router.message(F.text == "ℹ️ Помощь")
@@ -303,111 +402,238 @@ async def cmd_help(message: Message):
         "Команды:\n"
         "/start - Начать работу с ботом\n"
         "/add - Добавить новую задачу\n"
+        "/add <текст> - Добавить задачу одним сообщением, например:\n"
+        "    /add Купить молоко завтра в 18:00 !high #дом\n"
         "/list - Показать список задач\n"
         "/done - Отметить задачу как выполненную\n"
         "/delete - Удалить задачу\n"
+        "/search - Найти задачи по словам из названия или описания\n"
         "/help - Показать это сообщение"
     )
     
     await message.answer(text, reply_markup=get_main_keyboard())
 
 @router.callback_query(F.data == "back_to_list")
-async def process_back_to_list(callback: CallbackQuery, session: Session):
-    result = await session.execute(
-        select(User).where(User.telegram_id == callback.from_user.id)
-    )
-    user = result.scalar_one()
+async def process_back_to_list(callback: CallbackQuery, session: Session, user: CachedUser):
+    page = await fetch_task_page(session, user.id, "list")
     
-    result = await session.execute(
-        select(Task).where(Task.user_id == user.id)
-    )
-    tasks = result.scalars().all()
+    if not page.tasks:
+        await show_text(callback.message, "📋 У вас пока нет задач!")
+    else:
+        await show_text(callback.message, render_task_page(page, user.timezone), reply_markup=get_page_keyboard(page))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("page_"))
+async def process_task_page(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    try:
+        view, after_id, before_id = parse_page_callback(callback.data)
+    except ValueError:
+        await callback.answer()
+        return
     
-    if not tasks:
-        await callback.message.answer("📋 У вас пока нет задач!")
+    if view == "select":
+        await show_select_page(callback, state, session, user, after_id=after_id, before_id=before_id)
+        await callback.answer()
         return
     
-    text = "📋 Ваши задачи:\n\n"
-    for task in tasks:
-        status = "✅" if task.is_completed else "⏳"
-        due_date = f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}" if task.due_date else ""
-        text += f"{status} {task.title}{due_date}\n"
+    page = await fetch_task_page(session, user.id, view, after_id=after_id, before_id=before_id)
+    if not page.tasks:
+        # Задачи за курсором успели удалить - возвращаемся на первую страницу
+        page = await fetch_task_page(session, user.id, view)
     
-    await callback.message.answer(text, reply_markup=get_task_keyboard(tasks))
+    # Переключение страниц редактирует то же сообщение, а не присылает новое
+    if view in ("list", "done") and page.tasks:
+        await show_text(callback.message, render_task_page(page, user.timezone), reply_markup=get_page_keyboard(page))
+    else:
+        await ui.edit_reply_markup(callback.message, reply_markup=get_page_keyboard(page))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("complete_"))
-async def process_complete_task(callback: CallbackQuery, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    result = await session.execute(
-        select(Task).where(Task.id == task_id)
+async def show_select_page(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser, after_id: int = None, before_id: int = None):
+    page = await fetch_task_page(session, user.id, "select", after_id=after_id, before_id=before_id)
+    if not page.tasks and (after_id is not None or before_id is not None):
+        page = await fetch_task_page(session, user.id, "select")
+    if not page.tasks:
+        await state.clear()
+        await show_text(callback.message, "📋 У вас пока нет задач!")
+        return
+    
+    data = await state.get_data()
+    await state.set_state(TaskStates.selecting_tasks)
+    # Запоминаем курсор страницы, чтобы перерисовать ее после отметки задачи
+    await state.update_data(select_after=page.tasks[0].id - 1 if page.has_prev else None)
+    await show_text(
+        callback.message,
+        "☑️ Отметьте задачи и выберите действие:",
+        reply_markup=get_select_keyboard(
+            page.tasks, set(data.get("selected", [])), page.has_prev, page.has_next
+        )
     )
-    task = result.scalar_one_or_none()
+
+@router.callback_query(F.data == "bulk_start")
+async def process_bulk_start(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    await state.set_data({"selected": []})
+    await show_select_page(callback, state, session, user)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("sel_"))
+async def process_bulk_toggle(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    task_id = int(callback.data.split("_")[1])
+    data = await state.get_data()
+    selected = set(data.get("selected", []))
+    selected ^= {task_id}
+    await state.update_data(selected=sorted(selected))
+    await show_select_page(callback, state, session, user, after_id=data.get("select_after"))
+    await callback.answer()
+
+async def get_selection(callback: CallbackQuery, state: FSMContext) -> list:
+    selected = (await state.get_data()).get("selected", [])
+    if not selected:
+        await callback.answer("☑️ Сначала отметьте задачи")
+    return selected
+
+@router.callback_query(F.data == "bulk_complete")
+async def process_bulk_complete(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    selected = await get_selection(callback, state)
+    if not selected:
+        return
     
-    if not task:
-        await callback.answer("❌ Задача не найдена!")
+    task_ids, next_tasks = await complete_tasks(session, user.id, selected)
+    for task_id in task_ids:
+        scheduler.cancel(task_id)
+    for next_task in next_tasks:
+        schedule_next(scheduler, user, next_task)
+    
+    await state.clear()
+    await show_text(
+        callback.message,
+        f"✅ Отмечено выполненными задач: {len(task_ids)}",
+        reply_markup=get_back_to_list_keyboard()
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "bulk_delete")
+async def process_bulk_delete(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    selected = await get_selection(callback, state)
+    if not selected:
         return
     
-    task.is_completed = True
-    await session.commit()
+    task_ids = await delete_tasks(session, user.id, selected)
+    for task_id in task_ids:
+        scheduler.cancel(task_id)
     
-    await callback.message.answer(
-        "✅ Задача отмечена как выполненная!",
-        reply_markup=get_main_keyboard()
+    await state.clear()
+    await show_text(
+        callback.message,
+        f"✅ Удалено задач: {len(task_ids)}",
+        reply_markup=get_back_to_list_keyboard()
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("delete_"))
-async def process_delete_task(callback: CallbackQuery, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    result = await session.execute(
-        select(Task).where(Task.id == task_id)
+@router.callback_query(F.data == "bulk_priority")
+async def process_bulk_priority(callback: CallbackQuery, state: FSMContext):
+    if not await get_selection(callback, state):
+        return
+    
+    await show_text(
+        callback.message,
+        "🎯 Выберите приоритет для отмеченных задач:",
+        reply_markup=get_bulk_priority_keyboard()
     )
-    task = result.scalar_one_or_none()
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("bulk_priority_"))
+async def process_bulk_set_priority(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    priority_map = {
+        "bulk_priority_high": Priority.HIGH,
+        "bulk_priority_medium": Priority.MEDIUM,
+        "bulk_priority_low": Priority.LOW
+    }
+    if callback.data not in priority_map:
+        await callback.answer()
+        return
+    selected = await get_selection(callback, state)
+    if not selected:
+        return
     
-    if not task:
-        await callback.answer("❌ Задача не найдена!")
+    task_ids = await set_tasks_priority(session, user.id, selected, priority_map[callback.data])
+    
+    # Отметки сохраняются: после смены приоритета задачи можно, например, выполнить
+    data = await state.get_data()
+    await show_select_page(callback, state, session, user, after_id=data.get("select_after"))
+    await callback.answer(f"🎯 Приоритет изменен у задач: {len(task_ids)}")
+
+@router.callback_query(F.data == "bulk_back")
+async def process_bulk_back(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    data = await state.get_data()
+    await show_select_page(callback, state, session, user, after_id=data.get("select_after"))
+    await callback.answer()
+
+@router.callback_query(F.data == "bulk_cancel")
+async def process_bulk_cancel(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    await state.clear()
+    await process_back_to_list(callback, session, user)
+
+@router.callback_query(F.data.startswith("complete_"))
+async def process_complete_task(callback: CallbackQuery, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    task_id, version = parse_task_callback(callback.data)
+    try:
+        task, next_task = await complete_task(session, user.id, task_id, version)
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e)
         return
+    scheduler.cancel(task_id)
+    schedule_next(scheduler, user, next_task)
     
-    await session.delete(task)
-    await session.commit()
+    # Карточка задачи обновляется на месте: статус меняется, кнопка выполнения исчезает
+    await show_text(
+        callback.message,
+        render_task_detail(task, user.timezone),
+        reply_markup=get_task_actions_keyboard(task)
+    )
+    if next_task is not None:
+        await callback.answer(f"✅ Выполнено! Следующее повторение: {format_date(next_task.due_date, user.timezone)}")
+    else:
+        await callback.answer("✅ Задача отмечена как выполненная!")
+
+@router.callback_query(F.data.startswith("delete_"))
+async def process_delete_task(callback: CallbackQuery, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    task_id, version = parse_task_callback(callback.data)
+    try:
+        await delete_task(session, user.id, task_id, version)
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e)
+        return
+    scheduler.cancel(task_id)
     
-    await callback.message.answer(
+    await show_text(
+        callback.message,
         "✅ Задача успешно удалена!",
-        reply_markup=get_main_keyboard()
+        reply_markup=get_back_to_list_keyboard()
     )
     await callback.answer()
 
 @router.message(F.text == "📝 Добавить задачу")
 async def cmd_add_button(message: Message, state: FSMContext):
-    await cmd_add(message, state)
+    await state.set_state(TaskStates.waiting_for_title)
+    await message.answer("📝 Введите название задачи:")
 
 @router.message(F.text == "📋 Список задач")
-async def cmd_list_button(message: Message, session: Session):
-    await cmd_list(message, session)
+async def cmd_list_button(message: Message, session: Session, user: CachedUser):
+    await cmd_list(message, session, user)
 
 @router.message(F.text == "✅ Выполненные")
-async def cmd_completed(message: Message, session: Session):
-    user = session.query(User).filter(User.telegram_id == message.from_user.id).first()
-    tasks = session.query(Task).filter(
-        Task.user_id == user.id,
-        Task.is_completed == True
-    ).all()
-    
-    if not tasks:
+async def cmd_completed(message: Message, session: Session, user: CachedUser):
+    page = await fetch_task_page(session, user.id, "done")
+    
+    if not page.tasks:
         await message.answer("📋 У вас нет выполненных задач!")
         return
     
-    text = "✅ Выполненные задачи:\n\n"
-    for task in tasks:
-        due_date = f"\n📅 До: {task.due_date.strftime('%d.%m.%Y')}" if task.due_date else ""
-        text += f"✅ {task.title}{due_date}\n"
-    
-    await message.answer(text, reply_markup=get_task_keyboard(tasks))
+    await answer_task_page(message, page, user.timezone)
 
 @router.message(F.text == "📁 Категории")
-async def cmd_categories(message: Message, session: Session):
-    categories = session.query(Category).all()
+async def cmd_categories(message: Message, session: Session, user: CachedUser):
+    categories = await get_user_categories(session, user.id)
     await message.answer(
         "📁 Ваши категории:",
         reply_markup=get_categories_keyboard(categories)
@@ -416,7 +642,7 @@ async def cmd_categories(message: Message, session: Session):
 @router.callback_query(F.data == "add_category")
 async def process_add_category(callback: CallbackQuery, state: FSMContext):
     await state.set_state(TaskStates.waiting_for_category_name)
-    await callback.message.answer("📝 Введите название новой категории:")
+    await show_text(callback.message, "📝 Введите название новой категории:")
     await callback.answer()
 
 @router.message(TaskStates.waiting_for_category_name)
@@ -426,22 +652,24 @@ async def process_category_name(message: Message, state: FSMContext):
     await message.answer("🎨 Введите цвет категории в формате HEX (например, #FF0000):")
 
 @router.message(TaskStates.waiting_for_category_color)
-async def process_category_color(message: Message, state: FSMContext, session: Session):
+async def process_category_color(message: Message, state: FSMContext, session: Session, user: CachedUser):
     data = await state.get_data()
     try:
-        category = Category(
-            name=data["name"],
-            color=message.text
-        )
-        session.add(category)
-        session.commit()
+        await add_user_category(session, user.id, data["name"], message.text)
         
         await state.clear()
         await message.answer(
             "✅ Категория успешно добавлена!",
             reply_markup=get_main_keyboard()
         )
+    except CategoryLimitError as e:
+        await state.clear()
+        await message.answer(
+            f"❌ Можно создать не больше {e.args[0]} категорий.",
+            reply_markup=get_main_keyboard()
+        )
     except Exception as e:
+        logger.error(f"Ошибка при добавлении категории: {e}")
         await message.answer(
             "❌ Ошибка при добавлении категории. Попробуйте еще раз.",
             reply_markup=get_main_keyboard()
@@ -457,22 +685,22 @@ async def cmd_settings(message: Message):
 @router.callback_query(F.data == "notification_settings")
 async def process_notification_settings(callback: CallbackQuery, state: FSMContext):
     await state.set_state(TaskStates.waiting_for_notification_time)
-    await callback.message.answer(
+    await show_text(
+        callback.message,
         "🔔 За сколько часов до дедлайна вы хотите получать уведомления?\n"
         "Введите число от 1 до 24:"
     )
     await callback.answer()
 
 @router.message(TaskStates.waiting_for_notification_time)
-async def process_notification_time(message: Message, state: FSMContext, session: Session):
+async def process_notification_time(message: Message, state: FSMContext, session: Session, user: CachedUser, scheduler: ReminderScheduler):
     try:
         hours = int(message.text)
         if not 1 <= hours <= 24:
             raise ValueError
         
-        user = session.query(User).filter(User.telegram_id == message.from_user.id).first()
-        user.notification_time = hours
-        session.commit()
+        user = await set_notification_time(session, user, hours)
+        await scheduler.reschedule_user(session, user.id, hours)
         
         await state.clear()
         await message.answer(
@@ -484,16 +712,113 @@ async def process_notification_time(message: Message, state: FSMContext, session
             "❌ Неверное значение. Введите число от 1 до 24:"
         )
 
-@router.callback_query(F.data.startswith("edit_"))
-async def process_edit_task(callback: CallbackQuery, session: Session):
-    task_id = int(callback.data.split("_")[1])
-    task = session.query(Task).filter(Task.id == task_id).first()
+def render_digest_settings(user: CachedUser) -> str:
+    if user.digest_window:
+        window = f"напоминания за {DIGEST_WINDOWS.get(user.digest_window, f'{user.digest_window} мин')} приходят одним сообщением"
+    else:
+        window = "каждое напоминание приходит отдельно"
+    if user.morning_digest_at is None:
+        morning = "выключена"
+    else:
+        morning = f"в {user.morning_digest_at // 60:02d}:{user.morning_digest_at % 60:02d}"
+    return (
+        "📬 Сводка напоминаний\n\n"
+        f"Сейчас {window}.\n"
+        f"Утренняя сводка задач на день: {morning}.\n\n"
+        "Выберите окно, в пределах которого напоминания объединяются:"
+    )
+
+@router.callback_query(F.data == "digest_settings")
+async def process_digest_settings(callback: CallbackQuery, user: CachedUser):
+    await show_text(
+        callback.message,
+        render_digest_settings(user),
+        reply_markup=get_digest_keyboard(user.digest_window)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("digest_window_"))
+async def process_digest_window(callback: CallbackQuery, session: Session, user: CachedUser):
+    minutes = int(callback.data.split("_")[-1])
+    if minutes not in DIGEST_WINDOWS:
+        await callback.answer()
+        return
+    
+    user = await update_user_settings(session, user, digest_window=minutes)
+    await show_text(
+        callback.message,
+        render_digest_settings(user),
+        reply_markup=get_digest_keyboard(user.digest_window)
+    )
+    await callback.answer("✅ Настройки сохранены")
+
+@router.callback_query(F.data == "morning_digest")
+async def process_morning_digest(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(TaskStates.waiting_for_morning_digest_time)
+    await show_text(
+        callback.message,
+        "🌅 Во сколько присылать список задач на день? Введите время в формате ЧЧ:ММ "
+        "(или отправьте '-', чтобы выключить утреннюю сводку):"
+    )
+    await callback.answer()
+
+@router.message(TaskStates.waiting_for_morning_digest_time)
+async def process_morning_digest_time(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    if message.text == "-":
+        minute = None
+    else:
+        try:
+            moment = datetime.strptime(message.text or "", "%H:%M")
+        except ValueError:
+            await message.answer("❌ Неверный формат времени. Введите время в формате ЧЧ:ММ:")
+            return
+        minute = moment.hour * 60 + moment.minute
+    
+    await update_user_settings(session, user, morning_digest_at=minute)
+    await state.clear()
+    await message.answer(
+        "✅ Утренняя сводка выключена." if minute is None else f"✅ Утренняя сводка будет приходить в {message.text}.",
+        reply_markup=get_main_keyboard()
+    )
+
+@router.callback_query(F.data == "timezone_settings")
+async def process_timezone_settings(callback: CallbackQuery, state: FSMContext, user: CachedUser):
+    await state.set_state(TaskStates.waiting_for_timezone)
+    await show_text(
+        callback.message,
+        f"🌍 Текущий часовой пояс: {user.timezone}\n\n"
+        "Введите название пояса (например, Europe/Moscow) или смещение от UTC в часах (например, +3):"
+    )
+    await callback.answer()
+
+@router.message(TaskStates.waiting_for_timezone)
+async def process_timezone(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    try:
+        tz = parse_timezone(message.text or "")
+    except TimezoneError as e:
+        await message.answer(f"❌ {e}. Попробуйте еще раз:")
+        return
+    
+    # Сроки хранятся в UTC, поэтому смена пояса не сдвигает напоминания
+    await update_user_settings(session, user, timezone=tz)
+    await state.clear()
+    await message.answer(
+        f"✅ Часовой пояс установлен: {tz}",
+        reply_markup=get_main_keyboard()
+    )
+
+# Только edit_<id>[_<версия>]: edit_title_... и edit_priority_... обрабатываются ниже
+@router.callback_query(F.data.regexp(r"^edit_\d+(_\d+)?$"))
+async def process_edit_task(callback: CallbackQuery, session: Session, user: CachedUser):
+    task_id, _ = parse_task_callback(callback.data)
+    task = await get_task(session, user.id, task_id)
     
     if not task:
         await callback.answer("❌ Задача не найдена!")
         return
     
-    await callback.message.answer(
+    await show_text(
+        callback.message,
         "✏️ Что вы хотите изменить?",
         reply_markup=get_edit_task_keyboard(task)
     )
@@ -501,25 +826,25 @@ async def process_edit_task(callback: CallbackQuery, session: Session):
 
 @router.callback_query(F.data.startswith("edit_title_"))
 async def process_edit_title(callback: CallbackQuery, state: FSMContext):
-    task_id = int(callback.data.split("_")[2])
-    await state.update_data(task_id=task_id)
+    task_id, version = parse_task_callback(callback.data)
+    await state.update_data(task_id=task_id, version=version)
     await state.set_state(TaskStates.waiting_for_edit_title)
-    await callback.message.answer("📝 Введите новое название задачи:")
+    await show_text(callback.message, "📝 Введите новое название задачи:")
     await callback.answer()
 
 @router.message(TaskStates.waiting_for_edit_title)
-async def process_new_title(message: Message, state: FSMContext, session: Session):
+async def process_new_title(message: Message, state: FSMContext, session: Session, user: CachedUser):
     data = await state.get_data()
-    task = session.query(Task).filter(Task.id == data["task_id"]).first()
-    
-    if not task:
+    await state.clear()
+    try:
+        await update_task(session, user.id, data["task_id"], data.get("version"), title=message.text)
+    except TaskNotFoundError:
         await message.answer("❌ Задача не найдена!")
         return
+    except TaskConflictError:
+        await message.answer("⚠️ Задачу уже изменили, откройте ее заново и повторите изменение.")
+        return
     
-    task.title = message.text
-    session.commit()
-    
-    await state.clear()
     await message.answer(
         "✅ Название задачи обновлено!",
         reply_markup=get_main_keyboard()
@@ -527,142 +852,196 @@ async def process_new_title(message: Message, state: FSMContext, session: Sessio
 
 @router.callback_query(F.data.startswith("edit_priority_"))
 async def process_edit_priority(callback: CallbackQuery, state: FSMContext):
-    task_id = int(callback.data.split("_")[2])
-    await state.update_data(task_id=task_id)
+    task_id, version = parse_task_callback(callback.data)
+    await state.update_data(task_id=task_id, version=version)
     await state.set_state(TaskStates.waiting_for_edit_priority)
-    await callback.message.answer(
+    await show_text(
+        callback.message,
         "🎯 Выберите новый приоритет:",
         reply_markup=get_priority_keyboard()
     )
     await callback.answer()
 
+# Кнопки изменения описания, даты и категории и кнопки категорий в списке уже есть
+# в меню, но обработчиков для них пока нет: отвечаем на callback, чтобы у пользователя
+# не крутился индикатор загрузки
+@router.callback_query(F.data.regexp(r"^(edit_(description|date|category)_\d+(_\d+)?|category_\d+)$"))
+async def process_unavailable(callback: CallbackQuery):
+    await callback.answer("🚧 Эта функция пока недоступна", show_alert=True)
+
 @router.callback_query(TaskStates.waiting_for_edit_priority)
-async def process_new_priority(callback: CallbackQuery, state: FSMContext, session: Session):
-    data = await state.get_data()
-    task = session.query(Task).filter(Task.id == data["task_id"]).first()
-    
-    if not task:
-        await callback.answer("❌ Задача не найдена!")
-        return
-    
+async def process_new_priority(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
     priority_map = {
         "priority_high": Priority.HIGH,
         "priority_medium": Priority.MEDIUM,
         "priority_low": Priority.LOW
     }
+    if callback.data not in priority_map:
+        await callback.answer()
+        return
     
-    task.priority = priority_map[callback.data]
-    session.commit()
-    
+    data = await state.get_data()
     await state.clear()
-    await callback.message.answer(
-        "✅ Приоритет задачи обновлен!",
-        reply_markup=get_main_keyboard()
+    try:
+        task = await update_task(
+            session, user.id, data["task_id"], data.get("version"),
+            priority=priority_map[callback.data]
+        )
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e)
+        return
+    
+    await show_text(
+        callback.message,
+        render_task_detail(task, user.timezone),
+        reply_markup=get_task_actions_keyboard(task)
+    )
+    await callback.answer("✅ Приоритет задачи обновлен!")
+
+@router.callback_query(F.data.startswith("repeat_"))
+async def process_repeat_menu(callback: CallbackQuery, session: Session, user: CachedUser):
+    task_id, _ = parse_task_callback(callback.data)
+    task = await get_task(session, user.id, task_id)
+    
+    if not task:
+        await callback.answer("❌ Задача не найдена!")
+        return
+    
+    rule = await get_task_rule(session, task)
+    current = describe_rule(parse_rule(rule)) if rule else "не повторяется"
+    await show_text(
+        callback.message,
+        f"🔁 Повтор задачи \"{task.title}\"\n\nСейчас: {current}",
+        reply_markup=get_repeat_keyboard(task)
     )
     await callback.answer()
 
-@router.callback_query(F.data == "export_tasks")
-async def process_export_tasks(callback: CallbackQuery, session: Session):
-    user = session.query(User).filter(User.telegram_id == callback.from_user.id).first()
-    tasks = session.query(Task).filter(Task.user_id == user.id).all()
+@router.callback_query(F.data.startswith("rep_"))
+async def process_set_repeat(callback: CallbackQuery, state: FSMContext, session: Session, user: CachedUser):
+    # rep_<вариант>_<id>_<версия>
+    choice = callback.data.split("_")[1]
+    task_id, version = parse_task_callback(callback.data)
     
-    if not tasks:
-        await callback.answer("📋 У вас пока нет задач для экспорта!")
+    if choice == "custom":
+        await state.set_state(TaskStates.waiting_for_repeat_rule)
+        await state.update_data(task_id=task_id, version=version)
+        await show_text(
+            callback.message,
+            "✏️ Введите правило повторения в формате RRULE, например:\n"
+            "FREQ=DAILY;INTERVAL=2\n"
+            "FREQ=WEEKLY;BYDAY=MO,WE,FR\n"
+            "FREQ=MONTHLY;BYMONTHDAY=1;COUNT=12"
+        )
+        await callback.answer()
         return
     
-    import json
-    from datetime import datetime
+    try:
+        task = await set_recurrence(session, user.id, task_id, version, PRESETS.get(choice), user.timezone)
+    except (TaskNotFoundError, TaskConflictError) as e:
+        await answer_task_error(callback, user, e)
+        return
+    except RecurrenceError as e:
+        await callback.answer(f"❌ {e}", show_alert=True)
+        return
     
-    tasks_data = []
-    for task in tasks:
-        tasks_data.append({
-            "title": task.title,
-            "description": task.description,
-            "is_completed": task.is_completed,
-            "created_at": task.created_at.isoformat(),
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "priority": task.priority.value,
-            "category": task.category.name if task.category else None
-        })
+    await show_text(
+        callback.message,
+        render_task_detail(task, user.timezone),
+        reply_markup=get_task_actions_keyboard(task)
+    )
+    await callback.answer("🔁 Повтор настроен" if task.series_id else "🔁 Повтор отключен")
+
+@router.message(TaskStates.waiting_for_repeat_rule)
+async def process_repeat_rule(message: Message, state: FSMContext, session: Session, user: CachedUser):
+    data = await state.get_data()
+    try:
+        rule = parse_rule(message.text or "")
+        await set_recurrence(session, user.id, data["task_id"], data.get("version"), str(rule), user.timezone)
+    except RecurrenceError as e:
+        await message.answer(f"❌ {e}\nПопробуйте еще раз:")
+        return
+    except TaskNotFoundError:
+        await state.clear()
+        await message.answer("❌ Задача не найдена!")
+        return
+    except TaskConflictError:
+        await state.clear()
+        await message.answer("⚠️ Задачу уже изменили, откройте ее заново и повторите изменение.")
+        return
     
-    await callback.message.answer_document(
-        document=json.dumps(tasks_data, ensure_ascii=False, indent=2),
-        filename=f"tasks_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    await state.clear()
+    await message.answer(
+        f"🔁 Задача будет повторяться: {describe_rule(rule)}",
+        reply_markup=get_main_keyboard()
+    )
+
+@router.callback_query(F.data == "export_tasks")
+async def process_export_tasks(callback: CallbackQuery):
+    await show_text(
+        callback.message,
+        "📤 Выберите формат экспорта:",
+        reply_markup=get_export_format_keyboard()
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("export_fmt_"))
+async def process_export_format(callback: CallbackQuery, session: Session, user: CachedUser):
+    # export_fmt_<формат>[_gz]
+    parts = callback.data.split("_")
+    fmt = parts[2]
+    compress = parts[-1] == "gz"
+    if fmt not in EXPORT_FORMATS:
+        await callback.answer()
+        return
+    
+    file, count, filename = await export_tasks(session, user.id, fmt, compress)
+    with file:
+        if not count:
+            await callback.answer("📋 У вас пока нет задач для экспорта!")
+            return
+        
+        await callback.message.answer_document(
+            document=SpooledInputFile(file, filename),
+            caption=f"📤 Экспортировано задач: {count}"
+        )
+    await callback.answer()
+
+@router.callback_query(F.data == "import_tasks")
+async def process_import_request(callback: CallbackQuery):
+    await show_text(
+        callback.message,
+        "📥 Отправьте файл с задачами в формате JSON (массив или по объекту на строку)."
     )
     await callback.answer()
 
 @router.message(F.document)
-async def process_import_tasks(message: Message, session: Session):
+async def process_import_tasks(message: Message, session: Session, user: CachedUser, scheduler: ReminderScheduler):
+    progress_message = await message.answer("📥 Импортируем задачи...")
+    last_update = time.monotonic()
+    
+    async def on_progress(count):
+        nonlocal last_update
+        # Редактируем одно сообщение, не чаще раза в пару секунд
+        if time.monotonic() - last_update >= 2:
+            last_update = time.monotonic()
+            await progress_message.edit_text(f"📥 Проверено задач: {count}...")
+    
     try:
-        import json
-        from datetime import datetime
+        with tempfile.TemporaryFile() as file:
+            await message.bot.download(message.document, destination=file)
+            with open_import_file(file) as text_file:
+                count = await import_tasks(session, user.id, text_file, on_progress)
         
-        file = await message.bot.download(message.document)
-        tasks_data = json.loads(file.read())
-        
-        user = session.query(User).filter(User.telegram_id == message.from_user.id).first()
-        
-        for task_data in tasks_data:
-            task = Task(
-                user_id=user.id,
-                title=task_data["title"],
-                description=task_data["description"],
-                is_completed=task_data["is_completed"],
-                created_at=datetime.fromisoformat(task_data["created_at"]),
-                due_date=datetime.fromisoformat(task_data["due_date"]) if task_data["due_date"] else None,
-                priority=Priority(task_data["priority"])
-            )
-            session.add(task)
-        
-        session.commit()
+        await scheduler.reschedule_user(session, user.id, user.notification_time)
+        await progress_message.edit_text(f"✅ Импортировано задач: {count}")
         await message.answer(
             "✅ Задачи успешно импортированы!",
             reply_markup=get_main_keyboard()
         )
     except Exception as e:
+        logger.error(f"Ошибка при импорте задач: {e}")
+        await progress_message.edit_text("❌ Импорт отменен.")
         await message.answer(
             "❌ Ошибка при импорте задач. Проверьте формат файла.",
             reply_markup=get_main_keyboard()
         )
-
-async def check_notifications(bot, engine):
-    while True:
-        try:
-            async_session = sessionmaker(
-                engine,
-                class_=AsyncSession,
-                expire_on_commit=False
-            )
-            async with async_session() as session:
-                now = datetime.now()
-                users = await session.execute(select(User))
-                users = users.scalars().all()
-                
-                for user in users:
-                    tasks = await session.execute(
-                        select(Task).where(
-                            Task.user_id == user.id,
-                            Task.is_completed == False,
-                            Task.due_date != None,
-                            Task.last_notified == None
-                        )
-                    )
-                    tasks = tasks.scalars().all()
-                    
-                    for task in tasks:
-                        time_diff = task.due_date - now
-                        if time_diff.total_seconds() <= user.notification_time * 3600:
-                            try:
-                                await bot.send_message(
-                                    user.telegram_id,
-                                    f"🔔 Напоминание!\n"
-                                    f"Задача \"{task.title}\" должна быть выполнена до {task.due_date.strftime('%d.%m.%Y %H:%M')}!"
-                                )
-                                task.last_notified = now
-                                await session.commit()
-                            except Exception as e:
-                                logger.error(f"Ошибка при отправке уведомления: {e}")
-        except Exception as e:
-            logger.error(f"Ошибка в check_notifications: {e}")
-        
-        await asyncio.sleep(300)  # Проверяем каждые 5 минут 
\ No newline at end of file
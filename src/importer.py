@@ -0,0 +1,153 @@
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from config.config import IMPORT_CHUNK_SIZE
+from .models import Task, Priority
+
+READ_SIZE = 64 * 1024
+
+
+class TaskImportError(ValueError):
+    pass
+
+
+def open_import_file(file):
+    # Принимаем и сжатые выгрузки: gzip определяется по сигнатуре
+    is_gzip = file.read(2) == b"\x1f\x8b"
+    file.seek(0)
+    if is_gzip:
+        file = gzip.GzipFile(fileobj=file, mode="rb")
+    return io.TextIOWrapper(file, encoding="utf-8")
+
+
+def iter_json_records(fp, read_size: int = READ_SIZE):
+    """Потоково разбирает JSON-массив объектов или NDJSON из текстового файла.
+
+    В памяти держится только непрочитанный хвост буфера, а не весь файл.
+    """
+    decoder = json.JSONDecoder()
+    buffer = fp.read(read_size)
+    pos = 0
+    eof = not buffer
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fp.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip(" \t\r\n\ufeff")
+    is_array = pos < len(buffer) and buffer[pos] == "["
+    if is_array:
+        pos += 1
+    separators = " \t\r\n," if is_array else " \t\r\n"
+
+    while True:
+        skip(separators)
+        if pos >= len(buffer):
+            if is_array:
+                raise TaskImportError("Неожиданный конец файла")
+            return
+        if is_array and buffer[pos] == "]":
+            return
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                # Объект оборвался на границе чанка - дочитываем
+                if eof or not fill():
+                    raise TaskImportError("Некорректный JSON")
+        pos = end
+        yield record
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    value = datetime.fromisoformat(value)
+    # Даты с указанием пояса приводятся к UTC, в котором хранятся все даты
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def validate_record(record, user_id: int) -> dict:
+    if not isinstance(record, dict) or not isinstance(record.get("title"), str):
+        raise TaskImportError("Задача должна быть объектом с полем title")
+    try:
+        is_completed = bool(record.get("is_completed", False))
+        return {
+            "user_id": user_id,
+            "title": record["title"],
+            "description": record.get("description"),
+            "is_completed": is_completed,
+            "created_at": _parse_datetime(record.get("created_at")) or datetime.utcnow(),
+            "due_date": _parse_datetime(record.get("due_date")),
+            "priority": Priority(record.get("priority") or Priority.MEDIUM.value),
+            "completed_at": _parse_datetime(record.get("completed_at")),
+        }
+    except (TypeError, ValueError) as e:
+        raise TaskImportError(str(e))
+
+
+def _iter_rows(fp, user_id: int):
+    for number, record in enumerate(iter_json_records(fp), start=1):
+        try:
+            yield validate_record(record, user_id)
+        except TaskImportError as e:
+            raise TaskImportError(f"Задача №{number}: {e}")
+
+
+async def import_tasks(session, user_id: int, fp, on_progress=None, chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+    """Импортирует задачи в одной транзакции: все или ни одной.
+
+    Файл читается дважды, поэтому fp должен поддерживать seek(0). Первый проход
+    разбирает и проверяет записи без транзакции и вызывает on_progress(count)
+    после каждой пачки. Второй пишет их пачками через insert() executemany:
+    блокировка записи SQLite (см. SQLiteSession) держится только на время
+    записи, без ошибок формата и без ожидания Telegram посередине.
+    """
+    checked = 0
+    for _ in _iter_rows(fp, user_id):
+        checked += 1
+        if on_progress is not None and checked % chunk_size == 0:
+            await on_progress(checked)
+
+    fp.seek(0)
+    # insert() по таблице, а не по модели: массовая вставка ORM делит пачку на группы
+    # по набору заданных (не None) полей, и при чередовании, например, due_date
+    # и None executemany вырождается в отдельный INSERT на каждую строку
+    imported = 0
+    rows = []
+    try:
+        for row in _iter_rows(fp, user_id):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                await session.execute(insert(Task.__table__), rows)
+                imported += len(rows)
+                rows = []
+        if rows:
+            await session.execute(insert(Task.__table__), rows)
+            imported += len(rows)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    return imported
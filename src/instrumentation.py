@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from config.config import SLOW_QUERY_MS, SQL_SAMPLE_RATE
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Имя обработчика aiogram, от имени которого выполняется запрос;
+# вне обработки апдейтов (планировщик, миграции) остается "background"
+current_handler: ContextVar[str] = ContextVar("current_handler", default="background")
+
+
+@dataclass
+class UpdateTimings:
+    # Накопители времени одного апдейта: заполняются по ходу обработки
+    handler: str = "unhandled"
+    db_time: float = 0.0
+    api_time: float = 0.0
+
+
+current_update: ContextVar[Optional[UpdateTimings]] = ContextVar("current_update", default=None)
+
+db_query_seconds = registry.histogram(
+    "todobot_db_query_seconds",
+    "Время выполнения SQL-запросов",
+    labels=("handler", "operation", "table")
+)
+db_slow_queries = registry.counter(
+    "todobot_db_slow_queries_total",
+    "Количество запросов дольше порога SLOW_QUERY_MS",
+    labels=("handler", "operation", "table")
+)
+updates_total = registry.counter("todobot_updates_total", "Обработано апдейтов", labels=("handler",))
+update_errors = registry.counter("todobot_update_errors_total", "Апдейтов, завершившихся ошибкой", labels=("handler",))
+update_seconds = registry.histogram("todobot_update_seconds", "Полное время обработки апдейта", labels=("handler",))
+update_db_seconds = registry.histogram(
+    "todobot_update_db_seconds", "Время запросов к базе за один апдейт", labels=("handler",)
+)
+update_api_seconds = registry.histogram(
+    "todobot_update_api_seconds", "Время запросов к Telegram API за один апдейт", labels=("handler",)
+)
+updates_in_flight = registry.gauge("todobot_updates_in_flight", "Апдейтов в обработке")
+api_request_seconds = registry.histogram(
+    "todobot_telegram_api_seconds", "Время запросов к Telegram API", labels=("method", "status")
+)
+event_loop_lag = registry.gauge("todobot_event_loop_lag_seconds", "Задержка цикла событий")
+event_loop_lag_max = registry.gauge(
+    "todobot_event_loop_lag_max_seconds", "Максимальная задержка цикла событий с момента запуска"
+)
+
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.IGNORECASE)
+
+
+def describe_statement(statement: str):
+    # Операция и основная таблица вместо полного текста: метка с низкой кардинальностью
+    parts = statement.lstrip().split(None, 1)
+    operation = parts[0].upper() if parts else ""
+    match = _TABLE_RE.search(statement)
+    return operation, match.group(1) if match else ""
+
+
+def instrument_engine(engine, slow_query_ms: float = SLOW_QUERY_MS, sample_rate: float = SQL_SAMPLE_RATE):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    slow_threshold = slow_query_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        handler = current_handler.get()
+        operation, table = describe_statement(statement)
+        db_query_seconds.observe(handler, operation, table, value=elapsed)
+        timings = current_update.get()
+        if timings is not None:
+            timings.db_time += elapsed
+
+        if elapsed >= slow_threshold:
+            db_slow_queries.inc(handler, operation, table)
+            logger.warning(f"Медленный запрос ({elapsed * 1000:.0f} мс, {handler}): {statement}")
+        elif sample_rate and random.random() < sample_rate:
+            logger.info(f"Запрос ({elapsed * 1000:.1f} мс, {handler}): {statement}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # Неудачный запрос не дойдет до after_cursor_execute - убираем его отметку
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+
+
+class TelegramApiMetricsMiddleware:
+    """Middleware сессии бота: время каждого запроса к Telegram API."""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            api_request_seconds.observe(type(method).__name__, status, value=elapsed)
+            timings = current_update.get()
+            if timings is not None:
+                timings.api_time += elapsed
+
+
+async def monitor_event_loop(interval: float = 1.0):
+    # Насколько позже запланированного просыпается sleep - столько цикл событий был занят
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - started - interval, 0.0)
+        worst = max(worst, lag)
+        event_loop_lag.set(value=lag)
+        event_loop_lag_max.set(value=worst)
+
+
+async def log_metrics(interval: float):
+    # Сводка по обработчикам в лог для окружений без Prometheus
+    while True:
+        await asyncio.sleep(interval)
+        db = {labels: total for labels, _, total in update_db_seconds.totals()}
+        api = {labels: total for labels, _, total in update_api_seconds.totals()}
+        for labels, count, total in update_seconds.totals():
+            logger.info(
+                f"{labels[0]}: {count} апдейтов, в среднем {total / count * 1000:.1f} мс "
+                f"(база {db.get(labels, 0) / count * 1000:.1f} мс, API {api.get(labels, 0) / count * 1000:.1f} мс)"
+            )
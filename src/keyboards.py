@@ -1,181 +1,238 @@
+from functools import lru_cache
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from .models import Task, Category, Priority
+from .models import Task, Priority
+
+# Клавиатуры aiogram - изменяемые модели pydantic, поэтому общий объект разметки
+# между ответами не делим. Кэшируется раскладка - кортеж строк из пар
+# (текст, callback_data), а разметка собирается из нее заново при каждом вызове.
+# Статические раскладки строятся один раз, кнопки задач кэшируются по всем полям,
+# которые в них отображаются.
+# В callback_data кнопок задачи передается ее версия: действие над устаревшей
+# карточкой не применится (см. src/task_service.py)
+
+PRIORITY_EMOJI = {
+    Priority.LOW: "⬇️",
+    Priority.MEDIUM: "➡️",
+    Priority.HIGH: "⬆️"
+}
+
+TASK_BUTTON_CACHE_SIZE = 4096
+
+MAIN_KEYBOARD_LAYOUT = (
+    ("📝 Добавить задачу", "📋 Список задач"),
+    ("✅ Выполненные", "❌ Удалить задачу"),
+    ("📊 Статистика", "ℹ️ Помощь"),
+    ("📁 Категории", "⚙️ Настройки")
+)
+
+PRIORITY_LAYOUT = (
+    (("⬆️ Высокий", "priority_high"),),
+    (("➡️ Средний", "priority_medium"),),
+    (("⬇️ Низкий", "priority_low"),)
+)
+
+BULK_PRIORITY_LAYOUT = (
+    (("⬆️ Высокий", "bulk_priority_high"),),
+    (("➡️ Средний", "bulk_priority_medium"),),
+    (("⬇️ Низкий", "bulk_priority_low"),),
+    (("🔙 Назад", "bulk_back"),)
+)
+
+BACK_TO_LIST_LAYOUT = ((("🔙 Назад к списку", "back_to_list"),),)
+
+SETTINGS_LAYOUT = (
+    (("🔔 Настройки уведомлений", "notification_settings"),),
+    (("📬 Сводка напоминаний", "digest_settings"),),
+    (("🌍 Часовой пояс", "timezone_settings"),),
+    (("📤 Экспорт задач", "export_tasks"),),
+    (("📥 Импорт задач", "import_tasks"),)
+)
+
+EXPORT_FORMAT_LAYOUT = (
+    (("JSON", "export_fmt_json"), ("JSON (.gz)", "export_fmt_json_gz")),
+    (("NDJSON", "export_fmt_ndjson"), ("NDJSON (.gz)", "export_fmt_ndjson_gz")),
+    (("CSV", "export_fmt_csv"), ("CSV (.gz)", "export_fmt_csv_gz"))
+)
+
+def _inline_markup(layout) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data=data) for text, data in row]
+        for row in layout
+    ])
 
 def get_main_keyboard() -> ReplyKeyboardMarkup:
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text="📝 Добавить задачу"),
-                KeyboardButton(text="📋 Список задач")
-            ],
-            [
-                KeyboardButton(text="✅ Выполненные"),
-                KeyboardButton(text="❌ Удалить задачу")
-            ],
-            [
-                KeyboardButton(text="📊 Статистика"),
-                KeyboardButton(text="ℹ️ Помощь")
-            ],
-            [
-                KeyboardButton(text="📁 Категории"),
-                KeyboardButton(text="⚙️ Настройки")
-            ]
-        ],
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=text) for text in row] for row in MAIN_KEYBOARD_LAYOUT],
         resize_keyboard=True
     )
-    return keyboard
-
-def get_task_keyboard(tasks: list[Task]) -> InlineKeyboardMarkup:
-    keyboard = []
-    for task in tasks:
-        priority_emoji = {
-            Priority.LOW: "⬇️",
-            Priority.MEDIUM: "➡️",
-            Priority.HIGH: "⬆️"
-        }[task.priority]
-        
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"{'✅' if task.is_completed else '⏳'} {priority_emoji} {task.title}",
-                callback_data=f"task_{task.id}"
-            )
-        ])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+@lru_cache(maxsize=TASK_BUTTON_CACHE_SIZE)
+def _get_task_row(task_id: int, version: int, is_completed: bool, priority: Priority, title: str) -> tuple:
+    # Ключ кэша содержит все, что показывает кнопка
+    return ((
+        f"{'✅' if is_completed else '⏳'} {PRIORITY_EMOJI[priority]} {title}",
+        f"task_{task_id}_{version}"
+    ),)
+
+def _get_task_rows(tasks: list[Task]) -> list:
+    return [
+        _get_task_row(task.id, task.version, task.is_completed, task.priority, task.title)
+        for task in tasks
+    ]
+
+def _get_navigation_row(tasks: list[Task], view: str, has_prev: bool, has_next: bool) -> tuple:
+    # Курсоры страниц - id первой и последней задачи на текущей странице
+    navigation = ()
+    if has_prev and tasks:
+        navigation += (("⬅️ Назад", f"page_{view}_p_{tasks[0].id}"),)
+    if has_next and tasks:
+        navigation += (("Далее ➡️", f"page_{view}_n_{tasks[-1].id}"),)
+    return navigation
+
+def get_task_keyboard(
+    tasks: list[Task],
+    view: str = None,
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
+    layout = _get_task_rows(tasks)
+
+    navigation = _get_navigation_row(tasks, view, has_prev, has_next)
+    if navigation:
+        layout.append(navigation)
+    if view == "list" and tasks:
+        layout.append((("☑️ Выбрать несколько", "bulk_start"),))
+    return _inline_markup(layout)
+
+def get_search_keyboard(tasks: list[Task], offset: int, page_size: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
+    # Сам запрос хранится в данных FSM, в кнопках - только смещение страницы
+    layout = _get_task_rows(tasks)
+
+    navigation = ()
+    if has_prev:
+        navigation += (("⬅️ Назад", f"search_{max(offset - page_size, 0)}"),)
+    if has_next:
+        navigation += (("Далее ➡️", f"search_{offset + page_size}"),)
+    if navigation:
+        layout.append(navigation)
+    return _inline_markup(layout)
+
+def get_select_keyboard(
+    tasks: list[Task],
+    selected: set,
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
+    # Режим множественного выбора: отметки хранятся в данных FSM
+    layout = [
+        ((
+            f"{'☑️' if task.id in selected else '⬜'} {PRIORITY_EMOJI[task.priority]} {task.title}",
+            f"sel_{task.id}"
+        ),)
+        for task in tasks
+    ]
+
+    navigation = _get_navigation_row(tasks, "select", has_prev, has_next)
+    if navigation:
+        layout.append(navigation)
+
+    count = len(selected)
+    if count:
+        layout.append(((f"✅ Выполнить ({count})", "bulk_complete"), (f"❌ Удалить ({count})", "bulk_delete")))
+        layout.append(((f"🎯 Приоритет ({count})", "bulk_priority"),))
+    layout.append((("✖️ Отмена", "bulk_cancel"),))
+    return _inline_markup(layout)
+
+def get_bulk_priority_keyboard() -> InlineKeyboardMarkup:
+    return _inline_markup(BULK_PRIORITY_LAYOUT)
 
 def get_task_actions_keyboard(task: Task) -> InlineKeyboardMarkup:
-    keyboard = []
-    
-    if not task.is_completed:
-        keyboard.append([
-            InlineKeyboardButton(
-                text="✅ Отметить как выполненную",
-                callback_data=f"complete_{task.id}"
-            )
-        ])
-    
-    keyboard.append([
-        InlineKeyboardButton(
-            text="✏️ Редактировать",
-            callback_data=f"edit_{task.id}"
-        )
-    ])
-    
-    keyboard.append([
-        InlineKeyboardButton(
-            text="❌ Удалить задачу",
-            callback_data=f"delete_{task.id}"
-        )
-    ])
-    
-    keyboard.append([
-        InlineKeyboardButton(
-            text="🔙 Назад к списку",
-            callback_data="back_to_list"
-        )
-    ])
-    
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _inline_markup(_get_task_actions_layout(task.id, task.version, task.is_completed))
+
+@lru_cache(maxsize=TASK_BUTTON_CACHE_SIZE)
+def _get_task_actions_layout(task_id: int, version: int, is_completed: bool) -> tuple:
+    suffix = f"{task_id}_{version}"
+    layout = ()
+
+    if not is_completed:
+        layout += ((("✅ Отметить как выполненную", f"complete_{suffix}"),),)
+
+    return layout + (
+        (("✏️ Редактировать", f"edit_{suffix}"),),
+        (("🔁 Повтор", f"repeat_{suffix}"),),
+        (("❌ Удалить задачу", f"delete_{suffix}"),),
+        (("🔙 Назад к списку", "back_to_list"),)
+    )
+
+def get_repeat_keyboard(task: Task) -> InlineKeyboardMarkup:
+    return _inline_markup(_get_repeat_layout(task.id, task.version))
+
+@lru_cache(maxsize=TASK_BUTTON_CACHE_SIZE)
+def _get_repeat_layout(task_id: int, version: int) -> tuple:
+    suffix = f"{task_id}_{version}"
+    return (
+        (("Каждый день", f"rep_daily_{suffix}"), ("По будням", f"rep_weekdays_{suffix}")),
+        (("Каждую неделю", f"rep_weekly_{suffix}"), ("Каждый месяц", f"rep_monthly_{suffix}")),
+        (("✏️ Свое правило", f"rep_custom_{suffix}"),),
+        (("🚫 Не повторять", f"rep_none_{suffix}"),),
+        (("🔙 Назад", f"task_{suffix}"),)
+    )
+
+def get_back_to_list_keyboard() -> InlineKeyboardMarkup:
+    return _inline_markup(BACK_TO_LIST_LAYOUT)
 
 def get_priority_keyboard() -> InlineKeyboardMarkup:
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                text="⬆️ Высокий",
-                callback_data="priority_high"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="➡️ Средний",
-                callback_data="priority_medium"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="⬇️ Низкий",
-                callback_data="priority_low"
-            )
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-def get_categories_keyboard(categories: list[Category]) -> InlineKeyboardMarkup:
-    keyboard = []
-    for category in categories:
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"🎨 {category.name}",
-                callback_data=f"category_{category.id}"
-            )
-        ])
-    keyboard.append([
-        InlineKeyboardButton(
-            text="➕ Добавить категорию",
-            callback_data="add_category"
-        )
-    ])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _inline_markup(PRIORITY_LAYOUT)
+
+def get_categories_keyboard(categories: tuple) -> InlineKeyboardMarkup:
+    return _inline_markup(_get_categories_layout(categories))
+
+@lru_cache(maxsize=TASK_BUTTON_CACHE_SIZE)
+def _get_categories_layout(categories: tuple) -> tuple:
+    # categories - кортеж CachedCategory из src/categories.py, он же ключ кэша
+    return tuple(
+        ((f"🎨 {category.name}", f"category_{category.id}"),)
+        for category in categories
+    ) + ((("➕ Добавить категорию", "add_category"),),)
 
 def get_settings_keyboard() -> InlineKeyboardMarkup:
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                text="🔔 Настройки уведомлений",
-                callback_data="notification_settings"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="📤 Экспорт задач",
-                callback_data="export_tasks"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="📥 Импорт задач",
-                callback_data="import_tasks"
-            )
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _inline_markup(SETTINGS_LAYOUT)
+
+# Окна сводки напоминаний в минутах: 0 - каждое напоминание отдельно
+DIGEST_WINDOWS = {
+    0: "Выкл",
+    15: "15 мин",
+    60: "1 час",
+    180: "3 часа"
+}
+
+def get_digest_keyboard(digest_window: int) -> InlineKeyboardMarkup:
+    return _inline_markup(_get_digest_layout(digest_window))
+
+@lru_cache(maxsize=None)
+def _get_digest_layout(digest_window: int) -> tuple:
+    return (
+        tuple(
+            (f"{'✅ ' if minutes == digest_window else ''}{label}", f"digest_window_{minutes}")
+            for minutes, label in DIGEST_WINDOWS.items()
+        ),
+        (("🌅 Утренняя сводка", "morning_digest"),)
+    )
 
 def get_edit_task_keyboard(task: Task) -> InlineKeyboardMarkup:
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                text="📝 Название",
-                callback_data=f"edit_title_{task.id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="📋 Описание",
-                callback_data=f"edit_description_{task.id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="📅 Дата",
-                callback_data=f"edit_date_{task.id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="🎯 Приоритет",
-                callback_data=f"edit_priority_{task.id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="📁 Категория",
-                callback_data=f"edit_category_{task.id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="🔙 Назад",
-                callback_data=f"task_{task.id}"
-            )
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard) 
\ No newline at end of file
+    return _inline_markup(_get_edit_task_layout(task.id, task.version))
+
+@lru_cache(maxsize=TASK_BUTTON_CACHE_SIZE)
+def _get_edit_task_layout(task_id: int, version: int) -> tuple:
+    suffix = f"{task_id}_{version}"
+    return (
+        (("📝 Название", f"edit_title_{suffix}"),),
+        (("📋 Описание", f"edit_description_{suffix}"),),
+        (("📅 Дата", f"edit_date_{suffix}"),),
+        (("🎯 Приоритет", f"edit_priority_{suffix}"),),
+        (("📁 Категория", f"edit_category_{suffix}"),),
+        (("🔙 Назад", f"task_{suffix}"),)
+    )
+
+def get_export_format_keyboard() -> InlineKeyboardMarkup:
+    return _inline_markup(EXPORT_FORMAT_LAYOUT)
@@ -0,0 +1,75 @@
+import time
+from .instrumentation import (
+    current_handler, current_update, UpdateTimings,
+    updates_total, update_errors, update_seconds, update_db_seconds, update_api_seconds, updates_in_flight
+)
+from .users import resolve_user
+
+
+class DatabaseSessionMiddleware:
+    def __init__(self, session_maker):
+        self.session_maker = session_maker
+
+    async def __call__(self, handler, event, data):
+        async with self.session_maker() as session:
+            data["session"] = session
+            try:
+                return await handler(event, data)
+            finally:
+                await session.close()
+
+
+class UserMiddleware:
+    # Один раз на апдейт превращает telegram_id в пользователя (через кэш)
+    async def __call__(self, handler, event, data):
+        from_user = data.get("event_from_user")
+        if from_user is not None:
+            data["user"] = await resolve_user(data["session"], from_user)
+        return await handler(event, data)
+
+
+class HandlerTagMiddleware:
+    """Помечает запросы к базе именем обработчика, чтобы в метриках
+    было видно, какой обработчик создает нагрузку.
+
+    На уровне роутера берет имя функции-обработчика, на уровне апдейта
+    (до выбора обработчика) использует заданное имя.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+
+    async def __call__(self, handler, event, data):
+        name = self.name or data["handler"].callback.__name__
+        timings = current_update.get()
+        if self.name is None and timings is not None:
+            timings.handler = name
+        token = current_handler.set(name)
+        try:
+            return await handler(event, data)
+        finally:
+            current_handler.reset(token)
+
+
+class UpdateMetricsMiddleware:
+    """Внешний middleware апдейтов: количество, ошибки и время обработки
+    по обработчикам, с разбивкой на базу данных и Telegram API."""
+
+    async def __call__(self, handler, event, data):
+        timings = UpdateTimings()
+        token = current_update.set(timings)
+        updates_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            update_errors.inc(timings.handler)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            updates_in_flight.dec()
+            current_update.reset(token)
+            updates_total.inc(timings.handler)
+            update_seconds.observe(timings.handler, value=elapsed)
+            update_db_seconds.observe(timings.handler, value=timings.db_time)
+            update_api_seconds.observe(timings.handler, value=timings.api_time)
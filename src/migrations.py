@@ -0,0 +1,322 @@
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, text
+)
+import logging
+from datetime import datetime
+from config.config import DEFAULT_TIMEZONE
+from .models import Priority
+from .timezones import get_zone, to_utc
+
+logger = logging.getLogger(__name__)
+
+# Список миграций в порядке применения: (версия, описание, функция)
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+@migration(1, "Исходная схема")
+def initial_schema(conn):
+    # Схема на момент появления миграций. Таблицы, созданные раньше
+    # через create_all, совпадают с ней и пропускаются (checkfirst)
+    metadata = MetaData()
+    Table(
+        'categories', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String, unique=True),
+        Column('color', String)
+    )
+    Table(
+        'users', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('telegram_id', Integer, unique=True),
+        Column('username', String),
+        Column('first_name', String),
+        Column('last_name', String),
+        Column('created_at', DateTime),
+        Column('notification_time', Integer)
+    )
+    Table(
+        'user_categories', metadata,
+        Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+        Column('category_id', Integer, ForeignKey('categories.id'), primary_key=True)
+    )
+    Table(
+        'tasks', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id')),
+        Column('category_id', Integer, ForeignKey('categories.id'), nullable=True),
+        Column('title', String),
+        Column('description', String, nullable=True),
+        Column('is_completed', Boolean),
+        Column('created_at', DateTime),
+        Column('due_date', DateTime, nullable=True),
+        Column('priority', Enum(Priority)),
+        Column('last_notified', DateTime, nullable=True)
+    )
+    metadata.create_all(conn)
+
+
+@migration(2, "Составные индексы для списков задач и напоминаний")
+def hot_path_indexes(conn):
+    # /list, /done, /delete и статистика: фильтр по user_id и is_completed
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_user_completed_due "
+        "ON tasks (user_id, is_completed, due_date)"
+    ))
+    # Загрузка планировщика напоминаний: индекс покрывает весь запрос
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_reminders "
+        "ON tasks (is_completed, last_notified, due_date, user_id)"
+    ))
+
+
+@migration(3, "Время выполнения задачи и счетчики задач пользователя")
+def task_counters(conn):
+    conn.execute(text("ALTER TABLE tasks ADD COLUMN completed_at TIMESTAMP"))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS user_task_counters ("
+        "user_id INTEGER PRIMARY KEY REFERENCES users (id), "
+        "total INTEGER NOT NULL DEFAULT 0, "
+        "completed INTEGER NOT NULL DEFAULT 0)"
+    ))
+    conn.execute(text(
+        "INSERT INTO user_task_counters (user_id, total, completed) "
+        "SELECT user_id, COUNT(*), SUM(CASE WHEN is_completed THEN 1 ELSE 0 END) "
+        "FROM tasks WHERE user_id IS NOT NULL GROUP BY user_id"
+    ))
+
+    # Счетчики поддерживаются триггерами, поэтому их не обходят ни массовые
+    # UPDATE/DELETE, ни импорт через insert()
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_counters_insert AFTER INSERT ON tasks
+            BEGIN
+                INSERT OR IGNORE INTO user_task_counters (user_id, total, completed)
+                VALUES (NEW.user_id, 0, 0);
+                UPDATE user_task_counters
+                SET total = total + 1,
+                    completed = completed + (CASE WHEN NEW.is_completed THEN 1 ELSE 0 END)
+                WHERE user_id = NEW.user_id;
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_counters_delete AFTER DELETE ON tasks
+            BEGIN
+                UPDATE user_task_counters
+                SET total = total - 1,
+                    completed = completed - (CASE WHEN OLD.is_completed THEN 1 ELSE 0 END)
+                WHERE user_id = OLD.user_id;
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_counters_update
+            AFTER UPDATE OF is_completed, user_id ON tasks
+            BEGIN
+                UPDATE user_task_counters
+                SET total = total - 1,
+                    completed = completed - (CASE WHEN OLD.is_completed THEN 1 ELSE 0 END)
+                WHERE user_id = OLD.user_id;
+                INSERT OR IGNORE INTO user_task_counters (user_id, total, completed)
+                VALUES (NEW.user_id, 0, 0);
+                UPDATE user_task_counters
+                SET total = total + 1,
+                    completed = completed + (CASE WHEN NEW.is_completed THEN 1 ELSE 0 END)
+                WHERE user_id = NEW.user_id;
+            END
+        """))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION tasks_counters() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE user_task_counters
+                    SET total = total - 1,
+                        completed = completed - (CASE WHEN OLD.is_completed THEN 1 ELSE 0 END)
+                    WHERE user_id = OLD.user_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO user_task_counters (user_id, total, completed)
+                    VALUES (NEW.user_id, 0, 0)
+                    ON CONFLICT (user_id) DO NOTHING;
+                    UPDATE user_task_counters
+                    SET total = total + 1,
+                        completed = completed + (CASE WHEN NEW.is_completed THEN 1 ELSE 0 END)
+                    WHERE user_id = NEW.user_id;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER trg_tasks_counters
+            AFTER INSERT OR DELETE OR UPDATE OF is_completed, user_id ON tasks
+            FOR EACH ROW EXECUTE FUNCTION tasks_counters()
+        """))
+
+
+@migration(4, "Индексы для постраничного вывода задач")
+def task_page_indexes(conn):
+    # Keyset-пагинация: WHERE user_id = ? [AND is_completed = ?] AND id > ? ORDER BY id
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_user_id "
+        "ON tasks (user_id, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_user_completed_id "
+        "ON tasks (user_id, is_completed, id)"
+    ))
+
+
+@migration(5, "Версия задачи для оптимистичной блокировки")
+def task_version(conn):
+    conn.execute(text("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration(6, "Повторяющиеся задачи")
+def task_series(conn):
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table(
+        'task_series', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+        Column('rule', String, nullable=False),
+        Column('dtstart', DateTime, nullable=False),
+        Column('occurrences', Integer, nullable=False, server_default="1"),
+        Column('created_at', DateTime)
+    ).create(conn, checkfirst=True)
+    conn.execute(text("ALTER TABLE tasks ADD COLUMN series_id INTEGER REFERENCES task_series (id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_series_id ON tasks (series_id)"))
+
+
+@migration(7, "Полнотекстовый поиск по задачам")
+def task_search(conn):
+    if conn.dialect.name == "sqlite":
+        # Внешний контент: текст хранится только в tasks, FTS5 держит индекс.
+        # user_id индексируется как токен, чтобы фильтр по владельцу
+        # пересекался с результатами прямо в индексе, а не после него
+        conn.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                user_id, title, description,
+                content='tasks', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_insert AFTER INSERT ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (rowid, user_id, title, description)
+                VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_delete AFTER DELETE ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+                VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_update
+            AFTER UPDATE OF user_id, title, description ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+                VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+                INSERT INTO tasks_fts (rowid, user_id, title, description)
+                VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+            END
+        """))
+        conn.execute(text("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        # Конфигурация simple: без стемминга, одинаково для русского и английского
+        conn.execute(text("""
+            ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            ) STORED
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector "
+            "ON tasks USING GIN (search_vector)"
+        ))
+
+
+@migration(8, "Сводки напоминаний")
+def reminder_digests(conn):
+    conn.execute(text("ALTER TABLE users ADD COLUMN digest_window INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("ALTER TABLE users ADD COLUMN morning_digest_at INTEGER"))
+    # Утренняя сводка выбирает пользователей по минуте суток раз в минуту
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_morning_digest_at "
+        "ON users (morning_digest_at)"
+    ))
+
+
+def _convert_to_utc(conn, table: str, column: str, tz: str):
+    rows = conn.execute(text(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL")).all()
+    if rows:
+        conn.execute(
+            text(f"UPDATE {table} SET {column} = :value WHERE id = :id"),
+            [{"id": row_id, "value": _to_db(conn, to_utc(_as_datetime(value), tz))} for row_id, value in rows]
+        )
+
+
+def _as_datetime(value):
+    # Запрос через text() в SQLite отдает даты строками
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _to_db(conn, value: datetime):
+    # В SQLite - в том же строковом формате, в котором даты пишет SQLAlchemy
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f") if conn.dialect.name == "sqlite" else value
+
+
+@migration(9, "Часовые пояса пользователей, даты в UTC")
+def timezones(conn):
+    tz = get_zone(DEFAULT_TIMEZONE).key
+    conn.execute(text(f"ALTER TABLE users ADD COLUMN timezone VARCHAR NOT NULL DEFAULT '{tz}'"))
+    conn.execute(text(f"ALTER TABLE task_series ADD COLUMN timezone VARCHAR NOT NULL DEFAULT '{tz}'"))
+    # Сроки и отметки напоминаний раньше писались в местном времени сервера,
+    # created_at и completed_at - уже в UTC
+    if tz != "UTC":
+        _convert_to_utc(conn, "tasks", "due_date", tz)
+        _convert_to_utc(conn, "tasks", "last_notified", tz)
+        _convert_to_utc(conn, "task_series", "dtstart", tz)
+
+
+@migration(10, "Цвет категории для каждого пользователя")
+def user_category_color(conn):
+    # NULL - цвет из categories: имя категории общее для всех, а цвет у каждого свой
+    conn.execute(text("ALTER TABLE user_categories ADD COLUMN color VARCHAR"))
+
+
+def get_schema_version(conn) -> int:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"
+    ))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        current = get_schema_version(conn)
+
+    for version, description, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version <= current:
+            continue
+        # Каждая миграция применяется в своей транзакции вместе с записью версии:
+        # упавшая миграция не оставляет за собой ни колонок, ни индексов.
+        # В SQLite DDL транзакционен только на движке из create_migration_engine
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version) VALUES (:version)"),
+                {"version": version}
+            )
+        logger.info(f"Применена миграция {version}: {description}")
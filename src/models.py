@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
+from config.config import DEFAULT_TIMEZONE
 from .database import Base
 
+# Все даты хранятся в UTC без указания пояса (см. src/timezones.py)
+
 class Priority(enum.Enum):
     LOW = "low"
     MEDIUM = "medium"
@@ -28,6 +31,10 @@ class User(Base):
     last_name = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     notification_time = Column(Integer, default=24)  # За сколько часов до дедлайна уведомлять
+    # Напоминания, порог которых наступит в ближайшие digest_window минут, приходят одной сводкой
+    digest_window = Column(Integer, nullable=False, default=0, server_default="0")
+    morning_digest_at = Column(Integer, nullable=True)  # минута суток для утренней сводки, None - выключена
+    timezone = Column(String, nullable=False, default=DEFAULT_TIMEZONE)  # имя пояса IANA
     
     tasks = relationship("Task", back_populates="user")
     categories = relationship("Category", secondary="user_categories")
@@ -37,9 +44,18 @@ class UserCategory(Base):
     
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     category_id = Column(Integer, ForeignKey('categories.id'), primary_key=True)
+    color = Column(String)  # Цвет пользователя; NULL - цвет из categories
 
 class Task(Base):
     __tablename__ = 'tasks'
+    # Индексы создаются миграциями (src/migrations.py), здесь они описаны для полноты схемы
+    __table_args__ = (
+        Index('ix_tasks_user_completed_due', 'user_id', 'is_completed', 'due_date'),
+        Index('ix_tasks_reminders', 'is_completed', 'last_notified', 'due_date', 'user_id'),
+        Index('ix_tasks_user_id', 'user_id', 'id'),
+        Index('ix_tasks_user_completed_id', 'user_id', 'is_completed', 'id'),
+        Index('ix_tasks_series_id', 'series_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -51,6 +67,33 @@ class Task(Base):
     due_date = Column(DateTime, nullable=True)
     priority = Column(Enum(Priority), default=Priority.MEDIUM)
     last_notified = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    # Увеличивается при каждом изменении задачи (см. src/task_service.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Текущее повторение серии; следующее создается при выполнении этого
+    series_id = Column(Integer, ForeignKey('task_series.id'), nullable=True)
     
     user = relationship("User", back_populates="tasks")
-    category = relationship("Category", back_populates="tasks") 
\ No newline at end of file
+    category = relationship("Category", back_populates="tasks")
+    series = relationship("TaskSeries")
+
+class TaskSeries(Base):
+    # Правило повторения хранится один раз на серию (см. src/recurrence.py)
+    __tablename__ = 'task_series'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    rule = Column(String, nullable=False)  # RRULE, например FREQ=WEEKLY;BYDAY=MO,WE
+    dtstart = Column(DateTime, nullable=False)
+    # Повторения считаются по местному времени, чтобы переход на летнее время не сдвигал их
+    timezone = Column(String, nullable=False, default=DEFAULT_TIMEZONE)
+    occurrences = Column(Integer, nullable=False, default=1)  # создано повторений, для COUNT
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UserTaskCounter(Base):
+    # Поддерживается триггерами базы данных (см. миграцию 3)
+    __tablename__ = 'user_task_counters'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from config.config import TASKS_PAGE_SIZE
+from .models import Task
+
+# Представления списка задач: имя -> фильтр по is_completed (None - все задачи)
+#   list - /list, done - выполненные задачи,
+#   open - выбор задачи для /done, pick - выбор задачи для /delete,
+#   select - множественный выбор задач
+VIEWS = {
+    "list": None,
+    "done": True,
+    "open": False,
+    "pick": None,
+    "select": None,
+}
+
+
+@dataclass
+class TaskPage:
+    view: str
+    tasks: list
+    has_prev: bool
+    has_next: bool
+
+
+async def fetch_task_page(
+    session,
+    user_id: int,
+    view: str = "list",
+    after_id: int = None,
+    before_id: int = None,
+    page_size: int = TASKS_PAGE_SIZE
+) -> TaskPage:
+    """Keyset-пагинация по id: страница читается по индексу (user_id, [is_completed,] id)
+    без OFFSET, лишняя строка в LIMIT показывает, есть ли что-то дальше."""
+    # Категория подгружается тем же запросом (LEFT JOIN), без запроса на каждую задачу
+    stmt = select(Task).options(joinedload(Task.category)).where(Task.user_id == user_id)
+    is_completed = VIEWS[view]
+    if is_completed is not None:
+        stmt = stmt.where(Task.is_completed == is_completed)
+
+    if before_id is not None:
+        stmt = stmt.where(Task.id < before_id).order_by(Task.id.desc())
+    else:
+        if after_id is not None:
+            stmt = stmt.where(Task.id > after_id)
+        stmt = stmt.order_by(Task.id)
+
+    result = await session.execute(stmt.limit(page_size + 1))
+    tasks = list(result.scalars().all())
+    has_more = len(tasks) > page_size
+    tasks = tasks[:page_size]
+
+    if before_id is not None:
+        tasks.reverse()
+        return TaskPage(view, tasks, has_prev=has_more, has_next=True)
+    return TaskPage(view, tasks, has_prev=after_id is not None, has_next=has_more)
+
+
+def parse_page_callback(data: str):
+    # page_<view>_<n|p>_<id>
+    _, view, direction, cursor = data.split("_")
+    if view not in VIEWS:
+        raise ValueError(view)
+    cursor = int(cursor)
+    if direction == "n":
+        return view, cursor, None
+    return view, None, cursor
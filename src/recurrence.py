@@ -0,0 +1,185 @@
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Поддерживаемое подмножество RRULE (RFC 5545):
+#   FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL=n, BYDAY=MO,TU,... (для WEEKLY),
+#   BYMONTHDAY=n (для MONTHLY), COUNT=n, UNTIL=ГГГГММДД[THHMMSS]
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WEEKDAY_NAMES = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+
+# Готовые правила для кнопок "🔁 Повтор"
+PRESETS = {
+    "daily": "FREQ=DAILY",
+    "weekdays": "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+    "weekly": "FREQ=WEEKLY",
+    "monthly": "FREQ=MONTHLY",
+}
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    bymonthday: Optional[int] = None
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+    def __str__(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday is not None:
+            parts.append(f"BYMONTHDAY={self.bymonthday}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%dT%H%M%S')}")
+        return ";".join(parts)
+
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value.rstrip("Z"), fmt)
+        except ValueError:
+            continue
+        # Дата без времени включает весь день
+        return until if "T" in value else until.replace(hour=23, minute=59, second=59)
+    raise RecurrenceError(f"Неверный UNTIL: {value}")
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text: str) -> Rule:
+    text = text.strip()
+    if text.lower() in PRESETS:
+        text = PRESETS[text.lower()]
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+
+    fields = {}
+    for part in text.upper().split(";"):
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep or not value:
+            raise RecurrenceError(f"Неверная часть правила: {part}")
+        fields[key] = value
+
+    freq = fields.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise RecurrenceError(f"Неподдерживаемая частота: {freq}")
+
+    try:
+        interval = int(fields.pop("INTERVAL", "1"))
+        count = int(fields["COUNT"]) if "COUNT" in fields else None
+        bymonthday = int(fields["BYMONTHDAY"]) if "BYMONTHDAY" in fields else None
+    except ValueError as e:
+        raise RecurrenceError(f"Неверное число в правиле: {e}")
+    fields.pop("COUNT", None)
+    fields.pop("BYMONTHDAY", None)
+    if interval < 1 or (count is not None and count < 1):
+        raise RecurrenceError("INTERVAL и COUNT должны быть положительными")
+    if bymonthday is not None and (freq != "MONTHLY" or not 1 <= bymonthday <= 31):
+        raise RecurrenceError("BYMONTHDAY поддерживается только для MONTHLY, от 1 до 31")
+
+    byday = ()
+    if "BYDAY" in fields:
+        if freq != "WEEKLY":
+            raise RecurrenceError("BYDAY поддерживается только для WEEKLY")
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(day) for day in fields.pop("BYDAY").split(",")}))
+        except ValueError:
+            raise RecurrenceError("Дни недели в BYDAY: MO, TU, WE, TH, FR, SA, SU")
+
+    until = _parse_until(fields.pop("UNTIL")) if "UNTIL" in fields else None
+    if fields:
+        raise RecurrenceError(f"Неподдерживаемые части правила: {', '.join(fields)}")
+
+    return Rule(freq, interval, byday, bymonthday, count, until)
+
+
+def _add_months(dtstart: datetime, months: int, day: int) -> datetime:
+    month_index = dtstart.month - 1 + months
+    year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+    # 31-е число в коротком месяце переносится на последний день месяца
+    return dtstart.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def _next_daily(dtstart: datetime, after: datetime, step: timedelta) -> datetime:
+    if after < dtstart:
+        return dtstart
+    # Номер первого шага после after
+    return dtstart + step * ((after - dtstart) // step + 1)
+
+
+def _next_weekly_byday(rule: Rule, dtstart: datetime, after: datetime) -> Optional[datetime]:
+    week0 = dtstart - timedelta(days=dtstart.weekday())
+    week = max((after - week0) // timedelta(weeks=1), 0)
+    week = -(-week // rule.interval) * rule.interval
+    # Подходящий день найдется в текущей активной неделе или в следующей
+    for current in (week, week + rule.interval):
+        for day in rule.byday:
+            candidate = week0 + timedelta(weeks=current, days=day)
+            if candidate >= dtstart and candidate > after:
+                return candidate
+    return None
+
+
+def _next_monthly(rule: Rule, dtstart: datetime, after: datetime) -> datetime:
+    day = rule.bymonthday or dtstart.day
+    months = max((after.year - dtstart.year) * 12 + after.month - dtstart.month, 0)
+    months = -(-months // rule.interval) * rule.interval
+    while True:
+        candidate = _add_months(dtstart, months, day)
+        if candidate >= dtstart and candidate > after:
+            return candidate
+        months += rule.interval
+
+
+def next_occurrence(rule: Rule, dtstart: datetime, after: datetime) -> Optional[datetime]:
+    """Первое повторение строго после after; None, если серия закончилась по UNTIL.
+
+    Вычисляется арифметикой от dtstart, без перебора прошлых повторений.
+    COUNT проверяет вызывающий код по числу уже созданных повторений.
+    """
+    if rule.freq == "DAILY":
+        candidate = _next_daily(dtstart, after, timedelta(days=rule.interval))
+    elif rule.freq == "WEEKLY" and rule.byday:
+        candidate = _next_weekly_byday(rule, dtstart, after)
+    elif rule.freq == "WEEKLY":
+        candidate = _next_daily(dtstart, after, timedelta(weeks=rule.interval))
+    else:
+        candidate = _next_monthly(rule, dtstart, after)
+
+    if candidate is None or (rule.until is not None and candidate > rule.until):
+        return None
+    return candidate
+
+
+def describe_rule(rule: Rule) -> str:
+    if rule.freq == "DAILY":
+        text = "каждый день" if rule.interval == 1 else f"каждые {rule.interval} дн."
+    elif rule.freq == "WEEKLY":
+        text = "каждую неделю" if rule.interval == 1 else f"каждые {rule.interval} нед."
+        if rule.byday:
+            text += " по " + ", ".join(WEEKDAY_NAMES[day] for day in rule.byday)
+    else:
+        text = "каждый месяц" if rule.interval == 1 else f"каждые {rule.interval} мес."
+        if rule.bymonthday:
+            text += f" {rule.bymonthday}-го числа"
+    if rule.count is not None:
+        text += f", {rule.count} раз"
+    if rule.until is not None:
+        text += f", до {rule.until.strftime('%d.%m.%Y')}"
+    return text
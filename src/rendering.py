@@ -0,0 +1,122 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+from .models import Task
+from .timezones import to_local
+
+# Ограничение Telegram на длину текста одного сообщения
+MESSAGE_LIMIT = 4096
+
+PAGE_HEADERS = {
+    "done": "✅ Выполненные задачи:",
+}
+DEFAULT_PAGE_HEADER = "📋 Ваши задачи:"
+
+# Шаблоны собраны один раз; format без разбора строки на каждом вызове
+_TASK_LINE = "{} {}{}".format
+_TASK_LINE_DUE = "{} {}{}\n📅 До: {}".format
+_STATUS = {True: "✅", False: "⏳"}
+_DETAIL_STATUS = {True: "✅ Выполнено", False: "⏳ В процессе"}
+
+
+@lru_cache(maxsize=4096)
+def _format_day(day: date) -> str:
+    return day.strftime("%d.%m.%Y")
+
+
+@lru_cache(maxsize=4096)
+def format_date(value: datetime, tz: str) -> str:
+    """Срок из базы (UTC) в часовом поясе пользователя; полночь - без времени."""
+    # Сроки в списке обычно повторяются (конец дня, круглые часы), поэтому перевод
+    # в пояс кэшируется целиком; при промахе дата все равно берется из кэша по дню
+    local = to_local(value, tz)
+    day = _format_day(local.date())
+    if local.hour or local.minute:
+        return f"{day} {local.hour:02d}:{local.minute:02d}"
+    return day
+
+
+def _category_suffix(task: Task) -> str:
+    # Категория в списках загружается вместе с задачей (joinedload), см. fetch_task_page
+    if task.category_id is None:
+        return ""
+    return f" [{task.category.name}]"
+
+
+def render_task_line(task: Task, tz: str) -> str:
+    status = _STATUS[bool(task.is_completed)]
+    category = _category_suffix(task)
+    if task.due_date:
+        return _TASK_LINE_DUE(status, task.title, category, format_date(task.due_date, tz))
+    return _TASK_LINE(status, task.title, category)
+
+
+def render_task_list(header: str, tasks: Iterable[Task], tz: str) -> str:
+    lines = [header, ""]
+    lines.extend(render_task_line(task, tz) for task in tasks)
+    return "\n".join(lines)
+
+
+def render_task_page(page, tz: str) -> str:
+    return render_task_list(PAGE_HEADERS.get(page.view, DEFAULT_PAGE_HEADER), page.tasks, tz)
+
+
+def render_search_page(page, tz: str) -> str:
+    return render_task_list(f"🔍 Результаты поиска «{page.query}»:", page.tasks, tz)
+
+
+def render_task_detail(task: Task, tz: str) -> str:
+    parts = [f"📝 {task.title}\n"]
+    if task.description:
+        parts.append(f"\n📋 Описание:\n{task.description}\n")
+    if task.due_date:
+        parts.append(f"\n📅 До: {format_date(task.due_date, tz)}\n")
+    if task.series_id:
+        parts.append("\n🔁 Повторяющаяся задача\n")
+    parts.append(f"\nСтатус: {_DETAIL_STATUS[bool(task.is_completed)]}")
+    return "".join(parts)
+
+
+# Сводка длиннее не нужна: остальные задачи видны в /list
+DIGEST_MAX_TASKS = 50
+
+
+def render_digest(header: str, tasks: List[Tuple[str, datetime]], tz: str) -> str:
+    """Одно сообщение со списком задач (название, срок) вместо сообщения на каждую."""
+    lines = [header, ""]
+    for title, due_date in tasks[:DIGEST_MAX_TASKS]:
+        lines.append(f"• {title} - до {format_date(due_date, tz)}")
+    if len(tasks) > DIGEST_MAX_TASKS:
+        lines.append(f"... и еще {len(tasks) - DIGEST_MAX_TASKS}")
+    return "\n".join(lines)
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Делит текст на части не длиннее limit по границам строк.
+
+    Строка длиннее limit режется по символам.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = []
+    size = 0
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:limit])
+            line = line[limit:]
+        # +1 за перевод строки перед этой строкой
+        added = len(line) + (1 if current else 0)
+        if size + added > limit:
+            chunks.append("\n".join(current))
+            current, size = [line], len(line)
+        else:
+            current.append(line)
+            size += added
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
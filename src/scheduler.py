@@ -0,0 +1,359 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, and_, or_
+from .models import User, Task
+from .rendering import format_date, render_digest
+from .timezones import to_local, to_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Повтор напоминания, которое не удалось отправить: задержка удваивается
+# с каждой неудачей подряд, но не превышает максимальной
+RETRY_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+
+class ReminderScheduler:
+    """Планировщик напоминаний на основе min-heap.
+
+    Куча хранит пары (момент напоминания в UTC, id задачи), а словарь ``_entries`` -
+    актуальный момент для каждой задачи. Отмененные и перенесенные записи
+    удаляются из кучи лениво, при извлечении, поэтому любое изменение стоит O(log n).
+
+    Напоминания одного пользователя, наступившие одновременно, приходят одним
+    сообщением. Пользователю с digest_window заодно отправляются задачи, порог
+    которых наступит в ближайшие digest_window минут: не больше одного
+    сообщения на окно вместо сообщения на каждую задачу.
+
+    При запуске нескольких воркеров каждый планировщик владеет своей частью
+    пользователей (telegram_id % shard_count == shard_index), поэтому одно
+    напоминание никогда не отправляется дважды.
+    """
+
+    def __init__(self, session_maker, delivery, flush_interval: float = 1.0, shard_index: int = 0, shard_count: int = 1):
+        self.session_maker = session_maker
+        self.delivery = delivery
+        self.flush_interval = flush_interval
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self._heap = []
+        self._entries = {}
+        self._wakeup = asyncio.Event()
+        # Доставленные напоминания, last_notified которых еще не записан в базу
+        self._notified = {}
+        # Напоминания, переданные в очередь доставки, но еще не отправленные
+        self._in_flight = set()
+        # Число неудачных отправок подряд для напоминаний, ожидающих повтора
+        self._failures = {}
+
+    @staticmethod
+    def fire_time(due_date: datetime, notification_time: int) -> datetime:
+        return due_date - timedelta(hours=notification_time)
+
+    async def load(self):
+        # Один запрос при старте: все задачи, по которым еще не было напоминания
+        async with self.session_maker() as session:
+            stmt = (
+                select(Task.id, Task.due_date, User.notification_time)
+                .join(User, Task.user_id == User.id)
+                .where(
+                    Task.is_completed == False,
+                    Task.due_date != None,
+                    Task.last_notified == None
+                )
+            )
+            if self.shard_count > 1:
+                stmt = stmt.where(User.telegram_id % self.shard_count == self.shard_index)
+            result = await session.execute(stmt)
+            rows = result.all()
+
+        self._entries = {
+            task_id: self.fire_time(due_date, notification_time)
+            for task_id, due_date, notification_time in rows
+        }
+        self._heap = [(fire_at, task_id) for task_id, fire_at in self._entries.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        logger.info(f"Планировщик напоминаний загружен: {len(self._entries)} задач")
+
+    def schedule(self, task_id: int, due_date: datetime, notification_time: int):
+        if due_date is None:
+            self.cancel(task_id)
+            return
+
+        fire_at = self.fire_time(due_date, notification_time)
+        self._failures.pop(task_id, None)
+        self._entries[task_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, task_id))
+        # Будим цикл, только если новое напоминание раньше текущего ближайшего
+        if self._heap[0] == (fire_at, task_id):
+            self._wakeup.set()
+
+    def cancel(self, task_id: int):
+        self._entries.pop(task_id, None)
+        self._failures.pop(task_id, None)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+
+    async def reschedule_user(self, session, user_id: int, notification_time: int):
+        result = await session.execute(
+            select(Task.id, Task.due_date).where(
+                Task.user_id == user_id,
+                Task.is_completed == False,
+                Task.due_date != None,
+                Task.last_notified == None
+            )
+        )
+        for task_id, due_date in result.all():
+            # Уже отправленные и ожидающие отправки напоминания второй раз не планируются
+            if task_id not in self._notified and task_id not in self._in_flight:
+                self.schedule(task_id, due_date, notification_time)
+
+    def _compact(self):
+        self._heap = [(fire_at, task_id) for task_id, fire_at in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap:
+            fire_at, task_id = self._heap[0]
+            if self._entries.get(task_id) == fire_at:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: datetime) -> list[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, task_id = heapq.heappop(self._heap)
+            if self._entries.get(task_id) == fire_at:
+                del self._entries[task_id]
+                due.append(task_id)
+        return due
+
+    async def _sleep(self, timeout):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        flusher = asyncio.create_task(self._flush_loop())
+        morning = asyncio.create_task(self._morning_loop())
+        try:
+            await self._loop()
+        finally:
+            flusher.cancel()
+            morning.cancel()
+            await self.flush_notified()
+
+    async def _loop(self):
+        while True:
+            try:
+                self._drop_stale()
+                if not self._heap:
+                    await self._sleep(None)
+                    continue
+
+                delay = (self._heap[0][0] - utcnow()).total_seconds()
+                if delay > 0:
+                    await self._sleep(delay)
+                    continue
+
+                task_ids = self._pop_due(utcnow())
+                if task_ids:
+                    try:
+                        await self._notify(task_ids)
+                    except Exception:
+                        # Напоминания уже извлечены из кучи: возвращаем те, что не ушли
+                        # в очередь доставки, с той же задержкой, что и при неудачной отправке
+                        self._retry([
+                            task_id for task_id in task_ids
+                            if task_id not in self._in_flight and task_id not in self._notified
+                        ])
+                        raise
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в планировщике напоминаний: {e}")
+                await asyncio.sleep(1)
+
+    def _reminder_query(self):
+        return (
+            select(Task.id, Task.title, Task.due_date, Task.user_id, User.telegram_id,
+                   User.notification_time, User.digest_window, User.timezone)
+            .join(User, Task.user_id == User.id)
+            .where(Task.is_completed == False, Task.last_notified == None)
+        )
+
+    async def _notify(self, task_ids: list[int]):
+        now = utcnow()
+        async with self.session_maker() as session:
+            # Перепроверяем задачи: их могли выполнить или удалить в обход планировщика
+            result = await session.execute(self._reminder_query().where(Task.id.in_(task_ids)))
+            rows = result.all()
+
+            # Пользователи в режиме сводки: добираем задачи, порог которых наступит в пределах окна
+            digest_users = {row.user_id: row for row in rows if row.digest_window}
+            if digest_users:
+                horizon = max(
+                    now + timedelta(hours=row.notification_time, minutes=row.digest_window)
+                    for row in digest_users.values()
+                )
+                result = await session.execute(
+                    self._reminder_query().where(
+                        Task.user_id.in_(list(digest_users)),
+                        Task.due_date != None,
+                        Task.due_date <= horizon,
+                        Task.id.not_in(task_ids)
+                    )
+                )
+                seen = set(self._notified) | self._in_flight
+                rows.extend(
+                    row for row in result.all()
+                    if row.id not in seen
+                    and self.fire_time(row.due_date, row.notification_time) <= now + timedelta(minutes=row.digest_window)
+                )
+
+        by_chat = {}
+        for row in rows:
+            by_chat.setdefault(row.telegram_id, []).append(row)
+
+        for telegram_id, chat_rows in by_chat.items():
+            ids = [row.id for row in chat_rows]
+            for task_id in ids:
+                # Задачи, забранные в сводку раньше срока, больше не ждут в куче
+                self._entries.pop(task_id, None)
+            self._in_flight.update(ids)
+
+            if len(chat_rows) == 1:
+                row = chat_rows[0]
+                text = (
+                    f"🔔 Напоминание!\n"
+                    f"Задача \"{row.title}\" должна быть выполнена до {format_date(row.due_date, row.timezone)}!"
+                )
+            else:
+                chat_rows.sort(key=lambda row: row.due_date)
+                text = render_digest(
+                    f"🔔 Напоминание! Скоро срок у {len(chat_rows)} задач:",
+                    [(row.title, row.due_date) for row in chat_rows],
+                    chat_rows[0].timezone
+                )
+            self.delivery.send(
+                telegram_id, text,
+                on_sent=self._mark_notified(ids),
+                on_failed=self._mark_failed(ids)
+            )
+
+    def _mark_notified(self, task_ids: list[int]):
+        def on_sent():
+            now = utcnow()
+            for task_id in task_ids:
+                self._in_flight.discard(task_id)
+                self._failures.pop(task_id, None)
+                self._notified[task_id] = now
+        return on_sent
+
+    def _mark_failed(self, task_ids: list[int]):
+        def on_failed():
+            for task_id in task_ids:
+                self._in_flight.discard(task_id)
+            self._retry(task_ids)
+            logger.warning(f"Напоминания {task_ids} не доставлены, повтор по расписанию")
+        return on_failed
+
+    def _retry(self, task_ids: list[int]):
+        now = utcnow()
+        for task_id in task_ids:
+            # Пока напоминание ждало, задачу могли перепланировать
+            if task_id in self._entries:
+                continue
+            failures = self._failures.get(task_id, 0)
+            self._failures[task_id] = failures + 1
+            fire_at = now + min(RETRY_DELAY * 2 ** failures, RETRY_MAX_DELAY)
+            self._entries[task_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, task_id))
+        self._wakeup.set()
+
+    async def _morning_loop(self):
+        # Каждая минута обрабатывается ровно один раз, даже если цикл проснулся с опозданием
+        minute = utcnow().replace(second=0, microsecond=0)
+        while True:
+            minute += timedelta(minutes=1)
+            delay = (minute - utcnow()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self._send_morning_digests(minute)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке утренних сводок: {e}")
+
+    async def _send_morning_digests(self, minute: datetime):
+        """minute - минута в UTC. В каждом поясе, где есть утренние сводки,
+        она соответствует своей местной минуте суток и своему концу дня."""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(User.timezone).where(User.morning_digest_at != None).distinct()
+            )
+            conditions = []
+            for tz in result.scalars().all():
+                local = to_local(minute, tz)
+                day_end = to_utc(local.replace(hour=0, minute=0) + timedelta(days=1), tz)
+                # Невыполненные задачи со сроком до конца местного дня, включая просроченные
+                conditions.append(and_(
+                    User.timezone == tz,
+                    User.morning_digest_at == local.hour * 60 + local.minute,
+                    Task.due_date < day_end
+                ))
+            if not conditions:
+                return
+
+            stmt = (
+                select(Task.title, Task.due_date, User.telegram_id, User.timezone)
+                .join(User, Task.user_id == User.id)
+                .where(or_(*conditions), Task.is_completed == False, Task.due_date != None)
+                .order_by(User.telegram_id, Task.due_date)
+            )
+            if self.shard_count > 1:
+                stmt = stmt.where(User.telegram_id % self.shard_count == self.shard_index)
+            result = await session.execute(stmt)
+            rows = result.all()
+
+        by_chat = {}
+        for title, due_date, telegram_id, tz in rows:
+            by_chat.setdefault((telegram_id, tz), []).append((title, due_date))
+        for (telegram_id, tz), tasks in by_chat.items():
+            self.delivery.send(
+                telegram_id,
+                render_digest(f"🌅 Доброе утро! Задачи на сегодня: {len(tasks)}", tasks, tz)
+            )
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_notified()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении отметок уведомлений: {e}")
+
+    async def flush_notified(self):
+        # Записывает last_notified доставленных напоминаний. Вызывается и после
+        # остановки очереди доставки: сообщения из ее хвоста уходят уже после run()
+        if not self._notified:
+            return
+
+        notified, self._notified = self._notified, {}
+        # Один UPDATE на пачку: время отметки в пределах пачки совпадает с точностью до интервала
+        try:
+            async with self.session_maker() as session:
+                await session.execute(
+                    update(Task)
+                    .where(Task.id.in_(list(notified)))
+                    .values(last_notified=max(notified.values()))
+                )
+                await session.commit()
+        except Exception:
+            notified.update(self._notified)
+            self._notified = notified
+            raise
@@ -0,0 +1,88 @@
+import re
+from dataclasses import dataclass
+from typing import List
+from sqlalchemy import select, func, literal_column, table, column
+from sqlalchemy.orm import joinedload
+from config.config import TASKS_PAGE_SIZE, SEARCH_MAX_TERMS
+from .models import Task
+
+# Слова запроса: буквы и цифры любого алфавита. Остальное (кавычки, операторы
+# FTS5 и tsquery) отбрасывается, поэтому запрос пользователя не может сломать синтаксис
+_TERM_RE = re.compile(r"\w+")
+
+# Вес совпадения в названии относительно описания при ранжировании
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Виртуальная таблица FTS5 (миграция 7); в MATCH и bm25 ее имя - скрытый столбец
+tasks_fts = table("tasks_fts", column("rowid"))
+_fts = literal_column("tasks_fts")
+
+
+@dataclass
+class SearchPage:
+    query: str
+    tasks: list
+    offset: int
+    page_size: int
+    has_next: bool
+
+    @property
+    def has_prev(self) -> bool:
+        return self.offset > 0
+
+
+def extract_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query.lower())[:SEARCH_MAX_TERMS]
+
+
+def _sqlite_statement(user_id: int, terms: List[str]):
+    # Каждое слово ищется по префиксу ("моло" найдет "молоко"), все слова обязательны
+    words = " ".join(f'"{term}"*' for term in terms)
+    match = f'user_id : "{user_id}" AND {{title description}} : ({words})'
+    # bm25 в SQLite тем меньше, чем документ релевантнее; user_id не влияет на ранг
+    rank = func.bm25(_fts, 0.0, TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+    return (
+        select(Task)
+        .options(joinedload(Task.category))
+        .join(tasks_fts, tasks_fts.c.rowid == Task.id)
+        .where(_fts.op("MATCH")(match))
+        .order_by(rank, Task.id)
+    )
+
+
+def _postgresql_statement(user_id: int, terms: List[str]):
+    query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    vector = literal_column("tasks.search_vector")
+    return (
+        select(Task)
+        .options(joinedload(Task.category))
+        .where(Task.user_id == user_id, vector.op("@@")(query))
+        .order_by(func.ts_rank_cd(vector, query).desc(), Task.id)
+    )
+
+
+async def search_tasks(
+    session,
+    user_id: int,
+    query: str,
+    offset: int = 0,
+    page_size: int = TASKS_PAGE_SIZE
+) -> SearchPage:
+    """Ищет задачи пользователя по названию и описанию.
+
+    Результаты упорядочены по релевантности, поэтому страницы идут по OFFSET,
+    а не по курсору id, как в обычном списке задач (src/pagination.py).
+    """
+    terms = extract_terms(query)
+    if not terms:
+        return SearchPage(query, [], 0, page_size, False)
+
+    if session.bind.dialect.name == "postgresql":
+        stmt = _postgresql_statement(user_id, terms)
+    else:
+        stmt = _sqlite_statement(user_id, terms)
+
+    result = await session.execute(stmt.offset(offset).limit(page_size + 1))
+    tasks = list(result.scalars().all())
+    return SearchPage(query, tasks[:page_size], offset, page_size, has_next=len(tasks) > page_size)
@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, and_
+from config.config import DEFAULT_TIMEZONE
+from .models import Task, Category, Priority, UserTaskCounter
+from .timezones import to_local, to_utc, utcnow
+
+
+@dataclass
+class UserStats:
+    total: int = 0
+    completed: int = 0
+    overdue: int = 0
+    completed_this_week: int = 0
+    # Приоритет / название категории -> [всего, выполнено]
+    by_priority: dict = field(default_factory=dict)
+    by_category: dict = field(default_factory=dict)
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.completed
+
+    @property
+    def progress(self) -> int:
+        return int(self.completed / self.total * 100) if self.total > 0 else 0
+
+
+def _week_start(now: datetime) -> datetime:
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def get_user_stats(session, user_id: int, tz: str = DEFAULT_TIMEZONE) -> UserStats:
+    """Вся статистика пользователя одним агрегирующим запросом с группировкой
+    по приоритету и категории; разрезы сворачиваются уже в Python."""
+    now = utcnow()
+    # Неделя начинается в понедельник по местному времени пользователя
+    week_start = to_utc(_week_start(to_local(now, tz)), tz)
+
+    result = await session.execute(
+        select(
+            Task.priority,
+            Category.name,
+            func.count(),
+            func.sum(case((Task.is_completed == True, 1), else_=0)),
+            func.sum(case((and_(Task.is_completed == False, Task.due_date < now), 1), else_=0)),
+            func.sum(case((Task.completed_at >= week_start, 1), else_=0))
+        )
+        .select_from(Task)
+        .outerjoin(Category, Task.category_id == Category.id)
+        .where(Task.user_id == user_id)
+        .group_by(Task.priority, Category.id, Category.name)
+    )
+
+    stats = UserStats()
+    for priority, category, total, completed, overdue, completed_this_week in result.all():
+        completed = completed or 0
+        stats.total += total
+        stats.completed += completed
+        stats.overdue += overdue or 0
+        stats.completed_this_week += completed_this_week or 0
+
+        counts = stats.by_priority.setdefault(priority or Priority.MEDIUM, [0, 0])
+        counts[0] += total
+        counts[1] += completed
+
+        counts = stats.by_category.setdefault(category, [0, 0])
+        counts[0] += total
+        counts[1] += completed
+
+    return stats
+
+
+async def get_user_counters(session, user_id: int) -> UserStats:
+    # O(1): одна строка счетчиков, которую поддерживают триггеры
+    result = await session.execute(
+        select(UserTaskCounter.total, UserTaskCounter.completed)
+        .where(UserTaskCounter.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return UserStats()
+    return UserStats(total=row.total, completed=row.completed)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from aiogram.fsm.storage.memory import MemoryStorage
+from config.config import FSM_STORAGE, FSM_STORAGE_URL, FSM_STATE_TTL
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в отдельном файле SQLite (WAL).
+
+    Состояние и данные лежат в одной строке; строка устаревает через ttl секунд
+    после последней записи, как state_ttl/data_ttl у RedisStorage.
+    """
+
+    def __init__(self, path: str = "fsm.db", ttl: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl
+        self._db = None
+        self._connect_lock = asyncio.Lock()
+        self._writes = 0
+
+    async def _connection(self):
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.path)
+                    await db.execute("PRAGMA journal_mode=WAL")
+                    await db.execute("PRAGMA synchronous=NORMAL")
+                    await db.execute("PRAGMA busy_timeout=5000")
+                    await db.execute(
+                        "CREATE TABLE IF NOT EXISTS fsm_storage ("
+                        "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', "
+                        "expires_at REAL)"
+                    )
+                    await db.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_fsm_storage_expires_at ON fsm_storage (expires_at)"
+                    )
+                    await db.commit()
+                    self._db = db
+        return self._db
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _expires_at(self, now: float) -> Optional[float]:
+        return now + self.ttl if self.ttl else None
+
+    async def _write(self, sql: str, params: tuple):
+        db = await self._connection()
+        await db.execute(sql, params)
+        self._writes += 1
+        # Периодически вычищаем устаревшие строки, чтобы таблица не росла
+        if self.ttl and self._writes % 1000 == 0:
+            await db.execute(
+                "DELETE FROM fsm_storage WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),)
+            )
+        await db.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        now = time.time()
+        # Если строка уже устарела, ее данные сбрасываются вместе с состоянием
+        await self._write(
+            "INSERT INTO fsm_storage (key, state, data, expires_at) VALUES (?, ?, '{}', ?) "
+            "ON CONFLICT (key) DO UPDATE SET state = excluded.state, "
+            "data = CASE WHEN fsm_storage.expires_at <= ? THEN '{}' ELSE fsm_storage.data END, "
+            "expires_at = excluded.expires_at",
+            (self._key(key), state, self._expires_at(now), now)
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        db = await self._connection()
+        async with db.execute(
+            "SELECT state FROM fsm_storage WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self._key(key), time.time())
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        now = time.time()
+        await self._write(
+            "INSERT INTO fsm_storage (key, state, data, expires_at) VALUES (?, NULL, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, "
+            "state = CASE WHEN fsm_storage.expires_at <= ? THEN NULL ELSE fsm_storage.state END, "
+            "expires_at = excluded.expires_at",
+            (self._key(key), json.dumps(data, ensure_ascii=False), self._expires_at(now), now)
+        )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        db = await self._connection()
+        async with db.execute(
+            "SELECT data FROM fsm_storage WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self._key(key), time.time())
+        ) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else {}
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+def create_storage(kind: str = FSM_STORAGE, url: str = FSM_STORAGE_URL, ttl: int = FSM_STATE_TTL) -> BaseStorage:
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "sqlite":
+        return SQLiteStorage(url or "fsm.db", ttl=ttl)
+    if kind == "redis":
+        # Нужен пакет redis; подойдет любой сервер с протоколом Redis
+        from aiogram.fsm.storage.redis import RedisStorage
+        # ttl=0 - без ограничения: Redis не принимает SET ... EX 0, поэтому передаем None
+        return RedisStorage.from_url(url or "redis://localhost:6379/0", state_ttl=ttl or None, data_ttl=ttl or None)
+    raise ValueError(f"Неизвестный тип FSM-хранилища: {kind}")
@@ -0,0 +1,218 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import select, update, delete
+from config.config import DEFAULT_TIMEZONE
+from .models import Task, TaskSeries, Priority
+from .recurrence import RecurrenceError, parse_rule, next_occurrence
+from .timezones import to_local, to_utc, utcnow
+
+
+class TaskNotFoundError(LookupError):
+    pass
+
+
+class TaskConflictError(Exception):
+    """Задачу изменили после того, как пользователь ее увидел."""
+
+    def __init__(self, task: Task):
+        super().__init__(f"Задача {task.id} изменена (версия {task.version})")
+        self.task = task
+
+
+def parse_task_callback(data: str) -> Tuple[int, Optional[int]]:
+    # <действие>_<id>[_<версия>]; у старых кнопок версии нет
+    parts = data.split("_")
+    if parts[-2].isdigit():
+        return int(parts[-2]), int(parts[-1])
+    return int(parts[-1]), None
+
+
+async def get_task(session, user_id: int, task_id: int) -> Optional[Task]:
+    result = await session.execute(
+        select(Task).where(Task.id == task_id, Task.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+def _guarded(statement, user_id: int, task_id: int, version: Optional[int]):
+    statement = statement.where(Task.id == task_id, Task.user_id == user_id)
+    if version is not None:
+        statement = statement.where(Task.version == version)
+    return statement
+
+
+async def _raise_for_missing(session, user_id: int, task_id: int):
+    # Запрос ничего не изменил: задачи нет, она чужая или версия устарела
+    task = await get_task(session, user_id, task_id)
+    if task is None:
+        raise TaskNotFoundError(task_id)
+    raise TaskConflictError(task)
+
+
+async def _update_task(session, user_id: int, task_id: int, version: Optional[int], *conditions, **values) -> Task:
+    result = await session.execute(
+        _guarded(update(Task), user_id, task_id, version)
+        .where(*conditions)
+        .values(version=Task.version + 1, **values)
+        .returning(Task)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    task = result.scalar_one_or_none()
+    if task is None:
+        await session.rollback()
+        await _raise_for_missing(session, user_id, task_id)
+    return task
+
+
+async def update_task(session, user_id: int, task_id: int, version: Optional[int], *conditions, **values) -> Task:
+    """Изменяет задачу одним UPDATE ... RETURNING.
+
+    Изменение применяется, только если задача принадлежит пользователю и ее
+    версия совпадает с version (None - без проверки версии), а также
+    выполнены дополнительные условия conditions.
+    """
+    task = await _update_task(session, user_id, task_id, version, *conditions, **values)
+    await session.commit()
+    return task
+
+
+async def _advance_series(session, task, now: datetime) -> Optional[Task]:
+    # Следующее повторение создается только при выполнении текущего:
+    # у серии в базе всегда не больше одной открытой задачи
+    series = await session.get(TaskSeries, task.series_id)
+    if series is None or task.due_date is None:
+        return None
+    rule = parse_rule(series.rule)
+    if rule.count is not None and series.occurrences >= rule.count:
+        return None
+    # Пропущенные повторения не создаются: следующее - после срока или после "сейчас".
+    # Календарная арифметика - в местном времени серии, хранение - в UTC
+    after = to_local(max(task.due_date, now), series.timezone)
+    due_date = next_occurrence(rule, to_local(series.dtstart, series.timezone), after)
+    if due_date is None:
+        return None
+    due_date = to_utc(due_date, series.timezone)
+
+    next_task = Task(
+        user_id=task.user_id,
+        category_id=task.category_id,
+        title=task.title,
+        description=task.description,
+        priority=task.priority,
+        due_date=due_date,
+        series_id=series.id
+    )
+    session.add(next_task)
+    series.occurrences += 1
+    await session.flush()
+    return next_task
+
+
+async def complete_task(session, user_id: int, task_id: int, version: Optional[int] = None) -> Tuple[Task, Optional[Task]]:
+    """Выполняет задачу; для повторяющейся в той же транзакции создает следующее
+    повторение. Возвращает (задача, следующее повторение или None)."""
+    # Повторное выполнение не сдвигает completed_at и не создает лишних повторений
+    task = await _update_task(
+        session, user_id, task_id, version,
+        Task.is_completed.is_not(True),
+        is_completed=True,
+        completed_at=utcnow()
+    )
+    next_task = await _advance_series(session, task, utcnow()) if task.series_id else None
+    await session.commit()
+    return task, next_task
+
+
+async def set_recurrence(
+    session, user_id: int, task_id: int, version: Optional[int], rule: Optional[str], tz: str = DEFAULT_TIMEZONE
+) -> Task:
+    """Делает задачу первым повторением новой серии (rule=None - отключает повтор).
+
+    Повторения считаются в часовом поясе tz.
+    """
+    if rule is None:
+        return await update_task(session, user_id, task_id, version, series_id=None)
+
+    rule = str(parse_rule(rule))
+    # Только колонки, без загрузки Task: иначе UPDATE ... RETURNING ниже
+    # вернул бы объект из identity map со старыми значениями
+    row = (await session.execute(
+        select(Task.id, Task.due_date).where(Task.id == task_id, Task.user_id == user_id)
+    )).first()
+    if row is None:
+        raise TaskNotFoundError(task_id)
+    if row.due_date is None:
+        raise RecurrenceError("Для повторяющейся задачи нужна дата выполнения")
+
+    series = TaskSeries(user_id=user_id, rule=rule, dtstart=row.due_date, timezone=tz, occurrences=1)
+    session.add(series)
+    await session.flush()
+    return await update_task(session, user_id, task_id, version, series_id=series.id)
+
+
+async def get_task_rule(session, task: Task) -> Optional[str]:
+    if task.series_id is None:
+        return None
+    return await session.scalar(select(TaskSeries.rule).where(TaskSeries.id == task.series_id))
+
+
+async def delete_task(session, user_id: int, task_id: int, version: Optional[int] = None):
+    result = await session.execute(
+        _guarded(delete(Task), user_id, task_id, version)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is None:
+        await session.rollback()
+        await _raise_for_missing(session, user_id, task_id)
+    await session.commit()
+
+
+# Массовые операции: один оператор на все выбранные задачи пользователя.
+# Версии не проверяются - пользователь выбирал задачи по текущему списку.
+# Возвращают id задач, которые действительно изменились.
+
+async def _bulk(session, statement) -> List[int]:
+    result = await session.execute(
+        statement.returning(Task.id).execution_options(synchronize_session=False)
+    )
+    task_ids = list(result.scalars().all())
+    await session.commit()
+    return task_ids
+
+
+async def complete_tasks(session, user_id: int, task_ids: Iterable[int]) -> Tuple[List[int], List[Task]]:
+    # Возвращает также созданные следующие повторения повторяющихся задач
+    result = await session.execute(
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(list(task_ids)), Task.is_completed.is_not(True))
+        .values(is_completed=True, completed_at=utcnow(), version=Task.version + 1)
+        .returning(Task)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    tasks = list(result.scalars().all())
+    now = utcnow()
+    next_tasks = []
+    for task in tasks:
+        if task.series_id:
+            next_task = await _advance_series(session, task, now)
+            if next_task is not None:
+                next_tasks.append(next_task)
+    await session.commit()
+    return [task.id for task in tasks], next_tasks
+
+
+async def delete_tasks(session, user_id: int, task_ids: Iterable[int]) -> List[int]:
+    return await _bulk(
+        session,
+        delete(Task).where(Task.user_id == user_id, Task.id.in_(list(task_ids)))
+    )
+
+
+async def set_tasks_priority(session, user_id: int, task_ids: Iterable[int], priority: Priority) -> List[int]:
+    return await _bulk(
+        session,
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(list(task_ids)), Task.priority.is_distinct_from(priority))
+        .values(priority=priority, version=Task.version + 1)
+    )
@@ -0,0 +1,50 @@
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Все даты в базе - "наивные" datetime в UTC. В часовой пояс пользователя
+# они переводятся только на границе: при разборе ввода и при выводе
+
+_OFFSET_RE = re.compile(r"^(?:UTC|GMT)?\s*([+-])\s*(\d{1,2})$", re.IGNORECASE)
+
+
+class TimezoneError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    # Поясов в ходу единицы, объект создается один раз на имя
+    return ZoneInfo(name)
+
+
+def parse_timezone(text: str) -> str:
+    """Имя пояса IANA (Europe/Moscow) или смещение в часах (+3, UTC-5)."""
+    text = text.strip()
+    match = _OFFSET_RE.match(text)
+    if match:
+        sign, hours = match.groups()
+        if int(hours) > 14:
+            raise TimezoneError(f"Неверное смещение: {text}")
+        # У поясов Etc/GMT знак обратный: Etc/GMT-3 - это UTC+3
+        text = "UTC" if int(hours) == 0 else f"Etc/GMT{'-' if sign == '+' else '+'}{int(hours)}"
+    try:
+        get_zone(text)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise TimezoneError(f"Неизвестный часовой пояс: {text}")
+    return text
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc(value: datetime, tz: str) -> datetime:
+    # Местное время пользователя -> UTC для хранения
+    return value.replace(tzinfo=get_zone(tz)).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_local(value: datetime, tz: str) -> datetime:
+    # UTC из базы -> местное время пользователя для вывода и расчетов по календарю
+    return value.replace(tzinfo=timezone.utc).astimezone(get_zone(tz)).replace(tzinfo=None)
@@ -0,0 +1,67 @@
+import logging
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from config.config import EDIT_CACHE_SIZE, EDIT_CACHE_TTL
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# (chat_id, message_id) -> (хэш текста, хэш клавиатуры) того, что сейчас показано
+rendered = TTLCache(maxsize=EDIT_CACHE_SIZE, ttl=EDIT_CACHE_TTL)
+
+
+def _markup_hash(reply_markup) -> int:
+    if reply_markup is None or not getattr(reply_markup, "inline_keyboard", None):
+        return hash(None)
+    return hash(reply_markup.model_dump_json(exclude_none=True))
+
+
+def _shown(message: Message):
+    # Если сообщение еще не редактировали, сравниваем с его копией из апдейта
+    shown = rendered.get((message.chat.id, message.message_id))
+    if shown is None:
+        shown = (hash(message.text), _markup_hash(message.reply_markup))
+    return shown
+
+
+def remember(message: Message, text: str, reply_markup=None):
+    rendered.set((message.chat.id, message.message_id), (hash(text), _markup_hash(reply_markup)))
+
+
+def _not_modified(error: TelegramBadRequest) -> bool:
+    return "message is not modified" in error.message
+
+
+async def edit_text(message: Message, text: str, reply_markup=None) -> Message:
+    """Показывает text в существующем сообщении вместо отправки нового.
+
+    Если содержимое не изменилось, запрос к API не делается. Если сообщение
+    уже нельзя отредактировать (удалено, слишком старое, не текстовое),
+    отправляется новое. Возвращает сообщение, в котором теперь текст.
+    """
+    content = (hash(text), _markup_hash(reply_markup))
+    if _shown(message) == content:
+        return message
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if not _not_modified(e):
+            logger.info(f"Не удалось отредактировать сообщение, отправляем новое: {e.message}")
+            message = await message.answer(text, reply_markup=reply_markup)
+    rendered.set((message.chat.id, message.message_id), content)
+    return message
+
+
+async def edit_reply_markup(message: Message, reply_markup=None) -> Message:
+    text_hash, markup_hash = _shown(message)
+    if markup_hash == _markup_hash(reply_markup):
+        return message
+    try:
+        await message.edit_reply_markup(reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if not _not_modified(e):
+            logger.info(f"Не удалось отредактировать клавиатуру, отправляем новое сообщение: {e.message}")
+            message = await message.answer(message.text or "…", reply_markup=reply_markup)
+            text_hash = hash(message.text)
+    rendered.set((message.chat.id, message.message_id), (text_hash, _markup_hash(reply_markup)))
+    return message
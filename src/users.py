@@ -0,0 +1,102 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from config.config import USER_CACHE_SIZE, USER_CACHE_TTL, DEFAULT_TIMEZONE
+from .cache import TTLCache
+from .models import User
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    # Снимок строки users, который безопасно хранить между сессиями
+    id: int
+    telegram_id: int
+    notification_time: int
+    digest_window: int = 0
+    morning_digest_at: Optional[int] = None
+    timezone: str = DEFAULT_TIMEZONE
+
+
+# telegram_id -> CachedUser
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _snapshot(user: User) -> CachedUser:
+    return CachedUser(
+        id=user.id,
+        telegram_id=user.telegram_id,
+        notification_time=user.notification_time,
+        digest_window=user.digest_window or 0,
+        morning_digest_at=user.morning_digest_at,
+        timezone=user.timezone or DEFAULT_TIMEZONE
+    )
+
+
+async def resolve_user(session, from_user) -> CachedUser:
+    cached = user_cache.get(from_user.id)
+    if cached is not None:
+        return cached
+
+    result = await session.execute(
+        select(User).where(User.telegram_id == from_user.id)
+    )
+    user = result.scalar_one_or_none()
+
+    if user is None:
+        user = User(
+            telegram_id=from_user.id,
+            username=from_user.username,
+            first_name=from_user.first_name,
+            last_name=from_user.last_name
+        )
+        session.add(user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Пользователя одновременно создал параллельный апдейт
+            await session.rollback()
+            result = await session.execute(
+                select(User).where(User.telegram_id == from_user.id)
+            )
+            user = result.scalar_one()
+
+    cached = _snapshot(user)
+    user_cache.set(from_user.id, cached)
+    return cached
+
+
+async def upsert_user(session, from_user) -> CachedUser:
+    user = await resolve_user(session, from_user)
+    await session.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(
+            username=from_user.username,
+            first_name=from_user.first_name,
+            last_name=from_user.last_name
+        )
+    )
+    await session.commit()
+    return user
+
+
+async def set_notification_time(session, user: CachedUser, hours: int) -> CachedUser:
+    await session.execute(
+        update(User).where(User.id == user.id).values(notification_time=hours)
+    )
+    await session.commit()
+    user = replace(user, notification_time=hours)
+    user_cache.set(user.telegram_id, user)
+    return user
+
+
+async def update_user_settings(session, user: CachedUser, **values) -> CachedUser:
+    # values: digest_window, morning_digest_at, timezone
+    await session.execute(
+        update(User).where(User.id == user.id).values(**values)
+    )
+    await session.commit()
+    user = replace(user, **values)
+    user_cache.set(user.telegram_id, user)
+    return user
@@ -0,0 +1,113 @@
+import asyncio
+import hmac
+import logging
+import signal
+from aiohttp import web
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Прием апдейтов по webhook.
+
+    Апдейт подтверждается сразу и обрабатывается в фоне: одновременно
+    не больше max_concurrency обработчиков, а если в очереди уже max_pending
+    апдейтов, сервер отвечает 503 и Telegram повторит доставку позже.
+    """
+
+    def __init__(self, dp, bot, secret_token: str = None, max_concurrency: int = 32, max_pending: int = 256):
+        self.dp = dp
+        self.bot = bot
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self._closing = False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            return web.Response(status=403)
+        if self._closing or len(self._tasks) >= self.max_pending:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Некорректный апдейт в webhook: {e}")
+            return web.Response(status=400)
+
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update):
+        async with self._semaphore:
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке апдейта {update.update_id}: {e}")
+
+    async def drain(self, timeout: float = 30):
+        # Новые апдейты больше не принимаем, ждем уже принятые
+        self._closing = True
+        if self._tasks:
+            logger.info(f"Ожидаем завершения {len(self._tasks)} апдейтов")
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+def create_webhook_app(server: WebhookServer, path: str = "/webhook") -> web.Application:
+    app = web.Application()
+    app.router.add_post(path, server.handle)
+    return app
+
+
+async def run_webhook(
+    dp,
+    bot,
+    url: str,
+    path: str = "/webhook",
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    secret_token: str = None,
+    max_concurrency: int = 32,
+    max_pending: int = 256,
+    allowed_updates: list = None
+):
+    server = WebhookServer(dp, bot, secret_token, max_concurrency, max_pending)
+    runner = web.AppRunner(create_webhook_app(server, path))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    try:
+        await site.start()
+        await bot.set_webhook(
+            url.rstrip("/") + path,
+            secret_token=secret_token,
+            max_connections=max_concurrency,
+            allowed_updates=allowed_updates if allowed_updates is not None else dp.resolve_used_update_types()
+        )
+        logger.info(f"Webhook запущен на {host}:{port}{path}")
+        await stop.wait()
+    finally:
+        # Сначала перестаем принимать запросы, затем дожидаемся обработки принятых
+        await site.stop()
+        await server.drain()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+        logger.info("Webhook остановлен")
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from config.config import BOT_TOKEN, WORKER_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(chat_id: int, shard_count: int) -> int:
+    return chat_id % shard_count
+
+
+class ShardRoutingMiddleware:
+    """Внешний middleware диспетчера-маршрутизатора: вместо обработки
+    отправляет апдейт воркеру, которому принадлежит чат.
+
+    Все апдейты одного чата попадают в один процесс, поэтому порядок
+    сообщений пользователя и его состояние FSM остаются согласованными.
+    """
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    async def __call__(self, handler, event: Update, data):
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat is not None else user.id if user is not None else 0
+        self.queues[shard_for(key, len(self.queues))].put(
+            (key, event.model_dump_json(exclude_unset=True))
+        )
+
+
+class ChatOrderedExecutor:
+    # Апдейты разных чатов обрабатываются параллельно, одного чата - строго по очереди
+    def __init__(self, dp: Dispatcher, bot: Bot, max_concurrency: int):
+        self.dp = dp
+        self.bot = bot
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._locks = {}
+        self._tasks = set()
+
+    def submit(self, key: int, update: Update):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = [asyncio.Lock(), 0]
+        lock[1] += 1
+        task = asyncio.create_task(self._process(key, lock, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, key, lock, update: Update):
+        try:
+            async with lock[0], self._semaphore:
+                await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке апдейта {update.update_id}: {e}")
+        finally:
+            lock[1] -= 1
+            if not lock[1]:
+                self._locks.pop(key, None)
+
+    async def drain(self):
+        if self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+
+async def _run_worker(index: int, count: int, queue):
+    from .app import create_dispatcher, start_services, stop_services
+
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher()
+    await start_services(dp, bot, shard_index=index, shard_count=count)
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    executor = ChatOrderedExecutor(dp, bot, WORKER_MAX_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    logger.info(f"Воркер {index + 1}/{count} запущен")
+
+    try:
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            key, payload = item
+            executor.submit(key, Update.model_validate_json(payload, context={"bot": bot}))
+    finally:
+        await executor.drain()
+        await stop_services(dp)
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+        logger.info(f"Воркер {index + 1}/{count} остановлен")
+
+
+def worker_main(index: int, count: int, queue):
+    # Остановкой воркеров управляет родительский процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s',
+        force=True
+    )
+    asyncio.run(_run_worker(index, count, queue))
+
+
+def start_workers(count: int):
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(count)]
+    processes = [
+        context.Process(target=worker_main, args=(index, count, queue), name=f"worker-{index}")
+        for index, queue in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+    return queues, processes
+
+
+def stop_workers(queues, processes, timeout: float = 60):
+    for queue in queues:
+        queue.put(None)
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+def create_router_dispatcher(queues) -> Dispatcher:
+    # Маршрутизатору не нужны ни обработчики, ни FSM - только раздача апдейтов
+    dp = Dispatcher(disable_fsm=True)
+    dp.update.outer_middleware(ShardRoutingMiddleware(queues))
+    return dp
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Тесты не трогают рабочую базу: движок из src.database создается при импорте
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+# src.migrations импортирует модели, которым нужен Base из src.database
+from src.database import create_migration_engine  # noqa: E402
+from src.migrations import upgrade  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    # Файл базы с актуальной схемой; асинхронные движки тестов открывают его сами
+    path = tmp_path / "todo.db"
+    engine = create_migration_engine(f"sqlite:///{path}")
+    upgrade(engine)
+    engine.dispose()
+    return path
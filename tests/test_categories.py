@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import categories
+from src.categories import CategoryLimitError, add_user_category, category_cache, get_user_categories
+from src.database import SQLiteSession
+from src.models import Category, User
+
+
+def run_with_db(db_path, test):
+    async def main():
+        category_cache.clear()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100))
+                session.add(User(id=2, telegram_id=200))
+                await session.commit()
+            async with session_maker() as session:
+                return await test(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def colors(categories):
+    return [(category.name, category.color) for category in categories]
+
+
+def test_same_category_keeps_each_users_color(db_path):
+    async def test(session):
+        await add_user_category(session, 1, "Работа", "#FF0000")
+        added = await add_user_category(session, 2, "Работа", "#00FF00")
+        return (
+            added.color,
+            colors(await get_user_categories(session, 1)),
+            colors(await get_user_categories(session, 2)),
+            await session.scalar(select(func.count()).select_from(Category))
+        )
+
+    added, first, second, total = run_with_db(db_path, test)
+    assert added == "#00FF00"
+    assert first == [("Работа", "#FF0000")]
+    assert second == [("Работа", "#00FF00")]
+    # Сама категория одна на всех
+    assert total == 1
+
+
+def test_adding_again_changes_color_even_at_limit(db_path, monkeypatch):
+    monkeypatch.setattr(categories, "MAX_USER_CATEGORIES", 1)
+
+    async def test(session):
+        await add_user_category(session, 1, "Дом", "#FF0000")
+        await add_user_category(session, 1, "Дом", "#0000FF")
+        with pytest.raises(CategoryLimitError):
+            await add_user_category(session, 1, "Работа", "#FFFFFF")
+        return colors(await get_user_categories(session, 1))
+
+    assert run_with_db(db_path, test) == [("Дом", "#0000FF")]
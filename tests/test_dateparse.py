@@ -0,0 +1,151 @@
+from datetime import datetime as D
+
+import pytest
+
+from src.dateparse import DateParseError, parse_due, parse_quick_add
+from src.models import Priority
+
+# Воскресенье, 18 октября 2026, 14:30 по местному времени пользователя
+NOW = D(2026, 10, 18, 14, 30)
+
+DUE_DATES = [
+    # Формат до появления разбора на естественном языке (быстрый путь)
+    ("18.10.2026", D(2026, 10, 18, 23, 59)),
+    ("18.10.2026 18:00", D(2026, 10, 18, 18)),
+    ("1.2.2027", D(2027, 2, 1, 23, 59)),
+    # Числовые даты
+    ("25.12", D(2026, 12, 25, 23, 59)),
+    ("01.03", D(2027, 3, 1, 23, 59)),
+    ("25.12.26", D(2026, 12, 25, 23, 59)),
+    ("2026-11-05", D(2026, 11, 5, 23, 59)),
+    # Ключевые слова и время
+    ("сегодня", D(2026, 10, 18, 23, 59)),
+    ("Сегодня в 18:00", D(2026, 10, 18, 18)),
+    ("завтра", D(2026, 10, 19, 23, 59)),
+    ("завтра в 18:00", D(2026, 10, 19, 18)),
+    ("завтра в 9", D(2026, 10, 19, 9)),
+    ("завтра утром", D(2026, 10, 19, 9)),
+    ("завтра вечером", D(2026, 10, 19, 19)),
+    ("послезавтра", D(2026, 10, 20, 23, 59)),
+    ("в 7 вечера", D(2026, 10, 18, 19)),
+    ("в 18", D(2026, 10, 18, 18)),
+    ("в 10", D(2026, 10, 19, 10)),
+    ("18:45", D(2026, 10, 18, 18, 45)),
+    # Срок без времени - конец дня, а не уже прошедшая полночь
+    ("через 0 дней", D(2026, 10, 18, 23, 59)),
+    # Час без уточнения до 7 - дневной
+    ("в 5", D(2026, 10, 18, 17)),
+    ("at 5", D(2026, 10, 18, 17)),
+    ("завтра в 3", D(2026, 10, 19, 15)),
+    ("в 5 утра", D(2026, 10, 19, 5)),
+    ("в 3 ночи", D(2026, 10, 19, 3)),
+    ("at 5am", D(2026, 10, 19, 5)),
+    ("в 8", D(2026, 10, 19, 8)),
+    ("в 12", D(2026, 10, 19, 12)),
+    ("в 05:00", D(2026, 10, 19, 5)),
+    ("в 14:00", D(2026, 10, 19, 14)),
+    # Относительные сроки
+    ("через 3 дня", D(2026, 10, 21, 23, 59)),
+    ("через день", D(2026, 10, 19, 23, 59)),
+    ("через неделю", D(2026, 10, 25, 23, 59)),
+    ("через 2 недели", D(2026, 11, 1, 23, 59)),
+    ("через месяц", D(2026, 11, 18, 23, 59)),
+    ("через час", D(2026, 10, 18, 15, 30)),
+    ("через 15 минут", D(2026, 10, 18, 14, 45)),
+    ("через пару дней", D(2026, 10, 20, 23, 59)),
+    ("через три дня в 10:00", D(2026, 10, 21, 10)),
+    # Дни недели
+    ("в пятницу", D(2026, 10, 23, 23, 59)),
+    ("в пятницу в 18:00", D(2026, 10, 23, 18)),
+    ("пн", D(2026, 10, 19, 23, 59)),
+    ("в воскресенье", D(2026, 10, 25, 23, 59)),
+    ("в следующий вторник", D(2026, 10, 20, 23, 59)),
+    ("в среду", D(2026, 10, 21, 23, 59)),
+    ("к среде", D(2026, 10, 21, 23, 59)),
+    ("к пятнице", D(2026, 10, 23, 23, 59)),
+    ("ко вторнику", D(2026, 10, 20, 23, 59)),
+    ("до понедельника", D(2026, 10, 19, 23, 59)),
+    # Месяц словом
+    ("25 декабря", D(2026, 12, 25, 23, 59)),
+    ("1 января", D(2027, 1, 1, 23, 59)),
+    ("5 мая 2027", D(2027, 5, 5, 23, 59)),
+    ("3 окт", D(2027, 10, 3, 23, 59)),
+    ("20 окт.", D(2026, 10, 20, 23, 59)),
+    ("25 декабря в 23:59", D(2026, 12, 25, 23, 59)),
+    # Английский
+    ("today", D(2026, 10, 18, 23, 59)),
+    ("tomorrow", D(2026, 10, 19, 23, 59)),
+    ("tomorrow at 6pm", D(2026, 10, 19, 18)),
+    ("tomorrow 9am", D(2026, 10, 19, 9)),
+    ("tomorrow morning", D(2026, 10, 19, 9)),
+    ("fri evening", D(2026, 10, 23, 19)),
+    ("in the afternoon", D(2026, 10, 19, 14)),
+    ("next fri", D(2026, 10, 23, 23, 59)),
+    ("next sun", D(2026, 10, 25, 23, 59)),
+    ("on sat", D(2026, 10, 24, 23, 59)),
+    ("Friday", D(2026, 10, 23, 23, 59)),
+    ("on monday at 10:30", D(2026, 10, 19, 10, 30)),
+    ("in 3 days", D(2026, 10, 21, 23, 59)),
+    ("in an hour", D(2026, 10, 18, 15, 30)),
+    ("in 2 weeks", D(2026, 11, 1, 23, 59)),
+    ("dec 25", D(2026, 12, 25, 23, 59)),
+    ("December 31st", D(2026, 12, 31, 23, 59)),
+    ("jan 5, 2027", D(2027, 1, 5, 23, 59)),
+    ("day after tomorrow", D(2026, 10, 20, 23, 59)),
+    ("12am", D(2026, 10, 19, 0)),
+    ("12pm", D(2026, 10, 19, 12)),
+    ("tonight", D(2026, 10, 18, 20)),
+]
+
+NOT_DATES = [
+    "", "-", "когда-нибудь", "31.02.2026", "25.13", "завтра купить хлеб",
+    "в 25:00", "32 декабря", "через", "sometime", "sun", "morning", "1.2",
+]
+
+QUICK_ADD = [
+    ("Купить молоко завтра в 18:00 !high #дом", "Купить молоко", D(2026, 10, 19, 18), Priority.HIGH, "дом"),
+    ("Позвонить маме", "Позвонить маме", None, None, None),
+    ("Отчет !l", "Отчет", None, Priority.LOW, None),
+    ("#работа Подготовить отчет в пятницу", "Подготовить отчет", D(2026, 10, 23, 23, 59), None, "работа"),
+    ("Увеличить бюджет в 2 раза через неделю", "Увеличить бюджет в 2 раза", D(2026, 10, 25, 23, 59), None, None),
+    ("Buy milk tomorrow at 6pm !h", "Buy milk", D(2026, 10, 19, 18), Priority.HIGH, None),
+    ("Купить 18 машин", "Купить 18 машин", None, None, None),
+    ("Wow! Great", "Wow! Great", None, None, None),
+    ("Сдать отчет до 25.12 !высокий", "Сдать отчет", D(2026, 12, 25, 23, 59), Priority.HIGH, None),
+    ("Сдать отчет к пятнице", "Сдать отчет", D(2026, 10, 23, 23, 59), None, None),
+    # Предлог не откусывается от конца слова
+    ("Обновить python 3.11", "Обновить python", D(2026, 11, 3, 23, 59), None, None),
+    ("Trip to Lisbon 12.05", "Trip to Lisbon", D(2027, 5, 12, 23, 59), None, None),
+    ("Встреча у Иванов 25 декабря", "Встреча у Иванов", D(2026, 12, 25, 23, 59), None, None),
+    ("Позвонить Петров в 18:00", "Позвонить Петров", D(2026, 10, 18, 18), None, None),
+    ("Meet Gordon fri", "Meet Gordon", D(2026, 10, 23, 23, 59), None, None),
+    # Слова, похожие на даты и время, остаются в названии
+    ("Buy sun cream", "Buy sun cream", None, None, None),
+    ("Fix sat solver", "Fix sat solver", None, None, None),
+    ("Good morning routine", "Good morning routine", None, None, None),
+    ("Read chapter 1.2", "Read chapter 1.2", None, None, None),
+    ("Обновить до версии 2.4.1", "Обновить до версии 2.4.1", None, None, None),
+    ("Поздравить с днем рождения", "Поздравить с днем рождения", None, None, None),
+]
+
+
+@pytest.mark.parametrize("text, expected", DUE_DATES)
+def test_parse_due(text, expected):
+    assert parse_due(text, NOW) == expected
+
+
+@pytest.mark.parametrize("text", NOT_DATES)
+def test_parse_due_rejects(text):
+    with pytest.raises(DateParseError):
+        parse_due(text, NOW)
+
+
+@pytest.mark.parametrize("text, title, due_date, priority, category", QUICK_ADD)
+def test_parse_quick_add(text, title, due_date, priority, category):
+    quick = parse_quick_add(text, NOW)
+    assert (quick.title, quick.due_date, quick.priority, quick.category) == (title, due_date, priority, category)
+
+
+def test_quick_add_requires_title():
+    with pytest.raises(DateParseError):
+        parse_quick_add("завтра !high #дом", NOW)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from src.delivery import DeliveryQueue, TokenBucket
+
+
+class FakeBot:
+    """Бот, который отвечает заранее заданными ошибками, а потом отправляет."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((chat_id, time.monotonic()))
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+def retry_after(seconds):
+    return TelegramRetryAfter(SendMessage(chat_id=1, text="x"), "Too Many Requests", seconds)
+
+
+def deliver(bot, messages, **options):
+    """Отправляет messages [(chat_id, text)] и возвращает события on_sent/on_failed."""
+    async def main():
+        delivery = DeliveryQueue(bot, **options)
+        delivery.start()
+        events = []
+        for chat_id, text in messages:
+            delivery.send(
+                chat_id, text,
+                on_sent=lambda text=text: events.append(("sent", text)),
+                on_failed=lambda text=text: events.append(("failed", text))
+            )
+        await delivery.stop()
+        return events
+
+    return asyncio.run(main())
+
+
+def test_retry_after_pauses_and_retries():
+    bot = FakeBot([retry_after(1)])
+    # Лимит чата не мешает: пауза - только от ответа 429
+    events = deliver(bot, [(1, "a")], chat_rate=1000)
+
+    assert events == [("sent", "a")]
+    assert len(bot.calls) == 2
+    assert bot.calls[1][1] - bot.calls[0][1] >= 0.95
+
+
+def test_retry_after_pauses_other_chats():
+    bot = FakeBot([retry_after(1)])
+    deliver(bot, [(1, "a"), (2, "b")], workers=1, chat_rate=1000)
+
+    started = bot.calls[0][1]
+    assert all(at - started >= 0.95 for chat_id, at in bot.calls[1:])
+
+
+def test_failed_after_max_attempts():
+    bot = FakeBot([retry_after(0)] * 3)
+    events = deliver(bot, [(1, "a")], max_attempts=3, chat_rate=1000)
+
+    assert events == [("failed", "a")]
+    assert len(bot.calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    bot = FakeBot([RuntimeError("Forbidden: bot was blocked by the user")])
+    events = deliver(bot, [(1, "a"), (2, "b")], workers=1)
+
+    assert events == [("failed", "a"), ("sent", "b")]
+    assert len(bot.calls) == 2
+
+
+def test_chat_rate_limit():
+    bot = FakeBot()
+    deliver(bot, [(1, "a"), (1, "b"), (1, "c"), (2, "d")], chat_rate=10)
+
+    chat1 = [at for chat_id, at in bot.calls if chat_id == 1]
+    assert all(later - earlier >= 0.09 for earlier, later in zip(chat1, chat1[1:]))
+    # Другой чат не ждет очереди первого
+    chat2 = [at for chat_id, at in bot.calls if chat_id == 2]
+    assert chat2[0] - bot.calls[0][1] < 0.05
+
+
+def test_token_bucket_reserves_tokens():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    # Третий токен - через 0.1 с, четвертый - еще через 0.1 с
+    assert 0.09 <= bucket.take() <= 0.1
+    assert 0.19 <= bucket.take() <= 0.2
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, User
+
+from src.handlers import router
+
+
+async def resolve_callback(data):
+    # Первый обработчик callback_query, чьи фильтры пропускают эти данные
+    callback = CallbackQuery(
+        id="1", from_user=User(id=100, is_bot=False, first_name="Тест"), chat_instance="1", data=data
+    )
+    for handler in router.callback_query.handlers:
+        passed, _ = await handler.check(callback, raw_state=None)
+        if passed:
+            return handler.callback
+    return None
+
+
+class RecordingCallback:
+    def __init__(self, data):
+        self.data = data
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+
+@pytest.mark.parametrize("data", ["edit_description_5_2", "edit_date_5_2", "edit_category_5", "category_3"])
+def test_buttons_without_feature_are_answered(data):
+    handler = asyncio.run(resolve_callback(data))
+    assert handler is not None
+
+    callback = RecordingCallback(data)
+    asyncio.run(handler(callback))
+    assert callback.answers == ["🚧 Эта функция пока недоступна"]
+
+
+@pytest.mark.parametrize("data, name", [
+    ("edit_5_2", "process_edit_task"),
+    ("edit_title_5_2", "process_edit_title"),
+    ("edit_priority_5_2", "process_edit_priority")
+])
+def test_edit_buttons_keep_their_handlers(data, name):
+    assert asyncio.run(resolve_callback(data)).__name__ == name
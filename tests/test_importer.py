@@ -0,0 +1,110 @@
+import asyncio
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession, _get_write_lock
+from src.exporter import export_tasks
+from src.importer import TaskImportError, import_tasks, open_import_file
+from src.models import Priority, Task, User
+
+
+def run_with_db(db_path, test):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100, notification_time=1))
+                session.add(User(id=2, telegram_id=200, notification_time=1))
+                await session.commit()
+            return await test(session_maker)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def count_tasks(session_maker, user_id: int = 1) -> int:
+    async with session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(Task).where(Task.user_id == user_id))
+
+
+async def run_import(session_maker, records, on_progress=None):
+    async with session_maker() as session:
+        return await import_tasks(session, 1, io.StringIO(json.dumps(records)), on_progress, chunk_size=2)
+
+
+def test_progress_is_reported_outside_write_transaction(db_path):
+    locked = []
+
+    async def on_progress(count):
+        locked.append((count, _get_write_lock().locked()))
+
+    async def test(session_maker):
+        imported = await run_import(session_maker, [{"title": f"Задача {n}"} for n in range(5)], on_progress)
+        return imported, await count_tasks(session_maker)
+
+    assert run_with_db(db_path, test) == (5, 5)
+    assert locked == [(2, False), (4, False)]
+
+
+def test_failed_import_writes_nothing_and_retry_does_not_duplicate(db_path):
+    records = [{"title": "a"}, {"title": "b"}, {"title": "c"}, {"description": "без названия"}]
+
+    async def test(session_maker):
+        try:
+            await run_import(session_maker, records)
+        except TaskImportError as e:
+            error = str(e)
+        saved_after_error = await count_tasks(session_maker)
+
+        records[-1]["title"] = "d"
+        await run_import(session_maker, records)
+        return error, saved_after_error, await count_tasks(session_maker)
+
+    error, saved_after_error, saved = run_with_db(db_path, test)
+    assert error.startswith("Задача №4")
+    assert saved_after_error == 0
+    assert saved == 4
+
+
+def test_gzip_export_round_trip(db_path):
+    tasks = [
+        Task(user_id=1, title="Купить молоко", description="2 л", priority=Priority.HIGH,
+             due_date=datetime(2026, 10, 19, 15, 0), created_at=datetime(2026, 10, 1, 8, 0)),
+        Task(user_id=1, title="Отчет", is_completed=True, priority=Priority.LOW,
+             created_at=datetime(2026, 9, 1, 8, 0), completed_at=datetime(2026, 9, 2, 8, 0)),
+        Task(user_id=1, title="Без срока \"в кавычках\"\nи с переводом строки", created_at=datetime(2026, 1, 1)),
+    ]
+    columns = (Task.title, Task.description, Task.is_completed, Task.created_at,
+               Task.due_date, Task.priority, Task.completed_at)
+
+    async def test(session_maker):
+        async with session_maker() as session:
+            session.add_all(tasks)
+            await session.commit()
+        for fmt in ("json", "ndjson"):
+            async with session_maker() as session:
+                file, count, filename = await export_tasks(session, 1, fmt, compress=True)
+            assert count == 3 and filename.endswith(f".{fmt}.gz")
+            # Загрузка в бот: двоичный файл, gzip определяется по сигнатуре
+            file.seek(0)
+            with open_import_file(file) as text_file:
+                async with session_maker() as session:
+                    assert await import_tasks(session, 2, text_file) == 3
+
+        async with session_maker() as session:
+            rows = {}
+            for user_id in (1, 2):
+                rows[user_id] = (await session.execute(
+                    select(*columns).where(Task.user_id == user_id).order_by(Task.id)
+                )).all()
+        return rows
+
+    rows = run_with_db(db_path, test)
+    assert rows[2] == rows[1] * 2
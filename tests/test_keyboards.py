@@ -0,0 +1,56 @@
+import src.database  # noqa: F401  # src.models нужен Base из src.database
+from src.categories import CachedCategory
+from src.keyboards import (
+    get_categories_keyboard, get_main_keyboard, get_priority_keyboard, get_task_actions_keyboard,
+    get_task_keyboard
+)
+from src.models import Priority, Task
+
+
+def make_task(task_id, is_completed=False):
+    return Task(id=task_id, title=f"Задача {task_id}", is_completed=is_completed, priority=Priority.HIGH, version=1)
+
+
+def test_static_keyboards_are_fresh_objects():
+    first = get_priority_keyboard()
+    first.inline_keyboard[0][0].text = "изменено"
+    first.inline_keyboard.append([])
+
+    second = get_priority_keyboard()
+    assert second is not first
+    assert second.inline_keyboard[0][0].text == "⬆️ Высокий"
+    assert len(second.inline_keyboard) == 3
+
+    main = get_main_keyboard()
+    main.keyboard.clear()
+    assert len(get_main_keyboard().keyboard) == 4
+
+
+def test_cached_task_rows_are_not_shared():
+    tasks = [make_task(1), make_task(2)]
+    first = get_task_keyboard(tasks, "list")
+    first.inline_keyboard[0][0].callback_data = "изменено"
+
+    second = get_task_keyboard(tasks, "list")
+    assert second.inline_keyboard[0][0] is not first.inline_keyboard[0][0]
+    assert second.inline_keyboard[0][0].callback_data == "task_1_1"
+    assert second.inline_keyboard[-1][0].callback_data == "bulk_start"
+
+
+def test_task_actions_depend_on_completion():
+    open_task = [row[0].callback_data for row in get_task_actions_keyboard(make_task(5)).inline_keyboard]
+    done_task = [row[0].callback_data for row in get_task_actions_keyboard(make_task(5, True)).inline_keyboard]
+
+    assert open_task[0] == "complete_5_1"
+    assert done_task == open_task[1:]
+
+
+def test_categories_keyboard():
+    categories = (CachedCategory(1, "Работа", "#ff0000"), CachedCategory(7, "Дом", "#00ff00"))
+    rows = get_categories_keyboard(categories).inline_keyboard
+
+    assert [(row[0].text, row[0].callback_data) for row in rows] == [
+        ("🎨 Работа", "category_1"),
+        ("🎨 Дом", "category_7"),
+        ("➕ Добавить категорию", "add_category")
+    ]
@@ -0,0 +1,20 @@
+import asyncio
+
+import main
+from src.handlers import router
+from src.workers import create_router_dispatcher
+
+
+def test_webhook_receives_handler_update_types(monkeypatch):
+    calls = []
+
+    async def fake_run_webhook(dp, bot, url, **kwargs):
+        calls.append(kwargs)
+
+    monkeypatch.setattr(main, "WEBHOOK_URL", "https://example.com")
+    monkeypatch.setattr(main, "run_webhook", fake_run_webhook)
+    # Диспетчер-маршрутизатор воркеров без обработчиков
+    asyncio.run(main.run(create_router_dispatcher([]), bot=None, handle_as_tasks=False))
+
+    assert calls[0]["allowed_updates"] == router.resolve_used_update_types()
+    assert {"message", "callback_query"} <= set(calls[0]["allowed_updates"])
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import migrations
+from src.database import SQLiteSession, create_migration_engine
+from src.pagination import fetch_task_page
+from src.scheduler import ReminderScheduler
+
+
+def test_failed_migration_leaves_no_changes(db_path, monkeypatch):
+    def broken(conn):
+        conn.execute(text("ALTER TABLE tasks ADD COLUMN broken INTEGER"))
+        raise RuntimeError("ошибка после ALTER TABLE")
+
+    latest = max(item[0] for item in migrations.MIGRATIONS)
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [(1000, "Сломанная", broken)])
+    engine = create_migration_engine(f"sqlite:///{db_path}")
+    try:
+        with pytest.raises(RuntimeError):
+            migrations.upgrade(engine)
+        columns = {column["name"] for column in inspect(engine).get_columns("tasks")}
+        with engine.begin() as conn:
+            version = migrations.get_schema_version(conn)
+    finally:
+        engine.dispose()
+
+    assert "broken" not in columns
+    assert version == latest
+
+
+def test_timezone_migration_converts_local_dates(tmp_path, monkeypatch):
+    # База до миграции 9: сроки записаны в местном времени сервера (Europe/Berlin)
+    engine = create_migration_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", [item for item in all_migrations if item[0] < 9])
+    local_dates = {
+        1: "2030-01-15 12:00:00.000000",  # зима, UTC+1
+        2: "2030-07-01 12:00:00.000000",  # лето, UTC+2
+        3: "2030-03-31 02:30:00.000000",  # несуществующее время при переходе на летнее
+        4: "2030-10-27 02:30:00.000000",  # время, которое при переходе на зимнее было дважды
+    }
+    try:
+        migrations.upgrade(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, telegram_id, notification_time) VALUES (1, 100, 1)"))
+            conn.execute(
+                text("INSERT INTO task_series (id, user_id, rule, dtstart) VALUES (1, 1, 'FREQ=DAILY', :dtstart)"),
+                {"dtstart": local_dates[2]}
+            )
+            for task_id, due_date in local_dates.items():
+                conn.execute(
+                    text("INSERT INTO tasks (id, user_id, title, due_date, last_notified, is_completed) "
+                         "VALUES (:id, 1, 'Задача', :due_date, :last_notified, 0)"),
+                    {"id": task_id, "due_date": due_date, "last_notified": local_dates[1] if task_id == 1 else None}
+                )
+            conn.execute(text("INSERT INTO tasks (id, user_id, title, is_completed) VALUES (5, 1, 'Без срока', 0)"))
+
+        monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations)
+        monkeypatch.setattr(migrations, "DEFAULT_TIMEZONE", "Europe/Berlin")
+        migrations.upgrade(engine)
+        with engine.begin() as conn:
+            tasks = {row.id: row for row in conn.execute(text("SELECT id, due_date, last_notified FROM tasks"))}
+            dtstart = conn.execute(text("SELECT dtstart FROM task_series")).scalar()
+            timezones = conn.execute(
+                text("SELECT timezone FROM users UNION SELECT timezone FROM task_series")
+            ).scalars().all()
+    finally:
+        engine.dispose()
+
+    def parse(value):
+        return datetime.fromisoformat(value) if value else None
+
+    assert {task_id: parse(row.due_date) for task_id, row in tasks.items()} == {
+        1: datetime(2030, 1, 15, 11, 0),
+        2: datetime(2030, 7, 1, 10, 0),
+        # Несуществующее время - со смещением до перехода (UTC+1)
+        3: datetime(2030, 3, 31, 1, 30),
+        # Неоднозначное - первое из двух (еще летнее время, UTC+2)
+        4: datetime(2030, 10, 27, 0, 30),
+        5: None,
+    }
+    assert parse(tasks[1].last_notified) == datetime(2030, 1, 15, 11, 0)
+    assert parse(dtstart) == datetime(2030, 7, 1, 10, 0)
+    assert timezones == ["Europe/Berlin"]
+
+
+def _capture_plans(db_path, run):
+    # Выполняет запросы приложения и возвращает EXPLAIN QUERY PLAN для каждого SELECT
+    statements = []
+
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            await run(session_maker)
+            async with engine.connect() as conn:
+                return [
+                    " | ".join(row[-1] for row in (
+                        await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    ).all())
+                    for statement, parameters in statements
+                ]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("view, after_id, index", [
+    ("list", None, "ix_tasks_user_id"),
+    ("list", 10, "ix_tasks_user_id"),
+    ("done", None, "ix_tasks_user_completed_id"),
+    ("done", 10, "ix_tasks_user_completed_id"),
+])
+def test_task_page_uses_index(db_path, view, after_id, index):
+    async def run(session_maker):
+        async with session_maker() as session:
+            await fetch_task_page(session, 1, view, after_id=after_id)
+
+    plans = _capture_plans(db_path, run)
+    assert len(plans) == 1
+    assert f"USING INDEX {index}" in plans[0] or f"USING COVERING INDEX {index}" in plans[0]
+
+
+def test_reminder_load_uses_index(db_path):
+    async def run(session_maker):
+        await ReminderScheduler(session_maker, delivery=None).load()
+
+    plans = _capture_plans(db_path, run)
+    assert len(plans) == 1
+    assert "INDEX ix_tasks_reminders" in plans[0]
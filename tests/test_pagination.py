@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession
+from src.models import Task, User
+from src.pagination import fetch_task_page, parse_page_callback
+from src.task_service import delete_tasks
+
+PAGE_SIZE = 4
+
+
+def run_with_db(db_path, test):
+    # У пользователя 1 задачи 1..21 через одну с задачами пользователя 2;
+    # выполнена каждая третья задача пользователя 1
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100))
+                session.add(User(id=2, telegram_id=200))
+                for task_id in range(1, 22):
+                    user_id = 1 if task_id % 2 else 2
+                    session.add(Task(
+                        id=task_id, user_id=user_id, title=f"Задача {task_id}",
+                        is_completed=user_id == 1 and task_id % 3 == 0
+                    ))
+                await session.commit()
+            return await test(session_maker)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def page(session_maker, view="list", after_id=None, before_id=None):
+    async with session_maker() as session:
+        result = await fetch_task_page(session, 1, view, after_id=after_id, before_id=before_id, page_size=PAGE_SIZE)
+    return [task.id for task in result.tasks], result.has_prev, result.has_next
+
+
+async def walk_forward(session_maker, view="list"):
+    pages, after_id = [], None
+    while True:
+        ids, has_prev, has_next = await page(session_maker, view, after_id=after_id)
+        pages.append((ids, has_prev, has_next))
+        if not has_next:
+            return pages
+        after_id = ids[-1]
+
+
+@pytest.mark.parametrize("view, expected", [
+    ("list", [n for n in range(1, 22, 2)]),
+    ("done", [3, 9, 15, 21]),
+    ("open", [1, 5, 7, 11, 13, 17, 19]),
+])
+def test_forward_pages_cover_view_once(db_path, view, expected):
+    pages = run_with_db(db_path, lambda session_maker: walk_forward(session_maker, view))
+
+    assert [task_id for ids, _, _ in pages for task_id in ids] == expected
+    assert all(len(ids) == PAGE_SIZE for ids, _, _ in pages[:-1])
+    assert [has_prev for _, has_prev, _ in pages] == [False] + [True] * (len(pages) - 1)
+    assert [has_next for _, _, has_next in pages] == [True] * (len(pages) - 1) + [False]
+
+
+def test_back_pages_mirror_forward_pages(db_path):
+    async def test(session_maker):
+        forward = await walk_forward(session_maker)
+        back, before_id = [], forward[-1][0][0]
+        while True:
+            ids, has_prev, has_next = await page(session_maker, before_id=before_id)
+            back.append((ids, has_prev, has_next))
+            if not has_prev:
+                return forward, back
+            before_id = ids[0]
+
+    forward, back = run_with_db(db_path, test)
+    # Назад с последней страницы - те же полные страницы в обратном порядке
+    assert [ids for ids, _, _ in back] == [ids for ids, _, _ in reversed(forward[:-1])]
+    assert back[-1][1] is False
+    assert all(has_next for _, _, has_next in back)
+
+
+def test_deleting_rows_between_pages_skips_and_repeats_nothing(db_path):
+    async def test(session_maker):
+        first, _, _ = await page(session_maker)
+        # Удалены задача-курсор в конце первой страницы и первая задача следующей
+        async with session_maker() as session:
+            await delete_tasks(session, 1, [first[-1], 9])
+        second, has_prev, _ = await page(session_maker, after_id=first[-1])
+        async with session_maker() as session:
+            await delete_tasks(session, 1, [second[0]])
+        back, _, _ = await page(session_maker, before_id=second[1])
+        return first, second, has_prev, back
+
+    first, second, has_prev, back = run_with_db(db_path, test)
+    assert first == [1, 3, 5, 7]
+    assert second == [11, 13, 15, 17]
+    assert has_prev
+    # Назад от второй задачи страницы - оставшиеся задачи перед ней
+    assert back == [1, 3, 5]
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("page_list_n_17", ("list", 17, None)),
+    ("page_done_p_3", ("done", None, 3)),
+])
+def test_parse_page_callback(data, expected):
+    assert parse_page_callback(data) == expected
+
+
+def test_parse_page_callback_rejects_unknown_view():
+    with pytest.raises(ValueError):
+        parse_page_callback("page_secret_n_1")
@@ -0,0 +1,176 @@
+import asyncio
+import calendar
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession
+from src.models import Task, User
+from src.scheduler import ReminderScheduler
+from src.recurrence import next_occurrence, parse_rule
+from src.task_service import TaskConflictError, complete_task, set_recurrence
+from src.timezones import to_local
+
+HORIZON = timedelta(days=800)
+
+
+def enumerate_occurrences(rule, dtstart):
+    """Все повторения до dtstart + HORIZON прямым перебором, по определению правила."""
+    occurrences = []
+    if rule.freq == "MONTHLY":
+        day = rule.bymonthday or dtstart.day
+        for months in range(0, 27, rule.interval):
+            year, month = divmod(dtstart.month - 1 + months, 12)
+            year += dtstart.year
+            month += 1
+            candidate = dtstart.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+            if candidate >= dtstart:
+                occurrences.append(candidate)
+    else:
+        week0 = (dtstart - timedelta(days=dtstart.weekday())).date()
+        step = 1 if rule.freq == "DAILY" else 7
+        for days in range(HORIZON.days):
+            candidate = dtstart + timedelta(days=days)
+            if rule.byday:
+                week = (candidate.date() - week0).days // 7
+                if week % rule.interval == 0 and candidate.weekday() in rule.byday:
+                    occurrences.append(candidate)
+            elif days % (step * rule.interval) == 0:
+                occurrences.append(candidate)
+    if rule.until is not None:
+        occurrences = [value for value in occurrences if value <= rule.until]
+    return occurrences
+
+
+def naive_next(occurrences, after):
+    return next((value for value in occurrences if value > after), None)
+
+
+RULES = [
+    ("FREQ=DAILY", datetime(2026, 1, 1, 9, 0)),
+    ("FREQ=DAILY;INTERVAL=3", datetime(2026, 2, 27, 23, 30)),
+    ("FREQ=WEEKLY", datetime(2026, 3, 4, 18, 0)),
+    ("FREQ=WEEKLY;INTERVAL=2", datetime(2026, 3, 4, 18, 0)),
+    ("FREQ=WEEKLY;BYDAY=MO,WE,FR", datetime(2026, 1, 7, 8, 0)),
+    ("FREQ=WEEKLY;BYDAY=TU,SU;INTERVAL=2", datetime(2026, 1, 8, 8, 0)),
+    ("FREQ=WEEKLY;BYDAY=MO;INTERVAL=3", datetime(2026, 1, 4, 0, 0)),
+    ("FREQ=MONTHLY", datetime(2026, 1, 31, 12, 0)),
+    ("FREQ=MONTHLY;BYMONTHDAY=31", datetime(2026, 1, 15, 12, 0)),
+    ("FREQ=MONTHLY;INTERVAL=2", datetime(2026, 1, 31, 12, 0)),
+    ("FREQ=MONTHLY;BYMONTHDAY=30;INTERVAL=5", datetime(2026, 2, 1, 7, 0)),
+    ("FREQ=DAILY;UNTIL=20260215", datetime(2026, 2, 1, 9, 0)),
+    ("FREQ=WEEKLY;BYDAY=SA;UNTIL=20260301T100000", datetime(2026, 1, 1, 10, 0)),
+    ("FREQ=MONTHLY;UNTIL=20260601", datetime(2026, 1, 31, 9, 0)),
+]
+
+
+@pytest.mark.parametrize("text, dtstart", RULES)
+def test_next_occurrence_matches_enumeration(text, dtstart):
+    rule = parse_rule(text)
+    occurrences = enumerate_occurrences(rule, dtstart)
+    # Моменты до начала серии, на повторениях, между ними и в разное время суток
+    after = dtstart - timedelta(days=3)
+    while after < dtstart + timedelta(days=700):
+        assert next_occurrence(rule, dtstart, after) == naive_next(occurrences, after), after
+        after += timedelta(hours=7, minutes=13)
+
+
+@pytest.mark.parametrize("text, dtstart", [
+    ("FREQ=DAILY;COUNT=5", datetime(2026, 1, 1, 9, 0)),
+    ("FREQ=WEEKLY;BYDAY=MO,TH;COUNT=7", datetime(2026, 1, 1, 9, 0)),
+    ("FREQ=MONTHLY;COUNT=13", datetime(2026, 1, 31, 9, 0)),
+])
+def test_count_limits_chain_of_occurrences(text, dtstart):
+    # COUNT проверяет вызывающий код: цепочка от dtstart обрывается на count повторениях
+    rule = parse_rule(text)
+    chain = [dtstart]
+    while len(chain) < rule.count:
+        chain.append(next_occurrence(rule, dtstart, chain[-1]))
+    assert chain == enumerate_occurrences(rule, dtstart)[:rule.count]
+
+
+def test_complete_task_creates_one_next_occurrence_until_count(db_path):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+
+        async def open_tasks():
+            async with session_maker() as session:
+                return list((await session.execute(
+                    select(Task.id, Task.due_date).where(Task.is_completed.is_not(True)).order_by(Task.id)
+                )).all())
+
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100, notification_time=1))
+                session.add(Task(id=1, user_id=1, title="Полить цветы", due_date=datetime(2030, 1, 1, 9, 0)))
+                await session.commit()
+            async with session_maker() as session:
+                await set_recurrence(session, 1, 1, None, "FREQ=DAILY;COUNT=3", "UTC")
+
+            task_id = 1
+            due_dates = []
+            for _ in range(3):
+                async with session_maker() as session:
+                    task, next_task = await complete_task(session, 1, task_id)
+                due_dates.append(task.due_date)
+                # Открытой остается ровно одна задача серии - следующее повторение
+                assert [row.id for row in await open_tasks()] == ([next_task.id] if next_task else [])
+                if next_task is None:
+                    break
+                # Повторное выполнение той же задачи не создает второго повторения
+                with pytest.raises(TaskConflictError):
+                    async with session_maker() as session:
+                        await complete_task(session, 1, task_id)
+                assert len(await open_tasks()) == 1
+                task_id = next_task.id
+
+            async with session_maker() as session:
+                total = await session.scalar(select(func.count()).select_from(Task))
+            return due_dates, next_task, total
+        finally:
+            await engine.dispose()
+
+    due_dates, next_task, total = asyncio.run(main())
+    assert due_dates == [datetime(2030, 1, day, 9, 0) for day in (1, 2, 3)]
+    assert next_task is None
+    assert total == 3
+
+
+@pytest.mark.parametrize("first_due, expected", [
+    # Переход на зимнее время в Берлине 27.10.2030: UTC+2 -> UTC+1
+    (datetime(2030, 10, 26, 7, 0), [datetime(2030, 10, 27, 8, 0), datetime(2030, 10, 28, 8, 0)]),
+    # Переход на летнее время 31.03.2030: UTC+1 -> UTC+2
+    (datetime(2030, 3, 30, 8, 0), [datetime(2030, 3, 31, 7, 0), datetime(2030, 4, 1, 7, 0)]),
+])
+def test_daily_series_keeps_local_time_across_dst(db_path, first_due, expected):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100, notification_time=1, timezone="Europe/Berlin"))
+                session.add(Task(id=1, user_id=1, title="Зарядка", due_date=first_due))
+                await session.commit()
+            async with session_maker() as session:
+                await set_recurrence(session, 1, 1, None, "FREQ=DAILY", "Europe/Berlin")
+
+            task_id, due_dates = 1, []
+            for _ in expected:
+                async with session_maker() as session:
+                    _, next_task = await complete_task(session, 1, task_id)
+                due_dates.append(next_task.due_date)
+                task_id = next_task.id
+            return due_dates
+        finally:
+            await engine.dispose()
+
+    due_dates = asyncio.run(main())
+    # В UTC срок сдвигается на час, по местному времени остается 09:00
+    assert due_dates == expected
+    assert [to_local(due, "Europe/Berlin").hour for due in due_dates] == [9, 9]
+    # Напоминание за час - в 08:00 по местному времени и в день перехода
+    assert [to_local(ReminderScheduler.fire_time(due, 1), "Europe/Berlin").hour for due in due_dates] == [8, 8]
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import timedelta
+
+from aiogram import Dispatcher
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession
+from src.delivery import DeliveryQueue
+from src.models import Task, User
+from src import scheduler as scheduler_module
+from src.app import stop_services
+from src.scheduler import RETRY_DELAY, ReminderScheduler
+from src.timezones import utcnow
+
+
+class FailingDelivery:
+    """Очередь доставки, которая не может отправить ни одного сообщения."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, chat_id, text, on_sent=None, on_failed=None, **kwargs):
+        self.sent.append(chat_id)
+        on_failed()
+
+
+class RecordingDelivery:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, chat_id, text, on_sent=None, on_failed=None, **kwargs):
+        self.sent.append(chat_id)
+        if on_sent is not None:
+            on_sent()
+
+
+class FailingBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        raise RuntimeError("Bad Request: chat not found")
+
+
+def run_with_db(db_path, test):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100, notification_time=1))
+                session.add(Task(id=1, user_id=1, title="Отчет", due_date=utcnow() + timedelta(minutes=30)))
+                await session.commit()
+            await test(session_maker)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_failed_reminder_is_retried_with_backoff(db_path):
+    async def test(session_maker):
+        delivery = FailingDelivery()
+        scheduler = ReminderScheduler(session_maker, delivery)
+
+        before = utcnow()
+        await scheduler._notify([1])
+        assert delivery.sent == [100]
+        assert scheduler._in_flight == set()
+        assert scheduler._notified == {}
+        first = scheduler._entries[1]
+        assert first >= before + RETRY_DELAY
+
+        del scheduler._entries[1]
+        before = utcnow()
+        await scheduler._notify([1])
+        assert scheduler._entries[1] >= before + 2 * RETRY_DELAY
+
+        async with session_maker() as session:
+            assert await session.scalar(select(Task.last_notified).where(Task.id == 1)) is None
+
+    run_with_db(db_path, test)
+
+
+def test_reschedule_skips_reminders_in_flight(db_path):
+    async def test(session_maker):
+        scheduler = ReminderScheduler(session_maker, delivery=None)
+        scheduler._in_flight.add(1)
+        async with session_maker() as session:
+            await scheduler.reschedule_user(session, 1, 2)
+        assert 1 not in scheduler._entries
+
+    run_with_db(db_path, test)
+
+
+def test_delivery_reports_failed_send():
+    async def main():
+        delivery = DeliveryQueue(FailingBot())
+        delivery.start()
+        events = []
+        delivery.send(100, "🔔", on_sent=lambda: events.append("sent"), on_failed=lambda: events.append("failed"))
+        await delivery.stop()
+        return events
+
+    assert asyncio.run(main()) == ["failed"]
+
+
+def test_reminder_fires_after_notify_error(db_path, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "RETRY_DELAY", timedelta(0))
+
+    async def test(session_maker):
+        delivery = RecordingDelivery()
+        scheduler = ReminderScheduler(session_maker, delivery)
+        notify = scheduler._notify
+        calls = []
+
+        async def flaky_notify(task_ids):
+            calls.append(list(task_ids))
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            await notify(task_ids)
+
+        scheduler._notify = flaky_notify
+        await scheduler.load()
+        loop = asyncio.create_task(scheduler._loop())
+        try:
+            for _ in range(100):
+                if delivery.sent:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            loop.cancel()
+            await asyncio.gather(loop, return_exceptions=True)
+
+        assert calls == [[1], [1]]
+        assert delivery.sent == [100]
+        assert 1 in scheduler._notified
+
+    run_with_db(db_path, test)
+
+
+class SlowBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.05)
+        self.sent.append(chat_id)
+
+
+def test_shutdown_persists_reminders_delivered_while_draining(db_path):
+    async def test(session_maker):
+        async with session_maker() as session:
+            for n in (2, 3):
+                session.add(User(id=n, telegram_id=100 + n, notification_time=1))
+                session.add(Task(id=n, user_id=n, title="Отчет", due_date=utcnow() + timedelta(minutes=30)))
+            await session.commit()
+
+        bot = SlowBot()
+        delivery = DeliveryQueue(bot, workers=1)
+        delivery.start()
+        scheduler = ReminderScheduler(session_maker, delivery, flush_interval=60)
+        await scheduler.load()
+        dp = Dispatcher()
+        dp["delivery"] = delivery
+        dp["scheduler"] = scheduler
+        dp["scheduler_task"] = asyncio.create_task(scheduler.run())
+        # Планировщик успевает поставить напоминания в очередь, но не дождаться отправки
+        for _ in range(100):
+            if scheduler._in_flight:
+                break
+            await asyncio.sleep(0.01)
+        await stop_services(dp)
+
+        assert sorted(bot.sent) == [100, 102, 103]
+        async with session_maker() as session:
+            notified = (await session.execute(select(Task.last_notified))).scalars().all()
+        assert None not in notified
+
+    run_with_db(db_path, test)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession
+from src.models import Task, User
+from src.search import extract_terms, search_tasks
+from src.task_service import update_task
+
+TASKS = [
+    # id, пользователь, название, описание
+    (1, 1, "Купить молоко", "и хлеб к завтраку"),
+    (2, 1, "Позвонить маме", None),
+    (3, 1, "Нарядить ёлку", "гирлянда в кладовке"),
+    (4, 1, "Buy milk", "organic"),
+    (5, 1, "Отчет за квартал", "молоко не забыть"),
+    (6, 11, "Купить молоко", "чужая задача"),
+    (7, 2, "Купить молоко", "чужая задача"),
+    (8, 1, 'Проверить "кавычки" и user_id', "NEAR OR AND *"),
+]
+
+
+def run_search(db_path, *queries, before=None):
+    # queries - строки запросов пользователя 1 или пары (пользователь, запрос)
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                for uid in (1, 2, 11):
+                    session.add(User(id=uid, telegram_id=uid * 100))
+                for task_id, uid, title, description in TASKS:
+                    session.add(Task(id=task_id, user_id=uid, title=title, description=description))
+                await session.commit()
+            if before is not None:
+                async with session_maker() as session:
+                    await before(session)
+            results = []
+            for query in queries:
+                user_id, query = query if isinstance(query, tuple) else (1, query)
+                async with session_maker() as session:
+                    page = await search_tasks(session, user_id, query)
+                results.append([task.id for task in page.tasks])
+            return results
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_search_is_scoped_to_user(db_path):
+    # user_id индексируется токеном: пользователь 1 не видит задач пользователей 11 и 2
+    assert run_search(db_path, "молоко", (11, "молоко"), (2, "молоко"), (3, "молоко")) == [[1, 5], [6], [7], []]
+
+
+def test_title_matches_rank_above_description(db_path):
+    assert run_search(db_path, "молоко") == [[1, 5]]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("моло", [1, 5]),
+    ("МОЛОКО", [1, 5]),
+    ("куп мол", [1]),
+    ("звон", []),
+    ("позв", [2]),
+    ("ёлку", [3]),
+    ("гирл", [3]),
+    ("mil", [4]),
+])
+def test_cyrillic_and_latin_prefixes(db_path, query, expected):
+    assert run_search(db_path, query) == [expected]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ('"', []),
+    ('молоко"', [1, 5]),
+    ("молоко*", [1, 5]),
+    ("молоко OR мама", []),
+    ("NEAR(молоко хлеб)", []),
+    # Фильтр по владельцу в запрос не подставить: user_id - просто слово
+    ("user_id : 2", []),
+    ("user_id", [8]),
+    ("title: молоко", []),
+    ("'; DROP TABLE tasks; --", []),
+    ("^молоко", [1, 5]),
+    ("-молоко", [1, 5]),
+    ("(", []),
+    ("кавычки", [8]),
+])
+def test_special_characters_do_not_break_query(db_path, query, expected):
+    # Операторы FTS5 отбрасываются: остаются только слова, и все они обязательны
+    assert run_search(db_path, query) == [expected]
+
+
+def test_index_follows_title_updates(db_path):
+    async def rename(session):
+        await update_task(session, 1, 2, None, title="Позвонить бабушке")
+
+    assert run_search(db_path, "маме", "бабушке", before=rename) == [[], [2]]
+
+
+def test_extract_terms():
+    assert extract_terms('Купить "молоко" OR хлеб*') == ["купить", "молоко", "or", "хлеб"]
+    assert extract_terms("!!! ---") == []
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import SQLiteSession
+from src.models import Category, Priority, Task, User
+from src.stats import get_user_counters, get_user_stats
+from src.task_service import (
+    complete_task, complete_tasks, delete_task, delete_tasks, set_tasks_priority, update_task
+)
+
+PAST = datetime(2020, 1, 1)
+FUTURE = datetime(2030, 1, 1)
+
+
+def run_with_db(db_path, test):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_maker = sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+        try:
+            async with session_maker() as session:
+                session.add(User(id=1, telegram_id=100))
+                session.add(User(id=2, telegram_id=200))
+                session.add(Category(id=1, name="Работа", color="#FF0000"))
+                rows = [
+                    # id, приоритет, категория, срок, выполнена
+                    (1, Priority.HIGH, 1, PAST, False),
+                    (2, Priority.HIGH, 1, FUTURE, False),
+                    (3, Priority.LOW, None, PAST, True),
+                    (4, Priority.MEDIUM, None, None, False),
+                    (5, Priority.MEDIUM, 1, PAST, False),
+                    (6, Priority.LOW, None, FUTURE, False),
+                    (7, Priority.HIGH, None, None, True),
+                ]
+                for task_id, priority, category_id, due_date, is_completed in rows:
+                    session.add(Task(
+                        id=task_id, user_id=1, title=f"Задача {task_id}", priority=priority,
+                        category_id=category_id, due_date=due_date, is_completed=is_completed,
+                        completed_at=PAST if is_completed else None
+                    ))
+                # Задачи другого пользователя не попадают в статистику
+                session.add(Task(id=8, user_id=2, title="Чужая", is_completed=True))
+                await session.commit()
+            async with session_maker() as session:
+                return await test(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def both_modes(session):
+    return await get_user_stats(session, 1), await get_user_counters(session, 1)
+
+
+def test_grouped_stats_match_seeded_tasks(db_path):
+    stats, counters = run_with_db(db_path, both_modes)
+
+    assert (stats.total, stats.completed, stats.pending, stats.progress) == (7, 2, 5, 28)
+    # Просрочены невыполненные со сроком в прошлом: 1 и 5
+    assert stats.overdue == 2
+    assert stats.completed_this_week == 0
+    assert stats.by_priority == {Priority.HIGH: [3, 1], Priority.MEDIUM: [2, 0], Priority.LOW: [2, 1]}
+    assert stats.by_category == {"Работа": [3, 0], None: [4, 2]}
+    assert (counters.total, counters.completed) == (stats.total, stats.completed)
+
+
+def test_counters_follow_versioned_and_bulk_updates(db_path):
+    async def test(session):
+        await complete_task(session, 1, 1, 1)
+        await delete_task(session, 1, 3)
+        await update_task(session, 1, 2, 1, title="Переименована")
+        await complete_tasks(session, 1, [2, 5, 8])
+        await set_tasks_priority(session, 1, [4, 6], Priority.HIGH)
+        await delete_tasks(session, 1, [7, 8])
+        return (*await both_modes(session), await get_user_counters(session, 2))
+
+    stats, counters, other = run_with_db(db_path, test)
+
+    # Остались 1, 2, 5 (выполнены сейчас), 4 и 6 (открыты)
+    assert (stats.total, stats.completed, stats.overdue, stats.completed_this_week) == (5, 3, 0, 3)
+    assert stats.by_priority == {Priority.HIGH: [4, 2], Priority.MEDIUM: [1, 1]}
+    assert (counters.total, counters.completed) == (stats.total, stats.completed)
+    assert counters.progress == stats.progress == 60
+    # Чужую задачу 8 массовые операции пользователя 1 не трогают
+    assert (other.total, other.completed) == (1, 1)
+
+
+def test_counters_mode_for_user_without_tasks(db_path):
+    async def test(session):
+        return await get_user_stats(session, 2), await get_user_counters(session, 3)
+
+    stats, counters = run_with_db(db_path, test)
+    assert (stats.total, stats.completed) == (1, 1)
+    assert (counters.total, counters.completed, counters.progress) == (0, 0, 0)
@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from src import storage as storage_module
+from src.storage import SQLiteStorage, create_storage
+
+KEY = StorageKey(bot_id=1, chat_id=100, user_id=100)
+OTHER_KEY = StorageKey(bot_id=1, chat_id=200, user_id=200)
+
+
+class Form(StatesGroup):
+    title = State()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(storage_module.time, "time", fake.time)
+    return fake
+
+
+def run_storage(path, test, ttl=None):
+    async def main():
+        storage = SQLiteStorage(str(path), ttl=ttl)
+        try:
+            return await test(storage)
+        finally:
+            await storage.close()
+
+    return asyncio.run(main())
+
+
+def test_state_and_data_round_trip(tmp_path):
+    async def test(storage):
+        await storage.set_state(KEY, Form.title)
+        await storage.set_data(KEY, {"title": "Купить молоко", "ids": [1, 2]})
+        await storage.set_state(OTHER_KEY, "Form:other")
+        return (
+            await storage.get_state(KEY), await storage.get_data(KEY),
+            await storage.get_state(OTHER_KEY), await storage.get_data(OTHER_KEY)
+        )
+
+    assert run_storage(tmp_path / "fsm.db", test) == (
+        "Form:title", {"title": "Купить молоко", "ids": [1, 2]}, "Form:other", {}
+    )
+
+
+def test_clearing_state_keeps_data_and_survives_reopen(tmp_path):
+    async def write(storage):
+        await storage.set_data(KEY, {"page": 3})
+        await storage.set_state(KEY, Form.title)
+        await storage.set_state(KEY, None)
+
+    async def read(storage):
+        return await storage.get_state(KEY), await storage.get_data(KEY)
+
+    run_storage(tmp_path / "fsm.db", write)
+    assert run_storage(tmp_path / "fsm.db", read) == (None, {"page": 3})
+
+
+def test_rows_expire_after_ttl(tmp_path, clock):
+    async def test(storage):
+        await storage.set_state(KEY, Form.title)
+        await storage.set_data(KEY, {"title": "старое"})
+        clock.now += 59
+        alive = await storage.get_state(KEY), await storage.get_data(KEY)
+        clock.now += 2
+        expired = await storage.get_state(KEY), await storage.get_data(KEY)
+        # Новое состояние после истечения не поднимает старые данные, и наоборот
+        await storage.set_state(KEY, Form.title)
+        data_after_state = await storage.get_data(KEY)
+        clock.now += 61
+        await storage.set_data(KEY, {"title": "новое"})
+        state_after_data = await storage.get_state(KEY)
+        return alive, expired, data_after_state, state_after_data
+
+    alive, expired, data_after_state, state_after_data = run_storage(tmp_path / "fsm.db", test, ttl=60)
+    assert alive == ("Form:title", {"title": "старое"})
+    assert expired == (None, {})
+    assert data_after_state == {}
+    assert state_after_data is None
+
+
+def test_every_write_extends_ttl(tmp_path, clock):
+    async def test(storage):
+        await storage.set_state(KEY, Form.title)
+        clock.now += 50
+        await storage.set_data(KEY, {"step": 2})
+        clock.now += 50
+        return await storage.get_state(KEY), await storage.get_data(KEY)
+
+    assert run_storage(tmp_path / "fsm.db", test, ttl=60) == ("Form:title", {"step": 2})
+
+
+def test_expired_rows_are_purged(tmp_path, clock):
+    async def test(storage):
+        await storage.set_state(KEY, Form.title)
+        clock.now += 120
+        # Очистка идет на каждой тысячной записи
+        storage._writes = 999
+        await storage.set_state(OTHER_KEY, Form.title)
+
+    path = tmp_path / "fsm.db"
+    run_storage(path, test, ttl=60)
+    with sqlite3.connect(path) as conn:
+        keys = [row[0] for row in conn.execute("SELECT key FROM fsm_storage")]
+    assert keys == [SQLiteStorage._key(OTHER_KEY)]
+
+
+def test_create_storage_selects_backend(tmp_path):
+    assert isinstance(create_storage("memory"), MemoryStorage)
+
+    sqlite_storage = create_storage("sqlite", str(tmp_path / "fsm.db"), ttl=30)
+    assert isinstance(sqlite_storage, SQLiteStorage)
+    assert (sqlite_storage.path, sqlite_storage.ttl) == (str(tmp_path / "fsm.db"), 30)
+
+    with pytest.raises(ValueError):
+        create_storage("memcached")
+
+
+@pytest.mark.parametrize("ttl, expected", [(3600, 3600), (0, None)])
+def test_create_storage_redis_ttl(ttl, expected):
+    pytest.importorskip("redis")
+    redis_storage = create_storage("redis", "redis://localhost:6379/0", ttl=ttl)
+    assert (redis_storage.state_ttl, redis_storage.data_ttl) == (expected, expected)
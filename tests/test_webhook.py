@@ -0,0 +1,128 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.webhook import SECRET_HEADER, WebhookServer, create_webhook_app
+
+
+class BlockingDispatcher:
+    """Диспетчер, чьи обработчики ждут release(): апдейты остаются в обработке."""
+
+    def __init__(self):
+        self.released = asyncio.Event()
+        self.started = []
+        self.processed = []
+
+    async def feed_update(self, bot, update):
+        self.started.append(update.update_id)
+        await self.released.wait()
+        self.processed.append(update.update_id)
+
+    def release(self):
+        self.released.set()
+
+
+def message_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1_700_000_000,
+            "chat": {"id": 100, "type": "private"},
+            "from": {"id": 100, "is_bot": False, "first_name": "Тест"},
+            "text": "/list",
+        },
+    }
+
+
+def run_with_client(test, **options):
+    async def main():
+        dp = BlockingDispatcher()
+        server = WebhookServer(dp, bot=None, **options)
+        async with TestClient(TestServer(create_webhook_app(server))) as client:
+            return await test(client, server, dp)
+
+    return asyncio.run(main())
+
+
+async def post(client, update_id, secret=None):
+    headers = {SECRET_HEADER: secret} if secret is not None else {}
+    response = await client.post("/webhook", json=message_update(update_id), headers=headers)
+    return response.status
+
+
+def test_secret_token_is_checked():
+    async def test(client, server, dp):
+        statuses = [
+            await post(client, 1),
+            await post(client, 2, "wrong"),
+            await post(client, 3, "s3cret"),
+        ]
+        dp.release()
+        await server.drain()
+        return statuses, dp.processed
+
+    statuses, processed = run_with_client(test, secret_token="s3cret")
+    assert statuses == [403, 403, 200]
+    assert processed == [3]
+
+
+def test_invalid_update_is_rejected():
+    async def test(client, server, dp):
+        response = await client.post("/webhook", data="not json")
+        return response.status
+
+    assert run_with_client(test) == 400
+
+
+def test_full_queue_answers_503_until_updates_finish():
+    async def test(client, server, dp):
+        accepted = [await post(client, update_id) for update_id in (1, 2)]
+        overflow = await post(client, 3)
+        dp.release()
+        while server._tasks:
+            await asyncio.sleep(0)
+        retried = await post(client, 3)
+        await server.drain()
+        return accepted, overflow, retried, sorted(dp.processed)
+
+    accepted, overflow, retried, processed = run_with_client(test, max_pending=2)
+    assert accepted == [200, 200]
+    # 503: Telegram повторит доставку, апдейт не потеряется
+    assert overflow == 503
+    assert retried == 200
+    assert processed == [1, 2, 3]
+
+
+def test_concurrency_limit():
+    async def test(client, server, dp):
+        for update_id in range(1, 6):
+            assert await post(client, update_id) == 200
+        for _ in range(10):
+            await asyncio.sleep(0)
+        started = list(dp.started)
+        dp.release()
+        await server.drain()
+        return started, sorted(dp.processed)
+
+    started, processed = run_with_client(test, max_concurrency=2)
+    assert len(started) == 2
+    assert processed == [1, 2, 3, 4, 5]
+
+
+def test_drain_waits_for_accepted_updates_and_rejects_new_ones():
+    async def test(client, server, dp):
+        for update_id in (1, 2):
+            assert await post(client, update_id) == 200
+        drain = asyncio.create_task(server.drain(timeout=5))
+        await asyncio.sleep(0)
+        during_drain = await post(client, 3)
+        drained_early = drain.done()
+        dp.release()
+        await drain
+        return during_drain, drained_early, sorted(dp.processed)
+
+    during_drain, drained_early, processed = run_with_client(test)
+    assert during_drain == 503
+    assert not drained_early
+    assert processed == [1, 2]
@@ -0,0 +1,85 @@
+import asyncio
+import queue
+import random
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from src.workers import ChatOrderedExecutor, create_router_dispatcher, shard_for
+
+CHATS = [101, 102, 103, 104, 105, 106]
+WORKERS = 2
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    sender = {"id": chat_id, "is_bot": False, "first_name": "Тест"}
+    message = {
+        "message_id": update_id,
+        "date": 1_700_000_000,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": sender,
+        "text": f"сообщение {update_id}",
+    }
+    # Каждый четвертый апдейт - нажатие кнопки: чат берется из сообщения под ней
+    if update_id % 4 == 0:
+        return Update(update_id=update_id, callback_query={
+            "id": str(update_id), "from": sender, "chat_instance": "1", "data": "back_to_list", "message": message
+        })
+    return Update(update_id=update_id, message=message)
+
+
+class RecordingDispatcher:
+    """Записывает порядок обработки; обработчики занимают случайное время,
+    поэтому без блокировки по чату апдейты одного чата перемешались бы."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.handled = []
+        self.running = 0
+        self.max_running = 0
+
+    async def feed_update(self, bot, update: Update):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.rng.uniform(0, 0.003))
+        event = update.message or update.callback_query.message
+        self.handled.append((event.chat.id, update.update_id))
+        self.running -= 1
+
+
+def test_updates_are_sharded_by_chat_and_kept_in_order():
+    rng = random.Random(7)
+    sent = [(update_id, rng.choice(CHATS)) for update_id in range(1, 201)]
+
+    async def main():
+        queues = [queue.Queue() for _ in range(WORKERS)]
+        router = create_router_dispatcher(queues)
+        bot = Bot("42:TEST")
+        for update_id, chat_id in sent:
+            await router.feed_update(bot, make_update(update_id, chat_id))
+
+        workers = []
+        for shard_queue in queues:
+            dp = RecordingDispatcher(rng)
+            executor = ChatOrderedExecutor(dp, bot, max_concurrency=4)
+            keys = set()
+            while not shard_queue.empty():
+                key, payload = shard_queue.get()
+                keys.add(key)
+                executor.submit(key, Update.model_validate_json(payload, context={"bot": bot}))
+            await executor.drain()
+            workers.append((keys, dp))
+        await bot.session.close()
+        return workers
+
+    workers = asyncio.run(main())
+
+    for index, (keys, dp) in enumerate(workers):
+        # Чат целиком принадлежит одному воркеру
+        assert keys == {chat_id for chat_id in CHATS if shard_for(chat_id, WORKERS) == index}
+        for chat_id in keys:
+            handled = [update_id for chat, update_id in dp.handled if chat == chat_id]
+            assert handled == [update_id for update_id, chat in sent if chat == chat_id]
+        # Разные чаты обрабатываются параллельно, в пределах max_concurrency
+        assert 1 < dp.max_running <= 4
+    assert sum(len(dp.handled) for _, dp in workers) == len(sent)